@@ -1,4 +1,6 @@
 from django.contrib import admin
+from . import post_search
+from .admin_changelist import AutocompleteFilter, ScalableModelAdmin
 from .models import Skill, SkillProfile, UserSkill, Post, Endorsement
 
 # Register your models here.
@@ -8,6 +10,7 @@ from .models import Skill, SkillProfile, UserSkill, Post, Endorsement
 class SkillAdmin(admin.ModelAdmin):
     list_display = ('name', 'description')
     search_fields = ('name',)
+    raw_id_fields = ('parent_skill',)
 
 # Customize how the SkillProfile model appears
 @admin.register(SkillProfile)
@@ -15,25 +18,44 @@ class SkillProfileAdmin(admin.ModelAdmin):
     list_display = ('user', 'location')
     search_fields = ('user__username', 'location')
 
-# Customize how UserSkill (the card that gets endorsed) appears
+# Customize how UserSkill (the card that gets endorsed) appears.
+# The large tables below use ScalableModelAdmin (see core/admin_changelist.py)
 @admin.register(UserSkill)
-class UserSkillAdmin(admin.ModelAdmin):
+class UserSkillAdmin(ScalableModelAdmin):
     list_display = ('profile', 'skill', 'self_rating', 'is_public')
-    list_filter = ('is_public', 'skill')
+    list_filter = ('is_public', ('skill', AutocompleteFilter))
+    list_select_related = ('profile__user', 'skill')
+    # Walks the (profile, skill) unique index
+    ordering = ('profile_id', 'skill_id')
     search_fields = ('profile__user__username', 'skill__name')
     raw_id_fields = ('profile', 'skill') # For selecting related objects efficiently
 
 # Customize Posts
 @admin.register(Post)
-class PostAdmin(admin.ModelAdmin):
+class PostAdmin(ScalableModelAdmin):
     list_display = ('author', 'content', 'related_skill', 'created_at')
     list_filter = ('created_at',)
-    search_fields = ('author__username', 'content')
+    list_select_related = ('author', 'related_skill')
+    search_fields = ('author__username',)
     raw_id_fields = ('author', 'related_skill')
+    # Content is searched through the full-text index instead of a LIKE scan
+    content_search_limit = 1000
+
+    def get_search_results(self, request, queryset, search_term):
+        results, may_have_duplicates = super().get_search_results(request, queryset, search_term)
+        if search_term:
+            results |= queryset.filter(pk__in=post_search.search(search_term, limit=self.content_search_limit))
+        return results, may_have_duplicates
 
 # Customize Endorsements
 @admin.register(Endorsement)
-class EndorsementAdmin(admin.ModelAdmin):
-    list_display = ('endorser', 'skill_card', 'endorser_rating', 'endorsed_at')
+class EndorsementAdmin(ScalableModelAdmin):
+    list_display = ('endorser', 'recipient', 'skill_name', 'endorser_rating', 'endorsed_at')
     list_filter = ('endorsed_at',)
-    raw_id_fields = ('endorser', 'skill_card')
\ No newline at end of file
+    # str(endorsement), shown by the row checkbox, reads the card's profile user and skill
+    list_select_related = ('endorser', 'recipient', 'skill_card__profile__user', 'skill_card__skill')
+    raw_id_fields = ('endorser', 'skill_card')
+
+    @admin.display(description='skill', ordering='skill_card__skill__name')
+    def skill_name(self, obj):
+        return obj.skill_card.skill.name
@@ -0,0 +1,235 @@
+"""
+Admin changelists that stay fast on very large tables.
+
+The stock changelist runs, on every page load, a COUNT(*) of the filtered rows
+and another of the whole table, reads the page with OFFSET (so page 10,000 of
+posts scans 500,000 rows first) and builds a sidebar choice for every row of a
+related model in list_filter. ScalableModelAdmin replaces each of those:
+
+* EstimatedCountPaginator counts exactly only up to ADMIN_EXACT_COUNT_LIMIT
+  rows. Past that it shows the database's estimate for the whole table
+  (pg_class.reltuples on PostgreSQL, the highest rowid on SQLite) or "more
+  than N" for a filtered list. The full-table count is turned off.
+* KeysetChangeList pages the list in its default ordering with "Next" links
+  carrying the last row's sort key (core.pagination's keyset filter), so every
+  page is one index range scan. Clicking a column header to sort by it falls
+  back to numbered pages.
+* AutocompleteFilter filters on a foreign key chosen with the admin's
+  autocomplete widget, instead of listing every related row.
+
+Combined with list_select_related, a changelist page costs a fixed number of
+queries however many rows the table holds.
+"""
+import base64
+import json
+
+from django import forms
+from django.conf import settings
+from django.contrib import admin
+from django.contrib.admin.options import IncorrectLookupParameters
+from django.contrib.admin.views.main import ALL_VAR, ORDER_VAR, PAGE_VAR, ChangeList
+from django.contrib.admin.widgets import AutocompleteSelect
+from django.core.exceptions import ValidationError
+from django.core.paginator import Paginator
+from django.db import connections
+from django.http import QueryDict
+from django.utils.functional import cached_property
+from django.utils.translation import gettext_lazy as _
+
+from .pagination import KeysetPagination
+
+EXACT_COUNT_LIMIT = getattr(settings, 'ADMIN_EXACT_COUNT_LIMIT', 10000)
+CURSOR_VAR = 'cursor'
+
+_keyset = KeysetPagination()
+
+
+# --- Counting ---
+
+def table_row_estimate(model, using):
+    """
+    The database's cheap estimate of the table's row count, or None if it has none.
+    """
+    connection = connections[using]
+    table = model._meta.db_table
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            # Kept current by autovacuum / ANALYZE; -1 before the first one
+            cursor.execute('SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass', [table])
+            row = cursor.fetchone()
+            return row[0] if row and row[0] >= 0 else None
+        if connection.vendor == 'sqlite':
+            # One b-tree descent; an overestimate by the number of deleted rows
+            cursor.execute(f'SELECT MAX(_rowid_) FROM {connection.ops.quote_name(table)}')
+            return cursor.fetchone()[0] or 0
+    return None
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Paginator whose count is exact up to EXACT_COUNT_LIMIT and estimated past it.
+    'display_count' is the count as the changelist shows it.
+    """
+    approximate = False
+    truncated = False
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        if not queryset.query.where:
+            estimate = table_row_estimate(queryset.model, queryset.db)
+            if estimate is not None and estimate > EXACT_COUNT_LIMIT:
+                self.approximate = True
+                return estimate
+        # Stops reading at the limit: SELECT COUNT(*) FROM (... LIMIT n)
+        count = queryset.order_by()[:EXACT_COUNT_LIMIT + 1].count()
+        if count > EXACT_COUNT_LIMIT:
+            self.truncated = True
+            return EXACT_COUNT_LIMIT
+        return count
+
+    @property
+    def display_count(self):
+        count = f'{self.count:,}'
+        if self.approximate:
+            return _('about %s') % count
+        if self.truncated:
+            return _('more than %s') % count
+        return count
+
+
+# --- Keyset paging ---
+
+def encode_cursor(values):
+    payload = json.dumps(values, separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode('utf-8')).decode('ascii')
+
+
+def decode_cursor(encoded, length):
+    try:
+        values = json.loads(base64.urlsafe_b64decode(encoded.encode('ascii')).decode('utf-8'))
+    except (TypeError, ValueError, UnicodeError):
+        raise IncorrectLookupParameters('Invalid cursor')
+    if not isinstance(values, list) or len(values) != length:
+        raise IncorrectLookupParameters('Invalid cursor')
+    return values
+
+
+class KeysetChangeList(ChangeList):
+    """
+    ChangeList that pages its default ordering by keyset. 'next_page_url' and
+    'first_page_url' replace the page numbers.
+    """
+    def __init__(self, request, *args, **kwargs):
+        self.cursor = request.GET.get(CURSOR_VAR)
+        # Sorting by a column or "show all" use the stock numbered pages
+        self.keyset_pagination = ORDER_VAR not in request.GET and ALL_VAR not in request.GET
+        super().__init__(request, *args, **kwargs)
+
+    def get_ordering(self, request, queryset):
+        # The stock list repeats ModelAdmin.ordering (from get_queryset and again
+        # from the admin); each repeat would add a term to the cursor and filter
+        return list(dict.fromkeys(super().get_ordering(request, queryset)))
+
+    def get_filters_params(self, params=None):
+        lookup_params = super().get_filters_params(params)
+        lookup_params.pop(CURSOR_VAR, None)
+        return lookup_params
+
+    def get_query_string(self, new_params=None, remove=None):
+        # Any other change to the list (filter, search, sort) starts from its first page
+        if not new_params or CURSOR_VAR not in new_params:
+            remove = [*(remove or ()), CURSOR_VAR]
+        return super().get_query_string(new_params, remove)
+
+    def get_results(self, request):
+        ordering = self.queryset.query.order_by
+        if not (self.keyset_pagination and not self.list_editable and all(isinstance(f, str) for f in ordering)):
+            self.keyset_pagination = False
+            return super().get_results(request)
+
+        queryset = self.queryset
+        try:
+            if self.cursor:
+                values = decode_cursor(self.cursor, len(ordering))
+                queryset = queryset.filter(_keyset.keyset_filter(ordering, values))
+            rows = list(queryset[:self.list_per_page + 1])
+        except (ValidationError, ValueError, TypeError):
+            # Cursor values that do not parse as the field's type
+            raise IncorrectLookupParameters('Invalid cursor')
+
+        self.result_list = rows[:self.list_per_page]
+        self.next_page_url = None
+        if len(rows) > self.list_per_page:
+            position = _keyset.position_of(self.result_list[-1], ordering)
+            self.next_page_url = self.get_query_string({CURSOR_VAR: encode_cursor(position)}, remove=[PAGE_VAR])
+        self.first_page_url = self.get_query_string(remove=[PAGE_VAR]) if self.cursor else None
+
+        self.paginator = self.model_admin.get_paginator(request, self.queryset, self.list_per_page)
+        self.result_count = self.paginator.count
+        self.full_result_count = None
+        self.show_full_result_count = False
+        self.show_admin_actions = True
+        self.can_show_all = False
+        self.multi_page = self.next_page_url is not None or self.first_page_url is not None
+
+
+# --- Filters ---
+
+class AutocompleteFilter(admin.FieldListFilter):
+    """
+    list_filter entry for a foreign key, e.g. ('skill', AutocompleteFilter):
+    the value is picked with the autocomplete widget, so the sidebar costs at
+    most one query for the selected row. The related model's admin needs
+    search_fields, as for autocomplete_fields.
+    """
+    template = 'admin/core/autocomplete_filter.html'
+
+    def __init__(self, field, request, params, model, model_admin, field_path):
+        self.lookup_kwarg = '%s__%s__exact' % (field_path, field.target_field.name)
+        values = params.get(self.lookup_kwarg)
+        self.lookup_val = values[-1] if values else None
+        super().__init__(field, request, params, model, model_admin, field_path)
+        self.form_field = forms.ModelChoiceField(
+            queryset=field.remote_field.model._default_manager.all(),
+            to_field_name=field.target_field.name,
+            required=False,
+            widget=AutocompleteSelect(field, model_admin.admin_site),
+        )
+
+    def expected_parameters(self):
+        return [self.lookup_kwarg]
+
+    def choices(self, changelist):
+        # The template renders one entry: the widget in a GET form that keeps
+        # the other parameters of the list, and the link that clears the filter
+        clear_url = changelist.get_query_string(remove=[self.lookup_kwarg, PAGE_VAR])
+        yield {
+            'selected': self.lookup_val is None,
+            'query_string': clear_url,
+            'display': _('All'),
+            'hidden': [(name, value) for name, values in QueryDict(clear_url[1:]).lists() for value in values],
+            'widget': self.form_field.widget.render(self.lookup_kwarg, self.lookup_val),
+        }
+
+
+# --- ModelAdmin ---
+
+class ScalableModelAdmin(admin.ModelAdmin):
+    """
+    ModelAdmin with the estimated count, keyset pages and no facet counts.
+    Set list_select_related for the relations list_display shows.
+    """
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    show_facets = admin.ShowFacets.NEVER
+
+    def get_changelist(self, request, **kwargs):
+        return KeysetChangeList
+
+    @property
+    def media(self):
+        media = super().media
+        if any(isinstance(entry, (list, tuple)) and issubclass(entry[1], AutocompleteFilter) for entry in self.list_filter):
+            media += AutocompleteSelect(None, self.admin_site).media
+        return media
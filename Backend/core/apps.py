@@ -1,6 +1,32 @@
 from django.apps import AppConfig
+from django.core.signals import request_started
+
+
+def warm_indexes(**kwargs):
+    """
+    request_started receiver: on a process's first request, starts building the
+    in-process indexes in the background rather than on the request that first
+    needs them. (Not from ready(), which also runs for migrations, management
+    commands and the test runner, before their databases are ready.)
+    """
+    request_started.disconnect(warm_indexes)
+    from . import graph, skill_search
+    skill_search.warm()
+    graph.warm()
 
 
 class CoreConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'core'
+
+    def ready(self):
+        # Register model signal handlers
+        from . import signals  # noqa: F401
+
+        # Per-request serializer timing for core.metrics
+        from django.db.backends.signals import connection_created
+        from . import metrics
+        metrics.instrument_serializers()
+        connection_created.connect(metrics.install_query_wrapper, dispatch_uid='core.metrics.install_query_wrapper')
+
+        request_started.connect(warm_indexes)
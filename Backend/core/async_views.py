@@ -0,0 +1,158 @@
+"""
+Async versions of the hottest read endpoints, for deployment under ASGI.
+
+DRF views are synchronous, so under an ASGI server every request to them holds a
+worker thread for the whole time it waits on the database. The views below are
+native coroutines: rows are read with the async ORM (aiterator / afirst) and
+serialized in the event loop once loaded, so a worker serves many concurrent
+requests while their queries are in flight. They return exactly the JSON the
+matching DRF endpoints do, reusing the same serializers, query plans and keyset
+pagination:
+
+    GET /api/async/feed/                  PostViewSet.user_feed
+    GET /api/async/profiles/<username>/   SkillProfileViewSet.retrieve
+    GET /api/async/skills/search/         SkillViewSet.search
+    GET /api/async/endorsements/          EndorsementViewSet.list
+
+plus the Server-Sent Events stream of the user's notifications:
+
+    GET /api/async/notifications/stream/
+
+'manage.py loadtest' compares them against the WSGI deployment.
+"""
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from django.http import HttpResponse, StreamingHttpResponse
+from django.utils.dateparse import parse_datetime
+from rest_framework import status
+from rest_framework.exceptions import APIException, AuthenticationFailed, NotAuthenticated
+from rest_framework.request import Request
+from rest_framework.settings import api_settings
+
+from . import notifications, response_cache, skill_search, throttling, timeline
+from .models import SkillProfile, Endorsement
+from .pagination import KeysetPagination
+from .renderers import ORJSONRenderer
+from .serializers import PostSerializer, SkillProfileSerializer, EndorsementSerializer
+
+
+def render(data, status_code=status.HTTP_200_OK):
+    return HttpResponse(ORJSONRenderer().render(data), status=status_code, content_type='application/json')
+
+
+def authenticators():
+    return [auth() for auth in api_settings.DEFAULT_AUTHENTICATION_CLASSES]
+
+
+async def authenticate(request):
+    """
+    Resolves the caller like the DRF views do. Session users come from the
+    AuthenticationMiddleware without blocking; credentials in an Authorization
+    header go through the configured DRF authenticators in a worker thread.
+    """
+    if 'Authorization' in request.headers:
+        drf_request = Request(request, authenticators=authenticators())
+        return await sync_to_async(lambda: drf_request.user)()
+    return await request.auser()
+
+
+def async_api_view(login_required=False):
+    """
+    Wraps a GET-only coroutine view(request, user, *args): authenticates, wraps
+    the request for DRF-style query_params and renders APIExceptions as JSON.
+    """
+    def decorator(view):
+        @wraps(view)
+        async def wrapper(request, *args, **kwargs):
+            if request.method != 'GET':
+                return render({'detail': f'Method "{request.method}" not allowed.'}, status.HTTP_405_METHOD_NOT_ALLOWED)
+            try:
+                user = await authenticate(request)
+                if login_required and not user.is_authenticated:
+                    raise NotAuthenticated()
+                return await view(Request(request), user, *args, **kwargs)
+            except APIException as exc:
+                status_code = exc.status_code
+                if isinstance(exc, (NotAuthenticated, AuthenticationFailed)):
+                    # As in APIView: 401 only if the first authenticator can issue a challenge
+                    challengers = authenticators()[:1]
+                    if not (challengers and challengers[0].authenticate_header(request)):
+                        status_code = status.HTTP_403_FORBIDDEN
+                response = render({'detail': exc.detail}, status_code)
+                if getattr(exc, 'wait', None):
+                    # As in APIView, for Throttled
+                    response['Retry-After'] = '%d' % exc.wait
+                return response
+        return wrapper
+    return decorator
+
+
+@async_api_view(login_required=True)
+async def feed(request, user):
+    paginator = KeysetPagination()
+    posts = await paginator.apaginate_forward(
+        lambda after, limit: timeline.aread_timeline(user, limit, before=after),
+        request,
+        ordering=('-created_at', '-id'),
+    )
+    return render(paginator.get_paginated_data(PostSerializer(posts, many=True).data))
+
+
+@async_api_view()
+async def profile(request, user, username):
+    profiles = SkillProfileSerializer.query_plan.apply(SkillProfile.objects.filter(user__username=username))
+    instance = await profiles.afirst()
+    if instance is None:
+        return render({'detail': 'Not found.'}, status.HTTP_404_NOT_FOUND)
+    return render(SkillProfileSerializer(instance).data)
+
+
+@async_api_view()
+async def skill_search_view(request, user):
+    # Same limits as SkillViewSet.search; in-process buckets are checked without a thread hop
+    if throttling.get_backend().local:
+        throttling.check('search', request, user)
+    else:
+        await sync_to_async(throttling.check)('search', request, user)
+    query = request.query_params.get('q', '')
+    try:
+        limit = min(max(int(request.query_params.get('limit', 10)), 1), 50)
+    except ValueError:
+        limit = 10
+
+    if response_cache.get_backend().local:
+        index = skill_search.current_index()
+    else:
+        index = await sync_to_async(skill_search.current_index)()
+    if index is not None:
+        # Answered from memory without a query
+        return render(index.search(query, limit=limit))
+    # First build or a rebuild of the index, or a database-backed backend
+    return render(await sync_to_async(skill_search.search)(query, limit=limit))
+
+
+@async_api_view(login_required=True)
+async def endorsements(request, user):
+    plan = EndorsementSerializer.query_plan
+    paginator = KeysetPagination()
+    page = await paginator.apaginate_merged(
+        [plan.apply(Endorsement.objects.filter(endorser=user)), plan.apply(Endorsement.objects.filter(recipient=user))],
+        request,
+    )
+    return render(paginator.get_paginated_data(EndorsementSerializer(page, many=True).data))
+
+
+@async_api_view(login_required=True)
+async def notification_stream(request, user):
+    """
+    Pushes the user's new and updated notifications as they happen (see
+    core.notifications). Browsers reconnect with Last-Event-ID and are sent
+    whatever changed while they were away.
+    """
+    since = parse_datetime(request.headers.get('Last-Event-ID', ''))
+    response = StreamingHttpResponse(notifications.stream(user.pk, since), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    # Stop nginx from buffering the stream
+    response['X-Accel-Buffering'] = 'no'
+    return response
@@ -0,0 +1,208 @@
+"""
+Authentication without a user query per request.
+
+Every authenticated request needs its User, and many need the user's
+SkillProfile too (ownership checks, creating cards). Both are served from an
+in-process LRU keyed by user id:
+
+* An entry holds the user's and profile's column values. Each request builds
+  fresh model instances from them, so requests never share (and mutate) one
+  instance, and user.profile is already resolved on the instance it gets.
+  The profile's follower_count and fanout_on_read are left deferred:
+  core.timeline updates them in bulk, without signals, so they are read from
+  the database if asked for.
+* Entries are stored with the response cache version (core.response_cache)
+  of the namespace 'user:<id>', read before the rows were, and served only
+  while that version is current. The handlers in core.signals bump it when
+  the user or profile changes, so with a shared response cache backend a
+  change made by one worker retires the entries of all of them.
+* Entries also expire TTL seconds after they were loaded, so each process
+  re-reads is_active and the password hash at least that often even when
+  the response cache is the per-process default and another worker made
+  the change.
+
+CachedJWTAuthentication (stateless JWT, rest_framework_simplejwt) and
+CachedModelBackend (session logins) resolve users through this cache. JWT
+access tokens are also checked against the token denylist (core.denylist),
+which answers from memory for all but revoked tokens.
+"""
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.contrib.auth.backends import ModelBackend
+from django.contrib.auth.models import User
+from django.core.exceptions import ValidationError
+from django.utils.translation import gettext_lazy as _
+from rest_framework import HTTP_HEADER_ENCODING
+from rest_framework_simplejwt.authentication import JWTAuthentication, AUTH_HEADER_TYPE_BYTES
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.settings import api_settings as jwt_settings
+from rest_framework_simplejwt.utils import get_md5_hash_password
+
+from . import denylist, response_cache
+from .models import SkillProfile
+
+MAX_ENTRIES = getattr(settings, 'AUTH_USER_CACHE_SIZE', 10000)
+# Longest a change made in another process can go unnoticed without a shared response cache
+TTL = getattr(settings, 'AUTH_USER_CACHE_TTL', 30)
+
+USER_FIELDS = tuple(field.attname for field in User._meta.concrete_fields)
+# These are maintained with bulk UPDATEs, so they are never cached
+PROFILE_FIELDS = tuple(
+    field.attname for field in SkillProfile._meta.concrete_fields if field.name not in ('follower_count', 'fanout_on_read')
+)
+
+
+def namespace(user_id):
+    return f'user:{user_id}'
+
+
+class UserCache:
+    """
+    user id -> (version, loaded at, db alias, user values, profile values or
+    None), with LRU eviction and entries expiring 'ttl' seconds after they
+    were loaded. Thread-safe.
+    """
+    def __init__(self, max_entries=MAX_ENTRIES, ttl=TTL):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, user_id, version):
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is None or entry[0] != version or time.monotonic() - entry[1] >= self.ttl:
+                return None
+            self._entries.move_to_end(user_id)
+            return entry
+
+    def put(self, user_id, entry):
+        with self._lock:
+            self._entries[user_id] = entry
+            self._entries.move_to_end(user_id)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def discard(self, user_ids):
+        with self._lock:
+            for user_id in user_ids:
+                self._entries.pop(user_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+cache = UserCache()
+
+
+def _build(entry):
+    _, _, db, user_values, profile_values = entry
+    user = User.from_db(db, USER_FIELDS, user_values)
+    profile = None
+    if profile_values is not None:
+        profile = SkillProfile.from_db(db, PROFILE_FIELDS, profile_values)
+        SkillProfile.user.field.set_cached_value(profile, user)
+    # A cached None makes user.profile raise DoesNotExist, as the query would
+    User.profile.related.set_cached_value(user, profile)
+    return user
+
+
+def get_user(user_id):
+    """
+    The user with the given id, profile attached, or None if there is none.
+    """
+    name = namespace(user_id)
+    # The version is read before the rows, so a write landing in between leaves the entry stale
+    version = response_cache.versions([name])[name]
+    entry = cache.get(user_id, version)
+    if entry is None:
+        user = User.objects.select_related('profile').filter(pk=user_id).first()
+        if user is None:
+            return None
+        try:
+            profile = user.profile
+        except SkillProfile.DoesNotExist:
+            profile = None
+        entry = (
+            version, time.monotonic(), user._state.db,
+            tuple(getattr(user, name) for name in USER_FIELDS),
+            None if profile is None else tuple(getattr(profile, name) for name in PROFILE_FIELDS),
+        )
+        cache.put(user_id, entry)
+    return _build(entry)
+
+
+def invalidate(user_ids):
+    """
+    Retires the cached users, in every process sharing the response cache
+    backend (see response_cache.invalidate for the timing).
+    """
+    user_ids = list(user_ids)
+    cache.discard(user_ids)
+    response_cache.invalidate(*(namespace(user_id) for user_id in user_ids))
+
+
+# --- Authentication classes ---
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """
+    JWTAuthentication resolving users through the user cache and refusing
+    revoked (denylisted) tokens.
+
+    DRF answers an unauthenticated request with 401 only if the first
+    authentication class issues a challenge. This one only challenges requests
+    that sent a Bearer token, so session and anonymous clients keep getting
+    403 as before, while JWT clients get 401 and know to refresh.
+    """
+    def authenticate_header(self, request):
+        header = self.get_header(request)
+        parts = header.split() if header else ()
+        if not parts or parts[0] not in AUTH_HEADER_TYPE_BYTES:
+            return None
+        return super().authenticate_header(request)
+
+    def get_header(self, request):
+        header = request.META.get(jwt_settings.AUTH_HEADER_NAME)
+        if isinstance(header, str):
+            header = header.encode(HTTP_HEADER_ENCODING)
+        return header
+
+    def get_validated_token(self, raw_token):
+        token = super().get_validated_token(raw_token)
+        if denylist.is_revoked(token.get(jwt_settings.JTI_CLAIM)):
+            raise InvalidToken({'detail': _('Token has been revoked'), 'code': 'token_revoked'})
+        return token
+
+    def get_user(self, validated_token):
+        try:
+            # Claims are strings; the cache is keyed by the primary key's own type
+            user_id = User._meta.pk.to_python(validated_token[jwt_settings.USER_ID_CLAIM])
+        except (KeyError, ValidationError):
+            raise InvalidToken(_('Token contained no recognizable user identification'))
+
+        user = get_user(user_id)
+        if user is None:
+            raise AuthenticationFailed(_('User not found'), code='user_not_found')
+        if jwt_settings.CHECK_USER_IS_ACTIVE and not user.is_active:
+            raise AuthenticationFailed(_('User is inactive'), code='user_inactive')
+        if jwt_settings.CHECK_REVOKE_TOKEN and \
+                validated_token.get(jwt_settings.REVOKE_TOKEN_CLAIM) != get_md5_hash_password(user.password):
+            raise AuthenticationFailed(_("The user's password has been changed."), code='password_changed')
+        return user
+
+
+class CachedModelBackend(ModelBackend):
+    """
+    ModelBackend whose get_user(), run on every session-authenticated
+    request, is served from the user cache.
+    """
+    def get_user(self, user_id):
+        user = get_user(user_id)
+        return user if user is not None and self.user_can_authenticate(user) else None
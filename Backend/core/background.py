@@ -0,0 +1,51 @@
+"""
+Work a request hands off once its write has committed.
+
+A BatchWorker is a daemon thread that runs a handler over the keys scheduled
+for it, coalescing repeats, on its own database connection (closed while the
+thread is idle). Work still pending when the process exits is lost, so the
+handlers are ones whose effect can be redone: a cache re-render, or a step a
+management command also performs.
+"""
+import logging
+import threading
+
+from django.db import close_old_connections, connection
+
+logger = logging.getLogger(__name__)
+
+
+class BatchWorker:
+    """
+    Runs handler(keys) in a background thread for the keys passed to
+    schedule(), each key once per batch.
+    """
+    def __init__(self, name, handler):
+        self.name = name
+        self.handler = handler
+        self._pending = set()
+        self._condition = threading.Condition()
+        self._thread = None
+
+    def schedule(self, keys):
+        with self._condition:
+            self._pending.update(keys)
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+                self._thread.start()
+            self._condition.notify()
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while not self._pending:
+                    self._condition.wait()
+                batch, self._pending = self._pending, set()
+            try:
+                close_old_connections()
+                self.handler(batch)
+            except Exception:
+                logger.exception("Background %s failed", self.name)
+            finally:
+                # Don't hold a connection open while idle
+                connection.close()
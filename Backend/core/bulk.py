@@ -0,0 +1,150 @@
+"""
+Batch creation of UserSkill cards and endorsements.
+
+A batch is validated item by item without queries, then the referenced Skill or
+UserSkill rows and the rows that already exist are each resolved with one
+query, and the new rows are written with a single bulk_create inside one
+transaction. bulk_create sends no model signals, so the work those handlers do
+for single writes (endorsement stats, notifications, search popularity,
+response cache) is done here once for the whole batch.
+
+Every item gets a result, in request order:
+
+    {'index': 0, 'status': 'created', 'id': ...}
+    {'index': 1, 'status': 'exists', 'id': ...}      # already listed / already endorsed
+    {'index': 2, 'status': 'invalid', 'errors': {...}}
+"""
+from django.conf import settings
+from django.db import transaction
+
+from . import endorsement_stats, notifications, profile_cards, response_cache, skill_search
+from .models import Skill, SkillProfile, UserSkill, Endorsement
+from .serializers import BulkUserSkillItemSerializer, BulkEndorsementItemSerializer
+
+MAX_ITEMS = getattr(settings, 'BULK_MAX_ITEMS', 500)
+
+
+def _validate(items, serializer_class):
+    results, valid = [None] * len(items), []
+    for index, item in enumerate(items):
+        serializer = serializer_class(data=item)
+        if serializer.is_valid():
+            valid.append((index, serializer.validated_data))
+        else:
+            results[index] = {'index': index, 'status': 'invalid', 'errors': serializer.errors}
+    return results, valid
+
+
+def _does_not_exist(index, field, value):
+    return {'index': index, 'status': 'invalid', 'errors': {field: [f'Invalid pk "{value}" - object does not exist.']}}
+
+
+def _insert(model, pending, existing_lookup):
+    """
+    Writes the pending {key: obj} rows, ignoring unique conflicts, and returns
+    {key: (status, pk)}. Rows another request inserted after the batch was
+    resolved are reported as existing.
+    """
+    objs = list(pending.values())
+    model.objects.bulk_create(objs, ignore_conflicts=True, batch_size=500)
+    # ignore_conflicts gives no per-row outcome, so check which of our rows made it
+    inserted = set(model.objects.filter(pk__in=[obj.pk for obj in objs]).order_by().values_list('pk', flat=True))
+    outcome = {key: ('created', obj.pk) for key, obj in pending.items() if obj.pk in inserted}
+    lost = [key for key in pending if key not in outcome]
+    if lost:
+        outcome.update((key, ('exists', pk)) for key, pk in existing_lookup(lost).items())
+    return outcome
+
+
+def _finish(results, placed, outcome):
+    # Only the first item naming a key can have created its row; repeats report it as existing
+    seen = set()
+    for index, key in placed:
+        status, pk = outcome[key]
+        results[index] = {'index': index, 'status': 'exists' if key in seen else status, 'id': pk}
+        seen.add(key)
+    return results
+
+
+def _created(outcome, pending):
+    return [key for key in pending if outcome[key][0] == 'created']
+
+
+# --- UserSkill cards ---
+
+def add_user_skills(user, items):
+    """
+    Lists skills on the user's profile, creating the profile if needed.
+    """
+    results, valid = _validate(items, BulkUserSkillItemSerializer)
+    with transaction.atomic():
+        profile, _ = SkillProfile.objects.get_or_create(user=user)
+        known = set(Skill.objects.filter(pk__in={d['skill_id'] for _, d in valid}).order_by().values_list('pk', flat=True))
+
+        def existing(skill_ids):
+            return dict(UserSkill.objects.filter(profile=profile, skill_id__in=skill_ids).order_by().values_list('skill_id', 'pk'))
+
+        outcome = {key: ('exists', pk) for key, pk in existing(known).items()}
+        pending, placed = {}, []
+        for index, data in valid:
+            skill_id = data['skill_id']
+            if skill_id not in known:
+                results[index] = _does_not_exist(index, 'skill_id', skill_id)
+                continue
+            if skill_id not in outcome and skill_id not in pending:
+                pending[skill_id] = UserSkill(profile=profile, **data)
+            placed.append((index, skill_id))
+
+        if pending:
+            outcome.update(_insert(UserSkill, pending, existing))
+            added = _created(outcome, pending)
+            if added:
+                search_index = skill_search.loaded_index()
+                if search_index is not None:
+                    def count_cards():
+                        for skill_id in added:
+                            search_index.adjust_popularity(skill_id, 1)
+                    transaction.on_commit(count_cards)
+                response_cache.invalidate_profiles([user.pk])
+                response_cache.invalidate('skill-popularity')
+                profile_cards.invalidate([user.pk])
+    return _finish(results, placed, outcome)
+
+
+# --- Endorsements ---
+
+def endorse(user, items):
+    """
+    Endorses UserSkill cards as the given user.
+    """
+    results, valid = _validate(items, BulkEndorsementItemSerializer)
+    with transaction.atomic():
+        owners = dict(
+            UserSkill.objects.filter(pk__in={d['skill_card_id'] for _, d in valid}).order_by().values_list('pk', 'profile_id')
+        )
+
+        def existing(card_ids):
+            return dict(Endorsement.objects.filter(endorser=user, skill_card_id__in=card_ids).order_by().values_list('skill_card_id', 'pk'))
+
+        outcome = {key: ('exists', pk) for key, pk in existing(owners).items()}
+        pending, placed = {}, []
+        for index, data in valid:
+            card_id = data['skill_card_id']
+            if card_id not in owners:
+                results[index] = _does_not_exist(index, 'skill_card_id', card_id)
+                continue
+            if card_id not in outcome and card_id not in pending:
+                # Endorsement.save() is bypassed, so denormalize the recipient here
+                pending[card_id] = Endorsement(endorser=user, recipient_id=owners[card_id], **data)
+            placed.append((index, card_id))
+
+        if pending:
+            outcome.update(_insert(Endorsement, pending, existing))
+            added = _created(outcome, pending)
+            if added:
+                endorsement_stats.rebuild(added)
+                notifications.endorsements_created([pending[card_id] for card_id in added])
+                recipients = {owners[card_id] for card_id in added}
+                response_cache.invalidate_profiles(recipients)
+                profile_cards.invalidate(recipients)
+    return _finish(results, placed, outcome)
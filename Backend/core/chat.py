@@ -0,0 +1,208 @@
+"""
+Chat: conversations, their message logs and read receipts.
+
+Storage is built for appends:
+
+* Each chat's messages are an append-only log keyed by (chat, seq), the
+  composite primary key of Message. seq counts up from 1 with no gaps, so
+  history and catch-up reads are keyset range scans of one chat's slice of
+  the key ("everything after seq 41"), and each chat's log is stored as one
+  contiguous range of the index however many chats are active.
+* Chat.last_seq hands out the seqs. A batch takes a block of n seqs for a chat
+  with one UPDATE ... SET last_seq = last_seq + n, so concurrent writers to one
+  chat never collide and a batch of any size costs one statement per chat plus
+  one bulk INSERT.
+* Read receipts are a high-water mark per member (ChatMember.read_seq) rather
+  than a row per message read. Receipts only ever move forward, so any number
+  of them for one member compact to the highest, and sending a message marks
+  the sender as having read up to it.
+
+write_batch() applies a batch of messages and receipts in one transaction.
+The WebSocket gateway (core.chat_gateway) collects what its connections send
+into such batches; the REST endpoints write one message at a time.
+
+After commit, new messages, receipts and typing indicators are pushed to the
+members' open WebSocket connections through CHAT_BROKER, with the Hub and
+brokers of core.notifications: LocalBroker for a single server process,
+RedisBroker to reach connections held by other processes.
+"""
+import threading
+from collections import Counter, defaultdict
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from .models import Chat, ChatMember, Message
+from .notifications import Hub
+from .serializers import MessageValuesSerializer
+
+# --- Tunables (override in settings.py) ---
+
+MAX_MESSAGE_LENGTH = getattr(settings, 'CHAT_MAX_MESSAGE_LENGTH', 4000)
+
+MAX_MEMBERS = getattr(settings, 'CHAT_MAX_MEMBERS', 100)
+
+# Events buffered per WebSocket connection; a client that falls further behind
+# loses the oldest and fetches them again by seq
+CONNECTION_BUFFER = getattr(settings, 'CHAT_CONNECTION_BUFFER', 1000)
+
+BATCH_SIZE = 1000
+
+
+# --- Chats and members ---
+
+def create_chat(users):
+    """
+    Starts a chat between the given users.
+    """
+    with transaction.atomic():
+        chat = Chat.objects.create()
+        ChatMember.objects.bulk_create([ChatMember(chat=chat, user=user) for user in users])
+    return chat
+
+
+def member_ids(chat_ids):
+    """
+    {chat id: [user ids]} for the given chats.
+    """
+    members = defaultdict(list)
+    for chat_id, user_id in ChatMember.objects.filter(chat_id__in=chat_ids).values_list('chat_id', 'user_id'):
+        members[chat_id].append(user_id)
+    return members
+
+
+def chat_ids_of(user_id):
+    return set(ChatMember.objects.filter(user_id=user_id).values_list('chat_id', flat=True))
+
+
+def is_member(chat_id, user_id):
+    return ChatMember.objects.filter(chat_id=chat_id, user_id=user_id).exists()
+
+
+def validate_content(content):
+    """
+    The error message for content that cannot be sent, or None.
+    """
+    if not isinstance(content, str) or not content.strip():
+        return "Message content must be a non-empty string."
+    if len(content) > MAX_MESSAGE_LENGTH:
+        return f"Message content is limited to {MAX_MESSAGE_LENGTH} characters."
+    return None
+
+
+# --- Writing ---
+
+def _allocate(counts, now):
+    """
+    Reserves counts[chat_id] consecutive seqs in each chat. Returns {chat id:
+    last seq} after the reservation. Chats are locked in id order so
+    concurrent batches cannot deadlock.
+    """
+    for chat_id in sorted(counts):
+        Chat.objects.filter(pk=chat_id).update(last_seq=F('last_seq') + counts[chat_id], updated_at=now)
+    return _last_seqs(counts)
+
+
+def _last_seqs(chat_ids):
+    return dict(Chat.objects.filter(pk__in=chat_ids).order_by().values_list('pk', 'last_seq'))
+
+
+def _advance(receipts, last_seqs):
+    """
+    Moves each (chat id, user id) member's read_seq up to the given seq, never
+    down and never past the chat's last message. Returns the receipts applied.
+    """
+    applied = {}
+    for (chat_id, user_id), seq in receipts.items():
+        seq = min(seq, last_seqs.get(chat_id, 0))
+        if ChatMember.objects.filter(chat_id=chat_id, user_id=user_id, read_seq__lt=seq).update(read_seq=seq):
+            applied[(chat_id, user_id)] = seq
+    return applied
+
+
+def write_batch(messages=(), receipts=None):
+    """
+    Appends messages, given as (chat id, sender id, content), and applies read
+    receipts, {(chat id, user id): seq}, in one transaction. Callers have
+    checked membership and content. Returns the messages' data in input order.
+    """
+    messages = list(messages)
+    receipts = dict(receipts or {})
+    explicit = set(receipts)
+    now = timezone.now()
+    with transaction.atomic():
+        rows = []
+        last_seqs = {}
+        if messages:
+            counts = Counter(chat_id for chat_id, _, _ in messages)
+            last_seqs = _allocate(counts, now)
+            next_seq = {chat_id: last_seqs[chat_id] - counts[chat_id] + 1 for chat_id in counts}
+            for chat_id, sender_id, content in messages:
+                seq = next_seq[chat_id]
+                next_seq[chat_id] += 1
+                rows.append({'chat_id': chat_id, 'seq': seq, 'sender_id': sender_id, 'content': content, 'created_at': now})
+                # Senders have read everything up to what they just wrote
+                key = (chat_id, sender_id)
+                receipts[key] = max(receipts.get(key, 0), seq)
+            Message.objects.bulk_create([Message(**row) for row in rows], batch_size=BATCH_SIZE)
+        missing = {chat_id for chat_id, _ in receipts} - set(last_seqs)
+        if missing:
+            last_seqs.update(_last_seqs(missing))
+        applied = _advance(receipts, last_seqs)
+        data = MessageValuesSerializer(rows, many=True).data
+        # A sender's own receipt is implied by the message event
+        announced = {key: seq for key, seq in applied.items() if key in explicit}
+        transaction.on_commit(lambda: publish(data, announced))
+    return data
+
+
+# --- Reading ---
+
+def messages(chat_id):
+    """
+    The chat's log as .values() rows for MessageValuesSerializer; callers page
+    it by seq.
+    """
+    return Message.objects.filter(chat_id=chat_id).values(*MessageValuesSerializer.columns)
+
+
+# --- Pushing ---
+
+hub = Hub(buffer=CONNECTION_BUFFER)
+_broker = None
+_broker_lock = threading.Lock()
+
+
+def get_broker():
+    global _broker
+    if _broker is None:
+        with _broker_lock:
+            if _broker is None:
+                config = getattr(settings, 'CHAT_BROKER', {})
+                broker_class = import_string(config.get('BACKEND', 'core.notifications.LocalBroker'))
+                _broker = broker_class(hub, **config.get('OPTIONS', {}))
+    return _broker
+
+
+def publish(messages=(), receipts=None, typing=()):
+    """
+    Sends new messages, applied receipts and typing indicators, (chat id, user
+    id) pairs, to the members of their chats.
+    """
+    receipts = receipts or {}
+    events = [(message['chat'], {'type': 'message', **message}) for message in messages]
+    events += [(chat_id, {'type': 'read', 'chat': chat_id, 'user': user_id, 'seq': seq}) for (chat_id, user_id), seq in receipts.items()]
+    events += [(chat_id, {'type': 'typing', 'chat': chat_id, 'user': user_id}) for chat_id, user_id in typing]
+    if not events:
+        return
+    broker = get_broker()
+    members = member_ids({chat_id for chat_id, _ in events})
+    broker.publish([
+        (user_id, event)
+        for chat_id, event in events
+        for user_id in members[chat_id]
+        if broker.wants(user_id)
+    ])
@@ -0,0 +1,273 @@
+"""
+WebSocket gateway for chat (core.chat), served by the ASGI application at
+/ws/chat/ (see skilllink_backend_config/asgi.py).
+
+Clients authenticate like the async API: with the session cookie, or with a
+bearer token for the configured DRF authenticators as ?token=<token>, since
+browsers cannot set headers on a WebSocket. One connection carries all of the
+user's chats. Frames are JSON text:
+
+    client -> server
+        {"type": "send", "chat": 1, "content": "hi", "ref": "c-17"}
+        {"type": "read", "chat": 1, "seq": 42}
+        {"type": "typing", "chat": 1}
+
+    server -> client
+        {"type": "ack", "ref": "c-17", "chat": 1, "seq": 43}
+        {"type": "message", "chat": 1, "seq": 43, "sender": 7, "content": "hi", "created_at": "..."}
+        {"type": "read", "chat": 1, "user": 7, "seq": 42}
+        {"type": "typing", "chat": 1, "user": 7}
+        {"type": "error", "ref": "c-17", "detail": "..."}
+
+Writes are group-committed: every connection served by an event loop hands
+its messages and receipts to that loop's BatchWriter, which writes whatever
+has accumulated in one transaction (core.chat.write_batch) while the previous
+batch is in flight. Under load a batch holds hundreds of messages, so the
+database sees a few statements per batch rather than a transaction per message.
+A message is acknowledged once its batch has committed.
+
+Messages pushed while a client was disconnected, or dropped because it fell
+too far behind, are fetched by seq from GET /api/chats/<id>/messages/?after=<seq>.
+"""
+import asyncio
+import json
+import math
+import time
+import weakref
+from importlib import import_module
+from io import BytesIO
+from urllib.parse import parse_qs, urlsplit
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth import aget_user
+from django.core.handlers.asgi import ASGIRequest
+from django.http.request import validate_host
+from rest_framework.exceptions import APIException
+
+from . import chat, throttling
+from .async_views import authenticate
+from .renderers import ORJSONRenderer
+
+PATH = '/ws/chat/'
+
+# Messages written per transaction at most
+MAX_BATCH = getattr(settings, 'CHAT_MAX_BATCH', 500)
+
+# Seconds between typing indicators relayed for one user in one chat
+TYPING_INTERVAL = 2
+
+
+# --- Group commit ---
+
+class BatchWriter:
+    """
+    Collects messages and read receipts from the connections of one event loop
+    and writes them in batches, one batch at a time.
+    """
+    def __init__(self, max_batch=MAX_BATCH):
+        self.max_batch = max_batch
+        self._messages = []   # (chat id, sender id, content, future)
+        self._receipts = {}   # (chat id, user id) -> highest seq
+        self._task = None
+
+    def send(self, chat_id, sender_id, content):
+        """
+        Queues a message. Returns a future for its data, seq included.
+        """
+        future = asyncio.get_running_loop().create_future()
+        self._messages.append((chat_id, sender_id, content, future))
+        self._wake()
+        return future
+
+    def read(self, chat_id, user_id, seq):
+        key = (chat_id, user_id)
+        # Only the highest receipt per member matters
+        self._receipts[key] = max(seq, self._receipts.get(key, 0))
+        self._wake()
+
+    def _wake(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def _run(self):
+        # Whatever arrives while a batch is being written goes into the next one
+        while self._messages or self._receipts:
+            batch, self._messages = self._messages[:self.max_batch], self._messages[self.max_batch:]
+            receipts, self._receipts = self._receipts, {}
+            try:
+                data = await sync_to_async(chat.write_batch)([entry[:3] for entry in batch], receipts)
+            except Exception as exc:
+                for *_, future in batch:
+                    if not future.done():
+                        future.set_exception(exc)
+            else:
+                for (*_, future), message in zip(batch, data):
+                    if not future.done():
+                        future.set_result(message)
+
+
+_writers = weakref.WeakKeyDictionary()
+
+
+def get_writer():
+    loop = asyncio.get_running_loop()
+    writer = _writers.get(loop)
+    if writer is None:
+        writer = _writers[loop] = BatchWriter()
+    return writer
+
+
+# --- Connections ---
+
+def http_request(scope):
+    """
+    The handshake as a Django request, for cookies, headers and authentication.
+    """
+    request = ASGIRequest({**scope, 'type': 'http', 'method': 'GET'}, BytesIO())
+    token = parse_qs(scope.get('query_string', b'').decode('latin-1')).get('token')
+    if token:
+        request.META['HTTP_AUTHORIZATION'] = f'Bearer {token[0]}'
+    engine = import_module(settings.SESSION_ENGINE)
+    request.session = engine.SessionStore(request.COOKIES.get(settings.SESSION_COOKIE_NAME))
+    request.auser = lambda: aget_user(request)
+    return request
+
+
+def origin_allowed(request):
+    """
+    Browsers send the session cookie with any page's WebSocket, so a cookie-
+    authenticated handshake must come from one of this site's hosts.
+    """
+    origin = request.headers.get('Origin')
+    if origin is None or 'Authorization' in request.headers:
+        return True
+    allowed_hosts = settings.ALLOWED_HOSTS
+    if settings.DEBUG and not allowed_hosts:
+        allowed_hosts = ['.localhost', '127.0.0.1', '[::1]']
+    return validate_host(urlsplit(origin).hostname or '', allowed_hosts)
+
+
+def dumps(event):
+    return ORJSONRenderer().render(event).decode('utf-8')
+
+
+class ChatSocket:
+    """
+    One client connection: relays its frames to the writer and pushes the
+    events of its user's chats back.
+    """
+    def __init__(self, user, ident, send):
+        self.user = user
+        self.ident = ident
+        self._send = send
+        self._send_lock = asyncio.Lock()
+        self._acks = set()
+        self._typing = {}
+        self.chat_ids = set()
+
+    async def send_event(self, event):
+        async with self._send_lock:
+            await self._send({'type': 'websocket.send', 'text': dumps(event)})
+
+    async def error(self, ref, detail, **extra):
+        await self.send_event({'type': 'error', 'ref': ref, 'detail': detail, **extra})
+
+    async def run(self, receive):
+        self.chat_ids = await sync_to_async(chat.chat_ids_of)(self.user.pk)
+        chat.get_broker().connect()
+        subscription = chat.hub.subscribe(self.user.pk)
+        pusher = asyncio.create_task(self._push(subscription[1]))
+        try:
+            while True:
+                message = await receive()
+                if message['type'] == 'websocket.disconnect':
+                    break
+                if message['type'] == 'websocket.receive':
+                    await self.handle(message.get('text') or message.get('bytes') or '')
+        finally:
+            chat.hub.unsubscribe(self.user.pk, subscription)
+            pusher.cancel()
+            for task in list(self._acks):
+                task.cancel()
+
+    async def _push(self, queue):
+        while True:
+            await self.send_event(await queue.get())
+
+    async def is_member(self, chat_id):
+        if chat_id not in self.chat_ids:
+            # Chats started since the connection opened
+            self.chat_ids = await sync_to_async(chat.chat_ids_of)(self.user.pk)
+        return chat_id in self.chat_ids
+
+    async def take_token(self):
+        # As the REST endpoint's throttle; in-process buckets without a thread hop
+        if throttling.get_backend().local:
+            return throttling.take('chat', self.user, self.ident)
+        return await sync_to_async(throttling.take)('chat', self.user, self.ident)
+
+    async def handle(self, raw):
+        try:
+            frame = json.loads(raw)
+            kind, chat_id, ref = frame.get('type'), frame.get('chat'), frame.get('ref')
+        except (ValueError, AttributeError):
+            return await self.error(None, "Frames must be JSON objects.")
+        if not isinstance(chat_id, int) or isinstance(chat_id, bool) or not await self.is_member(chat_id):
+            return await self.error(ref, "Not a member of this chat.")
+
+        if kind == 'send':
+            content = frame.get('content')
+            error = chat.validate_content(content)
+            if error:
+                return await self.error(ref, error)
+            allowed, wait = await self.take_token()
+            if not allowed:
+                return await self.error(ref, "Request was throttled.", retry_after=math.ceil(wait))
+            task = asyncio.create_task(self._ack(ref, get_writer().send(chat_id, self.user.pk, content)))
+            self._acks.add(task)
+            task.add_done_callback(self._acks.discard)
+        elif kind == 'read':
+            seq = frame.get('seq')
+            if not isinstance(seq, int) or isinstance(seq, bool) or seq < 0:
+                return await self.error(ref, "seq must be a non-negative integer.")
+            get_writer().read(chat_id, self.user.pk, seq)
+        elif kind == 'typing':
+            now = time.monotonic()
+            if now - self._typing.get(chat_id, -TYPING_INTERVAL) >= TYPING_INTERVAL:
+                self._typing[chat_id] = now
+                await sync_to_async(chat.publish)(typing=[(chat_id, self.user.pk)])
+        else:
+            await self.error(ref, "Unknown frame type.")
+
+    async def _ack(self, ref, future):
+        try:
+            message = await future
+        except Exception:
+            return await self.error(ref, "The message could not be saved.")
+        await self.send_event({'type': 'ack', 'ref': ref, 'chat': message['chat'], 'seq': message['seq']})
+
+
+async def application(scope, receive, send):
+    """
+    ASGI application for WebSocket connections.
+    """
+    if (await receive())['type'] != 'websocket.connect':
+        return
+    if scope['path'] != PATH:
+        return await send({'type': 'websocket.close', 'code': 4404})
+
+    request = http_request(scope)
+    user = None
+    if origin_allowed(request):
+        try:
+            user = await authenticate(request)
+        except APIException:
+            # Invalid or expired credentials
+            user = None
+    if user is None or not user.is_authenticated:
+        return await send({'type': 'websocket.close', 'code': 4401})
+
+    await send({'type': 'websocket.accept'})
+    client = scope.get('client') or ('', 0)
+    await ChatSocket(user, client[0], send).run(receive)
@@ -0,0 +1,67 @@
+"""
+Single-flight request coalescing.
+
+When several threads ask for the same thing at once (N clients typing the same
+autocomplete query), only the first runs the lookup; the others wait for it and
+share its result, or its exception. Nothing is cached: a call arriving after the
+first finished runs again. Coalescing is per process.
+"""
+import threading
+
+
+class _Call:
+    __slots__ = ('done', 'result', 'error', 'waiters')
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = self.error = None
+        self.waiters = 0
+
+
+class SingleFlight:
+    """
+    Runs at most one call per key at a time. Thread-safe.
+    """
+    def __init__(self, timeout=10):
+        # A follower stops waiting after 'timeout' seconds and runs the call itself
+        self.timeout = timeout
+        self._lock = threading.Lock()
+        self._calls = {}
+        self.shared = 0   # calls answered by another caller's run
+
+    def do(self, key, function):
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+            else:
+                call.waiters += 1
+
+        if not leader:
+            if not call.done.wait(self.timeout):
+                return function()
+            with self._lock:
+                self.shared += 1
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = function()
+        except Exception as exc:
+            call.error = exc
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.result
+
+    def in_flight(self, key):
+        """
+        How many callers are waiting on the key's running call (None if none is).
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            return None if call is None else call.waiters
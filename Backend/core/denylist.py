@@ -0,0 +1,164 @@
+"""
+Revoked JWTs (core.authentication), checked on every token-authenticated
+request.
+
+Revocations are RevokedToken rows, kept until the token would have expired
+anyway. Each process holds a bloom filter of the unexpired ones' jti claims,
+so checking a token that was never revoked (nearly all of them) costs a few
+hashes and no query: a bloom filter never misses a member. Only a hit, a
+revoked token or the rare false positive (ERROR_RATE), is confirmed with the
+database.
+
+The filter picks up rows written by other processes every REFRESH_SECONDS,
+by reading the ones revoked since its last refresh, and is rebuilt from the
+unexpired rows every REBUILD_SECONDS or once it holds more than it was sized
+for. A revocation in this process is added as soon as it commits.
+"""
+import datetime
+import hashlib
+import math
+import threading
+import time
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from rest_framework_simplejwt.settings import api_settings as jwt_settings
+
+from .models import RevokedToken
+
+CAPACITY = getattr(settings, 'TOKEN_DENYLIST_CAPACITY', 100_000)
+ERROR_RATE = getattr(settings, 'TOKEN_DENYLIST_ERROR_RATE', 0.001)
+REFRESH_SECONDS = getattr(settings, 'TOKEN_DENYLIST_REFRESH_SECONDS', 5)
+REBUILD_SECONDS = getattr(settings, 'TOKEN_DENYLIST_REBUILD_SECONDS', 3600)
+# Re-read rows revoked this long before the last refresh, in case their transactions committed late
+REFRESH_OVERLAP_SECONDS = 60
+
+
+class BloomFilter:
+    """
+    A bit array sized for 'capacity' members at a false-positive rate of
+    'error_rate' (about 1.8 KB per 1000 members at 0.1%). Positions come from
+    one BLAKE2b digest by double hashing.
+    """
+    def __init__(self, capacity, error_rate):
+        self.capacity = max(1, capacity)
+        self.size = max(8, math.ceil(-self.capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.size / self.capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+
+    def _positions(self, key):
+        digest = hashlib.blake2b(key.encode('utf-8'), digest_size=16).digest()
+        h1, h2 = int.from_bytes(digest[:8], 'little'), int.from_bytes(digest[8:], 'little') | 1
+        return [(h1 + i * h2) % self.size for i in range(self.hashes)]
+
+    def add(self, key):
+        for position in self._positions(key):
+            self.bits[position >> 3] |= 1 << (position & 7)
+
+    def __contains__(self, key):
+        return all(self.bits[position >> 3] & (1 << (position & 7)) for position in self._positions(key))
+
+
+class TokenDenylist:
+    """
+    The bloom filter over revoked jtis, with the bookkeeping for refreshing it.
+    """
+    def __init__(self, capacity=CAPACITY, error_rate=ERROR_RATE):
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self._lock = threading.Lock()
+        self._clear()
+
+    def _clear(self, capacity=None):
+        self.bloom = BloomFilter(capacity or self.capacity, self.error_rate)
+        self.count = 0
+        self.high_water = 0
+        self.built_at = time.monotonic()
+        self.refreshed_at = float('-inf')
+        self.refreshed_since = None
+
+    def _load(self, rows):
+        for pk, jti in rows:
+            self.bloom.add(jti)
+            if pk > self.high_water:
+                self.count += 1
+                self.high_water = pk
+
+    def refresh(self, force=False):
+        """
+        Adds rows revoked since the last refresh, if REFRESH_SECONDS have
+        passed, or rebuilds the filter when it is due.
+        """
+        now = time.monotonic()
+        if not force and now - self.refreshed_at < REFRESH_SECONDS:
+            return
+        with self._lock:
+            if not force and now - self.refreshed_at < REFRESH_SECONDS:
+                return
+            started = timezone.now()
+            rows = RevokedToken.objects.filter(expires_at__gt=started)
+            if self.count > self.bloom.capacity:
+                # Outgrown: rebuild with room to spare
+                self._clear(capacity=max(self.capacity, 2 * self.count))
+            elif now - self.built_at > REBUILD_SECONDS:
+                self._clear()
+            elif self.refreshed_since is not None:
+                rows = rows.filter(revoked_at__gte=self.refreshed_since)
+            self._load(rows.values_list('pk', 'jti').order_by('pk'))
+            self.refreshed_at = now
+            self.refreshed_since = started - datetime.timedelta(seconds=REFRESH_OVERLAP_SECONDS)
+
+    def add(self, jti):
+        with self._lock:
+            self.bloom.add(jti)
+
+    def is_revoked(self, jti):
+        if not jti:
+            return False
+        self.refresh()
+        if jti not in self.bloom:
+            return False
+        # A hit may be a false positive: the table has the answer
+        return RevokedToken.objects.filter(jti=jti, expires_at__gt=timezone.now()).exists()
+
+
+# --- Process-wide denylist ---
+
+_denylist = None
+_denylist_lock = threading.Lock()
+
+
+def get_denylist():
+    global _denylist
+    if _denylist is None:
+        with _denylist_lock:
+            if _denylist is None:
+                _denylist = TokenDenylist()
+    return _denylist
+
+
+def reset():
+    """
+    Drops the filter so the next check rebuilds it (used by tests).
+    """
+    global _denylist
+    with _denylist_lock:
+        _denylist = None
+
+
+def is_revoked(jti):
+    return get_denylist().is_revoked(jti)
+
+
+def revoke(token):
+    """
+    Revokes a validated simplejwt token until it expires, and clears out
+    revocations of tokens that have expired since.
+    """
+    jti = token[jwt_settings.JTI_CLAIM]
+    expires_at = datetime.datetime.fromtimestamp(token['exp'], tz=datetime.timezone.utc)
+    RevokedToken.objects.filter(expires_at__lte=timezone.now()).delete()
+    RevokedToken.objects.get_or_create(jti=jti, defaults={'expires_at': expires_at})
+    denylist = get_denylist()
+    transaction.on_commit(lambda: denylist.add(jti))
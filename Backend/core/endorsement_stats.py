@@ -0,0 +1,128 @@
+"""
+Incremental and bulk maintenance of EndorsementStats.
+
+Creating or deleting an Endorsement adjusts its card's counters with a single
+UPDATE ... SET x = x + 1 inside the same transaction as the write, so readers
+never see a count that disagrees with the Endorsement table. rebuild() recomputes
+the counters from scratch with GROUP BY passes over chunks of cards, for repairs
+and for writes that bypass model signals (bulk_create, queryset.update()).
+"""
+from django.db import transaction
+from django.db.models import Count, F, Max, OuterRef, Q, Subquery, Sum, Value
+from django.db.models.functions import Coalesce, Greatest
+
+from .models import UserSkill, Endorsement, EndorsementStats
+
+RATING_FIELDS = ('rating_1', 'rating_2', 'rating_3', 'rating_4', 'rating_5')
+STAT_FIELDS = ('count', 'rating_count', 'rating_sum') + RATING_FIELDS + ('last_endorsed_at',)
+
+
+def _rating_deltas(rating, sign):
+    if rating is None:
+        return {}
+    return {
+        'rating_count': F('rating_count') + sign,
+        'rating_sum': F('rating_sum') + sign * rating,
+        RATING_FIELDS[rating - 1]: F(RATING_FIELDS[rating - 1]) + sign,
+    }
+
+
+# --- Incremental maintenance ---
+
+def record_endorsement(endorsement):
+    """
+    Adds a newly created endorsement to its card's stats.
+    """
+    with transaction.atomic():
+        EndorsementStats.objects.get_or_create(skill_card_id=endorsement.skill_card_id)
+        EndorsementStats.objects.filter(skill_card_id=endorsement.skill_card_id).update(
+            count=F('count') + 1,
+            last_endorsed_at=Greatest(
+                Coalesce(F('last_endorsed_at'), Value(endorsement.endorsed_at)), Value(endorsement.endorsed_at)
+            ),
+            **_rating_deltas(endorsement.endorser_rating, 1),
+        )
+
+
+def forget_endorsement(endorsement):
+    """
+    Removes a deleted endorsement from its card's stats.
+    """
+    with transaction.atomic():
+        updated = EndorsementStats.objects.filter(skill_card_id=endorsement.skill_card_id, count__gt=0).update(
+            count=F('count') - 1,
+            **_rating_deltas(endorsement.endorser_rating, -1),
+        )
+        if not updated:
+            # The card itself is being deleted, or its stats were never built
+            return
+        # Only deleting the newest endorsement moves last_endorsed_at
+        EndorsementStats.objects.filter(
+            skill_card_id=endorsement.skill_card_id, last_endorsed_at__lte=endorsement.endorsed_at
+        ).update(
+            last_endorsed_at=Subquery(
+                Endorsement.objects.filter(skill_card_id=OuterRef('skill_card_id'))
+                .exclude(pk=endorsement.pk)
+                .order_by('-endorsed_at')
+                .values('endorsed_at')[:1]
+            )
+        )
+
+
+# --- Bulk rebuild ---
+
+def _aggregate(card_ids):
+    return (
+        Endorsement.objects.filter(skill_card_id__in=card_ids)
+        .order_by()
+        .values('skill_card_id')
+        .annotate(
+            count=Count('pk'),
+            rating_count=Count('endorser_rating'),
+            rating_sum=Coalesce(Sum('endorser_rating'), 0),
+            last_endorsed_at=Max('endorsed_at'),
+            **{field: Count('pk', filter=Q(endorser_rating=i)) for i, field in enumerate(RATING_FIELDS, start=1)},
+        )
+    )
+
+
+def rebuild(card_ids):
+    """
+    Recomputes the stats of the given cards with one GROUP BY query and one upsert.
+    Cards without endorsements lose their stats row.
+    """
+    card_ids = list(card_ids)
+    if not card_ids:
+        return 0
+    with transaction.atomic():
+        rows = [EndorsementStats(**row) for row in _aggregate(card_ids)]
+        EndorsementStats.objects.bulk_create(
+            rows,
+            update_conflicts=True,
+            unique_fields=['skill_card'],
+            update_fields=list(STAT_FIELDS),
+        )
+        EndorsementStats.objects.filter(skill_card_id__in=card_ids).exclude(
+            skill_card_id__in=[row.skill_card_id for row in rows]
+        ).delete()
+    return len(rows)
+
+
+def rebuild_all(chunk_size=2000):
+    """
+    Rebuilds every card's stats, walking UserSkill in primary-key chunks so each
+    GROUP BY pass and transaction stays small. Yields (cards_scanned, rows_written)
+    after each chunk.
+    """
+    last_pk, scanned, written = None, 0, 0
+    while True:
+        chunk = UserSkill.objects.order_by('pk')
+        if last_pk is not None:
+            chunk = chunk.filter(pk__gt=last_pk)
+        card_ids = list(chunk.values_list('pk', flat=True)[:chunk_size])
+        if not card_ids:
+            break
+        written += rebuild(card_ids)
+        scanned += len(card_ids)
+        last_pk = card_ids[-1]
+        yield scanned, written
@@ -0,0 +1,202 @@
+"""
+Streaming data exports as NDJSON or CSV.
+
+Rows are read with values_list(...).iterator(chunk_size=CHUNK_SIZE), which uses
+a server-side cursor on PostgreSQL and chunked fetches on SQLite, so neither
+model instances nor the result set are held in memory. Each row is written as
+it is read and the output is flushed to the client in blocks of about
+FLUSH_BYTES, so memory stays the same for ten rows or ten million.
+
+Two families of datasets:
+
+* ACCOUNT_DATASETS: one user's own data, for account export;
+* TABLE_DATASETS: whole tables for staff, by primary key, foreign keys as ids.
+
+The response bodies are generators of blocks. Django's ASGI handler would read
+a synchronous body into a list before sending any of it, so under ASGI
+streaming_body() hands it an asynchronous iterator instead, which pulls one
+block at a time in the request's worker thread (where the cursor lives).
+"""
+import csv
+import datetime
+import json
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from django.contrib.auth.models import User
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Q
+from rest_framework.renderers import BaseRenderer
+
+from .models import Skill, SkillProfile, UserSkill, Post, Endorsement, Connection
+
+CHUNK_SIZE = getattr(settings, 'EXPORT_CHUNK_SIZE', 2000)
+FLUSH_BYTES = 64 * 1024
+
+
+class Dataset:
+    """
+    A named export: column headers and the matching values_list() paths.
+    'rows' builds the queryset, from the exporting user for account datasets.
+    """
+    def __init__(self, name, columns, rows):
+        self.name = name
+        self.headers = tuple(header for header, _ in columns)
+        self.paths = tuple(path for _, path in columns)
+        self.rows = rows
+
+    def values(self, *args):
+        return self.rows(*args).values_list(*self.paths).iterator(chunk_size=CHUNK_SIZE)
+
+
+# --- Datasets ---
+
+ACCOUNT_DATASETS = {dataset.name: dataset for dataset in (
+    Dataset('profile', (
+        ('username', 'user__username'), ('first_name', 'user__first_name'), ('last_name', 'user__last_name'),
+        ('email', 'user__email'), ('bio', 'bio'), ('location', 'location'),
+        ('profile_picture_url', 'profile_picture_url'), ('date_joined', 'user__date_joined'),
+    ), lambda user: SkillProfile.objects.filter(user=user).order_by()),
+    Dataset('skills', (
+        ('id', 'id'), ('skill', 'skill__name'), ('self_rating', 'self_rating'), ('is_public', 'is_public'),
+        ('endorsements', 'endorsement_stats__count'),
+    ), lambda user: UserSkill.objects.filter(profile_id=user.pk).order_by('skill__name')),
+    Dataset('endorsements_received', (
+        ('id', 'id'), ('endorser', 'endorser__username'), ('skill', 'skill_card__skill__name'),
+        ('endorser_rating', 'endorser_rating'), ('comment', 'comment'), ('endorsed_at', 'endorsed_at'),
+    ), lambda user: Endorsement.objects.filter(recipient=user)),
+    Dataset('endorsements_given', (
+        ('id', 'id'), ('recipient', 'recipient__username'), ('skill', 'skill_card__skill__name'),
+        ('endorser_rating', 'endorser_rating'), ('comment', 'comment'), ('endorsed_at', 'endorsed_at'),
+    ), lambda user: Endorsement.objects.filter(endorser=user)),
+    Dataset('posts', (
+        ('id', 'id'), ('content', 'content'), ('related_skill', 'related_skill__name'), ('created_at', 'created_at'),
+    ), lambda user: Post.objects.filter(author=user)),
+    Dataset('connections', (
+        ('from_user', 'from_user__username'), ('to_user', 'to_user__username'), ('status', 'status'),
+        ('created_at', 'created_at'), ('accepted_at', 'accepted_at'),
+    ), lambda user: Connection.objects.filter(Q(from_user=user) | Q(to_user=user)).order_by('created_at', 'id')),
+)}
+
+
+def _table(name, model, fields):
+    return Dataset(name, tuple((field, field) for field in fields), lambda: model.objects.order_by('pk'))
+
+
+TABLE_DATASETS = {dataset.name: dataset for dataset in (
+    _table('users', User, ('id', 'username', 'first_name', 'last_name', 'email', 'is_active', 'date_joined')),
+    _table('skills', Skill, ('id', 'name', 'description', 'parent_skill_id')),
+    _table('profiles', SkillProfile, ('user_id', 'bio', 'location', 'profile_picture_url', 'follower_count')),
+    _table('userskills', UserSkill, ('id', 'profile_id', 'skill_id', 'self_rating', 'is_public')),
+    _table('endorsements', Endorsement, (
+        'id', 'endorser_id', 'recipient_id', 'skill_card_id', 'endorser_rating', 'comment', 'endorsed_at',
+    )),
+    _table('posts', Post, ('id', 'author_id', 'content', 'related_skill_id', 'created_at')),
+    _table('connections', Connection, ('id', 'from_user_id', 'to_user_id', 'status', 'created_at', 'accepted_at')),
+)}
+
+
+# --- Encoding ---
+
+def _buffered(lines):
+    """
+    Joins small lines into blocks of about FLUSH_BYTES so the server is not
+    asked to write (and the client to receive) one tiny chunk per row.
+    """
+    block, size = [], 0
+    for line in lines:
+        block.append(line)
+        size += len(line)
+        if size >= FLUSH_BYTES:
+            yield ''.join(block).encode()
+            block, size = [], 0
+    if block:
+        yield ''.join(block).encode()
+
+
+def ndjson_lines(exports):
+    """
+    One JSON object per row for each (dataset, args) pair, tagged with the
+    dataset name so several datasets can share one stream.
+    """
+    encoder = DjangoJSONEncoder(ensure_ascii=False)
+    for dataset, args in exports:
+        for values in dataset.values(*args):
+            row = dict(zip(dataset.headers, values))
+            row['type'] = dataset.name
+            yield encoder.encode(row) + '\n'
+
+
+class _Line:
+    # csv.writer target that hands back the formatted line instead of storing it
+    def write(self, value):
+        return value
+
+
+def _cell(value):
+    if isinstance(value, datetime.datetime):
+        return value.isoformat()
+    return value
+
+
+def csv_lines(dataset, *args):
+    writer = csv.writer(_Line())
+    yield writer.writerow(dataset.headers)
+    for values in dataset.values(*args):
+        yield writer.writerow([_cell(value) for value in values])
+
+
+async def _async_blocks(blocks):
+    pull = sync_to_async(next)
+    try:
+        while True:
+            block = await pull(blocks, None)
+            if block is None:
+                return
+            yield block
+    finally:
+        # A client that disconnects mid-export closes the generator, and its cursor
+        await sync_to_async(blocks.close)()
+
+
+def streaming_body(blocks, request):
+    """
+    The body for a StreamingHttpResponse of these blocks: the generator itself
+    under WSGI, an asynchronous iterator over it under ASGI.
+    """
+    if isinstance(getattr(request, '_request', request), ASGIRequest):
+        return _async_blocks(blocks)
+    return blocks
+
+
+def ndjson_stream(exports):
+    return _buffered(ndjson_lines(exports))
+
+
+def csv_stream(dataset, *args):
+    return _buffered(csv_lines(dataset, *args))
+
+
+# --- Renderers ---
+# Export views return StreamingHttpResponse, so these only pick the format
+# (?format= or Accept) and render error responses in it.
+
+class NDJSONRenderer(BaseRenderer):
+    media_type = 'application/x-ndjson'
+    format = 'ndjson'
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        return (json.dumps(data, cls=DjangoJSONEncoder) + '\n').encode()
+
+
+class CSVRenderer(BaseRenderer):
+    media_type = 'text/csv'
+    format = 'csv'
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        data = data if isinstance(data, dict) else {'detail': data}
+        writer = csv.writer(_Line())
+        return (writer.writerow(list(data)) + writer.writerow([str(value) for value in data.values()])).encode()
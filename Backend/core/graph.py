@@ -0,0 +1,265 @@
+"""
+In-memory adjacency index over accepted connections.
+
+Each user's connections are kept as a sorted array('q') of user ids, about 8
+bytes per edge end, so the whole graph of a large site fits in a few hundred MB
+and the graph queries never touch the database:
+
+* mutual(a, b): the smaller list is probed into the larger with bisect,
+  O(small * log(large));
+* suggestions(a): friends-of-friends counted in one pass over a's neighbours'
+  lists, with very well connected neighbours sampled to MAX_NEIGHBOUR_FANOUT
+  entries so one hub account cannot make a query expensive.
+
+The index is built from the Connection table and kept current by the signal
+handlers in core.signals (after commit). It is per process, and those handlers
+only reach the graph of the process that made the write, so the graph is also
+rebuilt once it is GRAPH_MAX_AGE seconds old: connections accepted through
+another worker show up in this one's mutual connections and suggestions within
+that time. Writes that bypass signals (bulk_create, queryset.update() of
+status) must call reset().
+
+Builds run in a background thread (core.background). warm() starts the first one
+on a process's first request (see CoreConfig.ready), and a stale graph keeps
+answering while its replacement is built. Graph queries have no database
+fallback, so a request that needs the graph before the first build is done
+waits for it: at most one build's time, once per process. After reset() the
+next request builds it. With CONNECTION_GRAPH_ASYNC_BUILD = False (the test
+runner's setting) every build runs in the request that finds the graph missing
+or stale.
+"""
+import bisect
+import heapq
+import threading
+import time
+from array import array
+from collections import Counter, defaultdict
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .background import BatchWorker
+from .models import Connection
+
+# Entries read from any one neighbour's list when counting friends-of-friends
+MAX_NEIGHBOUR_FANOUT = 5000
+
+# Rebuild from the database after this many seconds, picking up other processes' writes
+GRAPH_MAX_AGE = getattr(settings, 'CONNECTION_GRAPH_MAX_AGE', 300)
+
+
+def _contains(ids, user_id):
+    i = bisect.bisect_left(ids, user_id)
+    return i < len(ids) and ids[i] == user_id
+
+
+class ConnectionGraph:
+    """
+    Undirected graph of accepted connections. Thread-safe.
+    """
+    EMPTY = array('q')
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._adjacency = {}
+        self.built_at = time.monotonic()
+
+    @classmethod
+    def from_database(cls, chunk_size=10000):
+        graph = cls()
+        lists = defaultdict(list)
+        edges = (
+            Connection.objects.filter(status=Connection.ACCEPTED)
+            .order_by()
+            .values_list('from_user_id', 'to_user_id')
+            .iterator(chunk_size=chunk_size)
+        )
+        for a, b in edges:
+            lists[a].append(b)
+            lists[b].append(a)
+        with graph._lock:
+            for user_id, ids in lists.items():
+                graph._adjacency[user_id] = array('q', sorted(ids))
+        return graph
+
+    def __len__(self):
+        return len(self._adjacency)
+
+    @property
+    def stale(self):
+        return time.monotonic() - self.built_at > GRAPH_MAX_AGE
+
+    # --- Incremental maintenance (idempotent) ---
+
+    def _link(self, a, b):
+        ids = self._adjacency.setdefault(a, array('q'))
+        i = bisect.bisect_left(ids, b)
+        if i == len(ids) or ids[i] != b:
+            ids.insert(i, b)
+
+    def _unlink(self, a, b):
+        ids = self._adjacency.get(a)
+        if ids is None:
+            return
+        i = bisect.bisect_left(ids, b)
+        if i < len(ids) and ids[i] == b:
+            del ids[i]
+            if not ids:
+                del self._adjacency[a]
+
+    def add_edge(self, a, b):
+        with self._lock:
+            self._link(a, b)
+            self._link(b, a)
+
+    def remove_edge(self, a, b):
+        with self._lock:
+            self._unlink(a, b)
+            self._unlink(b, a)
+
+    # --- Queries ---
+
+    def neighbours(self, user_id):
+        return self._adjacency.get(user_id, self.EMPTY)
+
+    def degree(self, user_id):
+        return len(self.neighbours(user_id))
+
+    def connected(self, a, b):
+        return _contains(self.neighbours(a), b)
+
+    def mutual(self, a, b):
+        """
+        Sorted ids of the users connected to both a and b.
+        """
+        with self._lock:
+            small, large = sorted((self.neighbours(a), self.neighbours(b)), key=len)
+            return [user_id for user_id in small if _contains(large, user_id)]
+
+    def suggestions(self, user_id, limit=20, exclude=()):
+        """
+        Up to 'limit' (candidate_id, mutual_count) pairs: users two steps away
+        who are not yet connected, most mutual connections first.
+        """
+        with self._lock:
+            direct = self.neighbours(user_id)
+            counts = Counter()
+            for friend in direct:
+                ids = self.neighbours(friend)
+                if len(ids) > MAX_NEIGHBOUR_FANOUT:
+                    # Evenly spaced sample of a hub's list
+                    step = len(ids) / MAX_NEIGHBOUR_FANOUT
+                    ids = [ids[int(i * step)] for i in range(MAX_NEIGHBOUR_FANOUT)]
+                counts.update(ids)
+        counts.pop(user_id, None)
+        for other in exclude:
+            counts.pop(other, None)
+        return heapq.nsmallest(
+            limit,
+            ((candidate, n) for candidate, n in counts.items() if not _contains(direct, candidate)),
+            key=lambda item: (-item[1], item[0]),
+        )
+
+
+# --- Shared instance ---
+
+_graph = None
+_graph_lock = threading.Lock()
+
+
+def _async_build():
+    # Read on every call, so the test runner and override_settings apply
+    return getattr(settings, 'CONNECTION_GRAPH_ASYNC_BUILD', True)
+
+
+def _rebuild(keys=None):
+    global _graph
+    # Under the lock, so a request waiting for a first graph does not build another
+    with _graph_lock:
+        if _graph is None or _graph.stale:
+            _graph = ConnectionGraph.from_database()
+
+
+builder = BatchWorker('connection-graph-builder', _rebuild)
+
+
+def warm():
+    """
+    Starts building the graph in the background if it has not been built yet.
+    """
+    if _graph is None and _async_build():
+        builder.schedule({'graph'})
+
+
+def get_graph():
+    """
+    Returns the process-wide graph, building it from the database if there is
+    none yet. A stale graph is returned as is while a background rebuild runs.
+    """
+    current = _graph
+    if current is not None and current.stale and _async_build():
+        builder.schedule({'graph'})
+        return current
+    if current is None or current.stale:
+        _rebuild()
+    return _graph
+
+
+def loaded_graph():
+    """
+    The graph if it has been built, else None. Signal handlers only maintain a
+    graph that exists; one built later reads the current rows anyway.
+    """
+    return _graph
+
+
+def reset():
+    """
+    Drops the graph so the next query rebuilds it.
+    """
+    global _graph
+    with _graph_lock:
+        _graph = None
+
+
+# --- Requests ---
+
+def _pair(a, b):
+    return Connection.objects.filter(Q(from_user=a, to_user=b) | Q(from_user=b, to_user=a))
+
+
+def request_connection(from_user, to_user):
+    """
+    Asks to connect. If to_user already asked from_user, that request is accepted
+    instead. Returns (connection, created).
+    """
+    with transaction.atomic():
+        existing = _pair(from_user, to_user).select_for_update().first()
+        if existing is None:
+            try:
+                with transaction.atomic():
+                    return Connection.objects.create(from_user=from_user, to_user=to_user), True
+            except IntegrityError:
+                # A concurrent request for the same pair won the unique constraint
+                existing = _pair(from_user, to_user).get()
+        if existing.status == Connection.PENDING and existing.to_user_id == from_user.pk:
+            accept(existing)
+        return existing, False
+
+
+def accept(connection):
+    connection.status = Connection.ACCEPTED
+    connection.accepted_at = timezone.now()
+    connection.save(update_fields=['status', 'accepted_at'])
+
+
+def pending_with(user_id):
+    """
+    Ids of users with a pending request to or from the user (never suggested).
+    """
+    rows = Connection.objects.filter(
+        Q(from_user_id=user_id) | Q(to_user_id=user_id), status=Connection.PENDING
+    ).order_by().values_list('from_user_id', 'to_user_id')
+    return {a if b == user_id else b for a, b in rows}
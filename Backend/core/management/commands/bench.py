@@ -0,0 +1,210 @@
+import json
+import platform
+import re
+import statistics
+import time
+import tracemalloc
+
+import django
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Q
+from django.test import Client, override_settings
+from django.urls import URLPattern, URLResolver, get_resolver
+
+from core.models import Skill, SkillProfile, UserSkill, Post, Endorsement, Notification, Connection
+
+# Never driven: the SSE stream does not end
+SKIP = {'async-notification-stream'}
+
+GROUP = re.compile(r'\(\?P<(\w+)>[^)]*\)|<(?:\w+:)?(\w+)>')
+
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(fraction * len(sorted_values)))]
+
+
+def api_routes(resolver=None, prefix=''):
+    """
+    Yields (name, route, methods) for every URL under core.urls, with route as a
+    template such as 'api/skills/{pk}/'. Format-suffix variants are left out.
+    """
+    resolver = resolver or get_resolver()
+    for pattern in resolver.url_patterns:
+        route = str(pattern.pattern).lstrip('^').rstrip('$').replace('\\.', '.')
+        if isinstance(pattern, URLResolver):
+            if pattern.urlconf_name == 'core.urls' or getattr(pattern.urlconf_module, '__name__', '') == 'core.urls':
+                yield from api_routes(pattern, prefix + route)
+            continue
+        if not isinstance(pattern, URLPattern) or 'format' in pattern.pattern.regex.groupindex:
+            continue
+        actions = getattr(pattern.callback, 'actions', None)
+        methods = sorted(actions) if actions else ['get']
+        route = GROUP.sub(lambda m: '{%s}' % (m.group(1) or m.group(2)), prefix + route)
+        yield pattern.name, route, methods
+
+
+class Command(BaseCommand):
+    help = (
+        "Drives every GET route in core/urls.py with the test client against the current "
+        "database and reports per-endpoint query counts, p50/p95/p99 latency and allocated "
+        "memory as JSON, for diffing across versions. Seed realistic volumes first with "
+        "'manage.py seed'. Write routes are listed but not driven."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', help="Username to authenticate as (default: the most followed profile).")
+        parser.add_argument('--requests', type=int, default=50, help="Timed requests per endpoint.")
+        parser.add_argument('--warmup', type=int, default=3, help="Untimed requests per endpoint first.")
+        parser.add_argument('--only', action='append', help="Limit the run to these route names (repeatable).")
+        parser.add_argument('--output', help="Write the JSON report to this file instead of stdout.")
+        parser.add_argument('--compare', help="Earlier JSON report to print p50 and query deltas against.")
+
+    def bench_user(self, username):
+        if username:
+            try:
+                return User.objects.get(username=username)
+            except User.DoesNotExist:
+                raise CommandError(f"No user named '{username}'.")
+        profile = SkillProfile.objects.select_related('user').order_by('-follower_count').first()
+        if profile is None:
+            raise CommandError("No profiles to benchmark with; run 'manage.py seed' first.")
+        return profile.user
+
+    def route_values(self, user):
+        """
+        Sample values for the URL parameters of each route, taken from the user's
+        own rows where there is a choice.
+        """
+        other = User.objects.exclude(pk=user.pk).order_by('pk').first() or user
+        by_basename = {
+            'skill': Skill.objects.order_by('pk').values_list('pk', flat=True).first(),
+            'profile': user.username,
+            'userskill': UserSkill.objects.filter(profile_id=user.pk).values_list('pk', flat=True).first(),
+            'endorsement': Endorsement.objects.filter(recipient=user).values_list('pk', flat=True).first(),
+            'post': Post.objects.filter(author=user).values_list('pk', flat=True).first(),
+            'notification': Notification.objects.filter(recipient=user).values_list('pk', flat=True).first(),
+            'connection': Connection.objects.filter(Q(from_user=user) | Q(to_user=user)).values_list('pk', flat=True).first(),
+            'export': 'skills',
+        }
+        return by_basename, {'username': other.username, 'table': 'skills'}
+
+    def fill(self, name, route, by_basename, shared):
+        def value(match):
+            key = match.group(1)
+            if key in shared:
+                return str(shared[key])
+            sample = by_basename.get(name.rsplit('-', 1)[0])
+            if sample is None:
+                raise KeyError(key)
+            return str(sample)
+        return '/' + re.sub(r'\{(\w+)\}', value, route)
+
+    def measure(self, client, path):
+        def fetch():
+            response = client.get(path, HTTP_ACCEPT='application/json, */*')
+            if response.streaming:
+                b''.join(response.streaming_content)
+            return response
+
+        for _ in range(self.warmup):
+            fetch()
+        # Counted with a wrapper: connection.queries is reset at the start of each request
+        queries = []
+        with connection.execute_wrapper(lambda execute, sql, *args: queries.append(sql) or execute(sql, *args)):
+            response = fetch()
+
+        latencies = []
+        for _ in range(self.requests):
+            started = time.perf_counter()
+            fetch()
+            latencies.append((time.perf_counter() - started) * 1000)
+        latencies.sort()
+
+        # Separate pass: tracing allocations slows every request down
+        tracemalloc.start()
+        try:
+            before = tracemalloc.get_traced_memory()[0]
+            tracemalloc.reset_peak()
+            fetch()
+            current, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+
+        return {
+            'status': response.status_code,
+            'queries': len(queries),
+            'p50_ms': round(percentile(latencies, 0.50), 3),
+            'p95_ms': round(percentile(latencies, 0.95), 3),
+            'p99_ms': round(percentile(latencies, 0.99), 3),
+            'mean_ms': round(statistics.fmean(latencies), 3) if latencies else 0.0,
+            'peak_alloc_kb': round((peak - before) / 1024, 1),
+            'retained_kb': round((current - before) / 1024, 1),
+        }
+
+    def handle(self, *args, **options):
+        self.requests, self.warmup = max(options['requests'], 1), options['warmup']
+        user = self.bench_user(options['user'])
+        by_basename, shared = self.route_values(user)
+        # A host the settings accept; with DEBUG and no ALLOWED_HOSTS that is localhost
+        hosts = [host for host in settings.ALLOWED_HOSTS if host != '*' and not host.startswith('.')]
+        client = Client(HTTP_HOST=hosts[0] if hosts else 'localhost')
+        client.force_login(user)
+
+        endpoints, skipped = {}, []
+        for name, route, methods in api_routes():
+            if name in SKIP or (options['only'] and name not in options['only']):
+                continue
+            if 'get' not in methods:
+                skipped.append({'name': name, 'route': route, 'reason': 'write-only route'})
+                continue
+            try:
+                path = self.fill(name, route, by_basename, shared)
+            except KeyError as exc:
+                skipped.append({'name': name, 'route': route, 'reason': f'no sample value for {exc}'})
+                continue
+            self.stderr.write(f"  {name} {path}")
+            # Rate limits would turn a long run into a measurement of 429s
+            with override_settings(THROTTLE=dict(getattr(settings, 'THROTTLE', {}), SCOPES={})):
+                endpoints[name] = dict(path=path, **self.measure(client, path))
+
+        report = {
+            'meta': {
+                'timestamp': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+                'django': django.get_version(),
+                'python': platform.python_version(),
+                'database': connection.vendor,
+                'user': user.username,
+                'requests': self.requests,
+                'rows': {
+                    'users': User.objects.count(), 'skills': Skill.objects.count(),
+                    'userskills': UserSkill.objects.count(), 'endorsements': Endorsement.objects.count(),
+                    'posts': Post.objects.count(),
+                },
+            },
+            'endpoints': endpoints,
+            'skipped': skipped,
+        }
+        output = json.dumps(report, indent=2)
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                f.write(output + '\n')
+        else:
+            self.stdout.write(output)
+
+        if options['compare']:
+            with open(options['compare']) as f:
+                baseline = json.load(f)['endpoints']
+            self.stderr.write(f"{'endpoint':<32}{'p50 ms':>10}{'delta':>10}{'queries':>9}{'delta':>7}")
+            for name, result in endpoints.items():
+                old = baseline.get(name)
+                if old is None:
+                    continue
+                self.stderr.write(
+                    f"{name:<32}{result['p50_ms']:>10.2f}{result['p50_ms'] - old['p50_ms']:>+10.2f}"
+                    f"{result['queries']:>9}{result['queries'] - old['queries']:>+7}"
+                )
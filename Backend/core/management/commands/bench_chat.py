@@ -0,0 +1,150 @@
+import asyncio
+import json
+import time
+
+from asgiref.sync import sync_to_async
+from django.contrib.auth import BACKEND_SESSION_KEY, HASH_SESSION_KEY, SESSION_KEY
+from django.contrib.auth.models import User
+from django.contrib.sessions.backends.db import SessionStore
+from django.core.management.base import BaseCommand, CommandError
+from django.test.utils import override_settings
+
+from core import chat
+from core.chat_gateway import PATH, application
+from core.management.commands.loadtest import percentile
+
+
+class Client:
+    """
+    An in-process WebSocket client of the gateway.
+    """
+    def __init__(self, session_key):
+        self.session_key = session_key
+        self.inbox = asyncio.Queue()
+        self.received = 0
+        self.acked = {}
+        self.errors = 0
+        self.done = asyncio.Event()
+        self.expected = 0
+
+    async def connect(self):
+        scope = {
+            'type': 'websocket', 'path': PATH, 'query_string': b'', 'client': ('127.0.0.1', 0),
+            'headers': [(b'host', b'localhost'), (b'cookie', f'sessionid={self.session_key}'.encode())],
+        }
+        self.task = asyncio.create_task(application(scope, self.inbox.get, self.on_send))
+        self.accepted = asyncio.get_running_loop().create_future()
+        await self.inbox.put({'type': 'websocket.connect'})
+        await self.accepted
+
+    async def on_send(self, message):
+        if message['type'] == 'websocket.accept':
+            self.accepted.set_result(True)
+        elif message['type'] == 'websocket.close':
+            self.accepted.set_exception(CommandError("The gateway refused a connection."))
+        else:
+            event = json.loads(message['text'])
+            if event['type'] == 'ack':
+                self.acked[event['ref']] = time.perf_counter()
+            elif event['type'] == 'message':
+                self.received += 1
+            elif event['type'] == 'error':
+                self.errors += 1
+            if self.received >= self.expected:
+                self.done.set()
+
+    async def send(self, chat_id, ref):
+        frame = {'type': 'send', 'chat': chat_id, 'content': f'benchmark message {ref}', 'ref': ref}
+        await self.inbox.put({'type': 'websocket.receive', 'text': json.dumps(frame)})
+
+    async def close(self):
+        await self.inbox.put({'type': 'websocket.disconnect'})
+        await self.task
+
+
+class Command(BaseCommand):
+    help = (
+        "Measures chat throughput through the WebSocket gateway in this process: "
+        "clients in two-person chats send messages as fast as the gateway accepts them, "
+        "and the report gives messages per second from first send to last delivery, "
+        "with the latency from send to acknowledgement (batch committed)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chats', type=int, default=100, help="Two-person chats, between existing users.")
+        parser.add_argument('--messages', type=int, default=20000, help="Messages sent in total, spread over the chats.")
+        parser.add_argument('--output', help="Write the JSON report to this file instead of stdout.")
+
+    def handle(self, *args, **options):
+        users = list(User.objects.order_by('pk')[:options['chats'] * 2])
+        if len(users) < options['chats'] * 2:
+            raise CommandError(f"{options['chats']} chats need {options['chats'] * 2} users; run 'manage.py seed' first.")
+        chats = [chat.create_chat(users[i:i + 2]) for i in range(0, len(users), 2)]
+        sessions = {user.pk: self.login(user) for user in users}
+        try:
+            # The benchmark sends far faster than the per-user rate limit allows
+            with override_settings(THROTTLE={'SCOPES': {}}):
+                report = asyncio.run(self.run(chats, users, sessions, options['messages']))
+        finally:
+            for session in sessions.values():
+                session.delete()
+            for conversation in chats:
+                conversation.delete()
+
+        output = json.dumps(report, indent=2)
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                f.write(output + '\n')
+        else:
+            self.stdout.write(output)
+
+    def login(self, user):
+        session = SessionStore()
+        session[SESSION_KEY] = str(user.pk)
+        session[BACKEND_SESSION_KEY] = settings.AUTHENTICATION_BACKENDS[0]
+        session[HASH_SESSION_KEY] = user.get_session_auth_hash()
+        session.create()
+        return session
+
+    async def run(self, chats, users, sessions, total):
+        clients = {user.pk: Client(sessions[user.pk].session_key) for user in users}
+        for client in clients.values():
+            await client.connect()
+
+        # The first member of each chat sends, the second receives
+        plan = [(chats[i % len(chats)].pk, users[2 * (i % len(chats))].pk, users[2 * (i % len(chats)) + 1].pk) for i in range(total)]
+        for _, sender_id, recipient_id in plan:
+            clients[recipient_id].expected += 1
+            clients[sender_id].expected += 1   # senders see their own messages too
+        sent_at = {}
+        started = time.perf_counter()
+        for ref, (chat_id, sender_id, _) in enumerate(plan):
+            sent_at[ref] = time.perf_counter()
+            await clients[sender_id].send(chat_id, ref)
+            if ref % 100 == 0:
+                # Let the gateway read frames while the clients keep sending
+                await asyncio.sleep(0)
+        await asyncio.gather(*(client.done.wait() for client in clients.values() if client.expected))
+        elapsed = time.perf_counter() - started
+
+        latencies = sorted(
+            (client.acked[ref] - sent_at[ref]) * 1000
+            for client in clients.values() for ref in client.acked
+        )
+        errors = sum(client.errors for client in clients.values())
+        for client in clients.values():
+            await client.close()
+        stored = await sync_to_async(lambda: sum(c.messages.count() for c in chats))()
+        return {
+            'chats': len(chats),
+            'messages': total,
+            'stored': stored,
+            'errors': errors,
+            'seconds': round(elapsed, 3),
+            'messages_per_second': round(total / elapsed),
+            'ack_ms': {
+                'p50': round(percentile(latencies, 0.5), 2),
+                'p99': round(percentile(latencies, 0.99), 2),
+                'max': round(latencies[-1], 2) if latencies else 0.0,
+            },
+        }
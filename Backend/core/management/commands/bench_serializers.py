@@ -0,0 +1,96 @@
+import json
+import statistics
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework.renderers import JSONRenderer
+
+from core import renderers
+from core.models import Post, Endorsement, UserSkill
+from core.renderers import ORJSONRenderer
+from core.serializers import (
+    PostSerializer, EndorsementSerializer, UserSkillSerializer,
+    PostValuesSerializer, EndorsementValuesSerializer, UserSkillValuesSerializer,
+)
+
+# name -> (model, rows per response, ModelSerializer, ValuesSerializer)
+SCENARIOS = {
+    'feed_page': (Post, 50, PostSerializer, PostValuesSerializer),
+    'endorsement_list': (Endorsement, 1000, EndorsementSerializer, EndorsementValuesSerializer),
+    'userskill_list': (UserSkill, 50, UserSkillSerializer, UserSkillValuesSerializer),
+}
+
+
+class Command(BaseCommand):
+    help = (
+        "Measures serialization throughput of the list endpoints' response bodies: "
+        "ModelSerializer + JSONRenderer against the .values() serializers + ORJSONRenderer, "
+        "for 50-post feed pages, 1,000-row endorsement lists and 50-card skill lists. "
+        "Reports per-response time for loading rows, building data and rendering bytes."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeat', type=int, default=200, help="Timed responses per scenario and pipeline.")
+        parser.add_argument('--only', action='append', choices=sorted(SCENARIOS), help="Limit the run to these scenarios.")
+        parser.add_argument('--output', help="Write the JSON report to this file instead of stdout.")
+
+    def timed(self, function):
+        timings = []
+        for _ in range(self.repeat):
+            started = time.perf_counter()
+            result = function()
+            timings.append((time.perf_counter() - started) * 1000)
+        return result, statistics.median(timings)
+
+    def pipeline(self, load, serialize, renderer):
+        rows, load_ms = self.timed(load)
+        data, serialize_ms = self.timed(lambda: serialize(rows).data)
+        body, render_ms = self.timed(lambda: renderer.render(data))
+        total_ms = load_ms + serialize_ms + render_ms
+        return body, {
+            'load_ms': round(load_ms, 3),
+            'serialize_ms': round(serialize_ms, 3),
+            'render_ms': round(render_ms, 3),
+            'total_ms': round(total_ms, 3),
+            'rows_per_second': round(len(rows) / total_ms * 1000),
+        }
+
+    def handle(self, *args, **options):
+        self.repeat = max(options['repeat'], 1)
+        report = {'orjson': renderers.orjson is not None, 'repeat': self.repeat, 'scenarios': {}}
+        for name, (model, size, serializer_class, values_serializer_class) in SCENARIOS.items():
+            if options['only'] and name not in options['only']:
+                continue
+            queryset = model.objects.all()[:size]
+            rows = queryset.count()
+            if rows < size:
+                raise CommandError(f"{name} needs {size} {model.__name__} rows, found {rows}; run 'manage.py seed' first.")
+            self.stderr.write(f"  {name} ({size} rows)")
+
+            plan = serializer_class.query_plan
+            baseline_body, baseline = self.pipeline(
+                lambda: list(plan.apply(model.objects.all())[:size]),
+                lambda rows: serializer_class(rows, many=True),
+                JSONRenderer(),
+            )
+            fast_body, fast = self.pipeline(
+                lambda: list(model.objects.values(*values_serializer_class.columns)[:size]),
+                lambda rows: values_serializer_class(rows, many=True),
+                ORJSONRenderer(),
+            )
+            if fast_body != baseline_body:
+                raise CommandError(f"{name}: the two pipelines rendered different bodies.")
+            report['scenarios'][name] = {
+                'rows': size,
+                'bytes': len(fast_body),
+                'model_serializer': baseline,
+                'values_serializer': fast,
+                'speedup': round(baseline['total_ms'] / fast['total_ms'], 2),
+            }
+
+        output = json.dumps(report, indent=2)
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                f.write(output + '\n')
+        else:
+            self.stdout.write(output)
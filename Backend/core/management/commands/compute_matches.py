@@ -0,0 +1,27 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from core import matching
+
+
+class Command(BaseCommand):
+    help = "Recomputes the top-K teach/learn matches for every user (see core/matching.py)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--top-k', type=int, default=matching.DEFAULT_TOP_K,
+                            help="Number of matches kept per user.")
+        parser.add_argument('--chunk-size', type=int, default=matching.DEFAULT_CHUNK_SIZE,
+                            help="Number of users scored per block; bounds peak memory.")
+
+    def handle(self, *args, **options):
+        engine = 'NumPy/SciPy' if matching.sparse is not None else 'pure Python'
+        self.stdout.write(f"Scoring with the {engine} engine...")
+        started = time.perf_counter()
+        done = 0
+        for done in matching.compute_matches(top_k=options['top_k'], chunk_size=options['chunk_size']):
+            self.stdout.write(f"  {done} users matched", ending='\r')
+        self.stdout.write('')
+        self.stdout.write(self.style.SUCCESS(
+            f"Computed matches for {done} users in {time.perf_counter() - started:.1f}s."
+        ))
@@ -0,0 +1,142 @@
+import asyncio
+import time
+from urllib.parse import urlsplit
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.contrib.sessions.backends.db import SessionStore
+from django.contrib.auth import BACKEND_SESSION_KEY, HASH_SESSION_KEY, SESSION_KEY
+from django.core.management.base import BaseCommand, CommandError
+
+# (name, DRF path on the WSGI deployment, async path on the ASGI deployment)
+HOT_PATHS = (
+    ('feed', '/api/posts/user_feed/', '/api/async/feed/'),
+    ('profile', '/api/profiles/{username}/', '/api/async/profiles/{username}/'),
+    ('search', '/api/skills/search/?q=py', '/api/async/skills/search/?q=py'),
+    ('endorsements', '/api/endorsements/', '/api/async/endorsements/'),
+)
+
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(fraction * len(sorted_values)))]
+
+
+async def read_response(reader):
+    head = await reader.readuntil(b'\r\n\r\n')
+    lines = head.decode('latin-1').split('\r\n')
+    status = int(lines[0].split(' ', 2)[1])
+    headers = {}
+    for line in lines[1:]:
+        if ':' in line:
+            key, value = line.split(':', 1)
+            headers[key.strip().lower()] = value.strip()
+    if headers.get('transfer-encoding', '').lower() == 'chunked':
+        while True:
+            size = int((await reader.readuntil(b'\r\n')).split(b';')[0], 16)
+            await reader.readexactly(size + 2)
+            if size == 0:
+                break
+    else:
+        await reader.readexactly(int(headers.get('content-length', 0)))
+    return status, headers.get('connection', '').lower() != 'close'
+
+
+async def client(host, port, request, deadline, latencies, errors):
+    reader = writer = None
+    while time.perf_counter() < deadline:
+        try:
+            if writer is None:
+                reader, writer = await asyncio.open_connection(host, port)
+            started = time.perf_counter()
+            writer.write(request)
+            status, keep_alive = await read_response(reader)
+            if status == 200:
+                latencies.append(time.perf_counter() - started)
+            else:
+                errors[status] = errors.get(status, 0) + 1
+            if not keep_alive:
+                writer.close()
+                writer = None
+        except (OSError, asyncio.IncompleteReadError, asyncio.LimitOverrunError, ValueError) as exc:
+            errors[type(exc).__name__] = errors.get(type(exc).__name__, 0) + 1
+            if writer is not None:
+                writer.close()
+            writer = None
+            await asyncio.sleep(0.05)
+    if writer is not None:
+        writer.close()
+
+
+async def run(url, cookie, concurrency, duration):
+    parts = urlsplit(url)
+    path = parts.path + (f'?{parts.query}' if parts.query else '')
+    request = (
+        f'GET {path} HTTP/1.1\r\nHost: {parts.netloc}\r\nAccept: application/json\r\n'
+        f'Cookie: {cookie}\r\nConnection: keep-alive\r\n\r\n'
+    ).encode('latin-1')
+    latencies, errors = [], {}
+    deadline = time.perf_counter() + duration
+    await asyncio.gather(*(
+        client(parts.hostname, parts.port or 80, request, deadline, latencies, errors) for _ in range(concurrency)
+    ))
+    latencies.sort()
+    return {
+        'requests': len(latencies),
+        'rps': len(latencies) / duration,
+        'p50': percentile(latencies, 0.50) * 1000,
+        'p99': percentile(latencies, 0.99) * 1000,
+        'errors': errors,
+    }
+
+
+class Command(BaseCommand):
+    help = (
+        "Load-tests the hot read endpoints with many concurrent keep-alive clients and reports "
+        "req/s and p50/p99 latency, comparing the DRF endpoints on a WSGI server with the "
+        "async endpoints (core/async_views.py) on an ASGI server. Start both servers against "
+        "the same database first, e.g.\n"
+        "  gunicorn skilllink_backend_config.wsgi -w 4 --threads 8 -b 127.0.0.1:8000\n"
+        "  uvicorn skilllink_backend_config.asgi:application --workers 4 --port 8001"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--wsgi', help="Base URL of the WSGI deployment, e.g. http://127.0.0.1:8000")
+        parser.add_argument('--asgi', help="Base URL of the ASGI deployment, e.g. http://127.0.0.1:8001")
+        parser.add_argument('--user', required=True, help="Username whose feed, profile and endorsements are read.")
+        parser.add_argument('--concurrency', type=int, default=500, help="Concurrent client connections.")
+        parser.add_argument('--duration', type=float, default=20.0, help="Seconds per endpoint.")
+        parser.add_argument('--only', action='append', choices=[name for name, _, _ in HOT_PATHS],
+                            help="Limit the run to these endpoints (repeatable).")
+
+    def session_cookie(self, username):
+        # A real login session, so both deployments authenticate the clients the same way
+        try:
+            user = User.objects.get(username=username)
+        except User.DoesNotExist:
+            raise CommandError(f"No user named '{username}'.")
+        session = SessionStore()
+        session[SESSION_KEY] = str(user.pk)
+        session[BACKEND_SESSION_KEY] = settings.AUTHENTICATION_BACKENDS[0]
+        session[HASH_SESSION_KEY] = user.get_session_auth_hash()
+        session.create()
+        return f'{settings.SESSION_COOKIE_NAME}={session.session_key}'
+
+    def handle(self, *args, **options):
+        targets = [(label, options[label]) for label in ('wsgi', 'asgi') if options[label]]
+        if not targets:
+            raise CommandError("Pass --wsgi and/or --asgi.")
+        cookie = self.session_cookie(options['user'])
+
+        self.stdout.write(f"{'endpoint':<14}{'server':<8}{'requests':>10}{'req/s':>10}{'p50 ms':>10}{'p99 ms':>10}  errors")
+        for name, sync_path, async_path in HOT_PATHS:
+            if options['only'] and name not in options['only']:
+                continue
+            for label, base_url in targets:
+                path = (sync_path if label == 'wsgi' else async_path).format(username=options['user'])
+                result = asyncio.run(run(base_url.rstrip('/') + path, cookie, options['concurrency'], options['duration']))
+                self.stdout.write(
+                    f"{name:<14}{label:<8}{result['requests']:>10}{result['rps']:>10.1f}"
+                    f"{result['p50']:>10.1f}{result['p99']:>10.1f}  {result['errors'] or ''}"
+                )
@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+
+from core import endorsement_stats, response_cache
+
+
+class Command(BaseCommand):
+    help = "Rebuilds the EndorsementStats aggregates for every UserSkill card from the Endorsement table."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--chunk-size', type=int, default=2000,
+            help="Number of UserSkill cards aggregated per GROUP BY pass and transaction.",
+        )
+
+    def handle(self, *args, **options):
+        scanned = written = 0
+        for scanned, written in endorsement_stats.rebuild_all(chunk_size=options['chunk_size']):
+            self.stdout.write(f"  {scanned} cards scanned, {written} stats rows written", ending='\r')
+        self.stdout.write('')
+        # The upserts bypass model signals, so retire every cached profile page
+        response_cache.bump('profiles')
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt endorsement stats: {written} cards with endorsements out of {scanned}."))
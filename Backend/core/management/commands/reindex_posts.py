@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand
+
+from core import post_search
+from core.models import Post
+
+
+class Command(BaseCommand):
+    help = (
+        "Rebuilds the full-text search document of every post (core.post_search), "
+        "streaming Post in primary-key chunks. Run after migrating an existing "
+        "database and after loading posts with bulk_create or raw SQL."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--chunk-size', type=int, default=2000,
+            help="Number of posts tokenized and written per transaction.",
+        )
+
+    def handle(self, *args, **options):
+        total = Post.objects.count()
+        indexed = 0
+        for indexed in post_search.reindex_all(chunk_size=options['chunk_size']):
+            self.stdout.write(f"  {indexed} / {total} posts indexed", ending='\r')
+        self.stdout.write('')
+        self.stdout.write(self.style.SUCCESS(f"Reindexed {indexed} posts."))
@@ -0,0 +1,45 @@
+import time
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+
+from core import seeding
+from core.models import Skill, UserSkill, Post, Endorsement, Follow, Connection, TimelineEntry
+
+
+class Command(BaseCommand):
+    help = (
+        "Fills the database with synthetic users, profiles, skills, cards, endorsements, posts, "
+        "follows and connections, with power-law popularity (see core/seeding.py). Adds to "
+        "existing data; point DATABASES at a scratch copy for large runs."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000, help="Number of users to create.")
+        parser.add_argument('--skills', type=int, default=200, help="Number of skills to create.")
+        parser.add_argument('--skills-per-user', type=float, default=5, help="Mean UserSkill cards per user.")
+        parser.add_argument('--endorsements-per-card', type=float, default=2, help="Mean endorsements per card.")
+        parser.add_argument('--posts-per-user', type=float, default=5, help="Mean posts per user.")
+        parser.add_argument('--follows-per-user', type=float, default=10, help="Mean followees per user.")
+        parser.add_argument('--connections-per-user', type=float, default=5, help="Mean connection requests sent per user.")
+        parser.add_argument('--prefix', default='seed', help="Username prefix; numbering continues after existing users.")
+        parser.add_argument('--chunk-size', type=int, default=1000, help="Users written per transaction.")
+        parser.add_argument('--random-seed', type=int, help="Seed for a reproducible data set.")
+
+    def handle(self, *args, **options):
+        models = (User, Skill, UserSkill, Endorsement, Post, Follow, Connection, TimelineEntry)
+        before = {model: model.objects.count() for model in models}
+        started = time.perf_counter()
+        for stage, done, total in seeding.seed(
+            users=options['users'], skills=options['skills'], skills_per_user=options['skills_per_user'],
+            endorsements_per_card=options['endorsements_per_card'], posts_per_user=options['posts_per_user'],
+            follows_per_user=options['follows_per_user'], connections_per_user=options['connections_per_user'],
+            prefix=options['prefix'], chunk_size=options['chunk_size'], random_seed=options['random_seed'],
+        ):
+            self.stdout.write(f"  {stage}: {done}/{total}", ending='\r')
+        self.stdout.write('')
+        for model in models:
+            self.stdout.write(f"  {model._meta.verbose_name_plural}: +{model.objects.count() - before[model]}")
+        self.stdout.write(self.style.SUCCESS(
+            f"Seeded in {time.perf_counter() - started:.1f}s. Run 'manage.py compute_matches' to fill SkillMatch."
+        ))
@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from core import timeline
+
+
+class Command(BaseCommand):
+    help = (
+        "Switches authors between fan-out-on-write and fan-out-on-read as their follower counts call for, "
+        "materializing the posts of those leaving fan-out-on-read (see core/timeline.py)."
+    )
+
+    def handle(self, *args, **options):
+        entered, left = timeline.sync_fanout_modes()
+        self.stdout.write(self.style.SUCCESS(
+            f"{entered} authors moved to fan-out-on-read, {left} back to fan-out-on-write."
+        ))
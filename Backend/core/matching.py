@@ -0,0 +1,274 @@
+"""
+Batch teach/learn matching.
+
+Each public UserSkill card is read as either a skill the user can teach
+(self_rating >= TEACH_MIN_RATING) or one they are still learning. Two sparse
+user x skill matrices are built from the cards:
+
+* T, "can teach": weight = self_rating / 5 * (1 + log(1 + endorsements))
+* L, "wants to learn": lower self-ratings weigh more
+
+Rows are L2-normalized, so for users a and b
+
+    score(a, b) = cos(L[a], T[b]) + cos(T[a], L[b])
+
+is high when b can teach what a is learning and a can teach what b is learning.
+Scores are computed for a block of users at a time with two sparse matrix
+products (block x users), and only the top K per user are kept. Two limits keep
+the work and memory bounded on real, heavily skewed data:
+
+* per skill, only the MAX_POSTINGS strongest teachers and learners are scored
+  as candidates, so a skill half the users list costs MAX_POSTINGS per learner
+  rather than half the user base;
+* blocks are split further so the estimated non-zeros of a block's score
+  matrix stay under MAX_BLOCK_NNZ.
+
+The results are written to SkillMatch and served by GET /api/profiles/matches/.
+
+NumPy and SciPy are used when installed; otherwise a pure-Python engine with
+the same scoring runs, which is fine for development-sized databases.
+"""
+import heapq
+import math
+from array import array
+from collections import defaultdict
+
+from django.db import transaction
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .models import UserSkill, SkillMatch
+
+try:
+    import numpy as np
+    from scipy import sparse
+except ImportError:  # pragma: no cover - depends on the environment
+    np = sparse = None
+
+# Cards rated at or above this are skills the user can teach; below it, skills they are learning
+TEACH_MIN_RATING = 3
+
+DEFAULT_TOP_K = 20
+DEFAULT_CHUNK_SIZE = 2000
+
+# Candidates considered per skill on each side of the exchange
+MAX_POSTINGS = 1000
+
+# Upper bound on the estimated non-zero scores held in memory for one block
+MAX_BLOCK_NNZ = 5_000_000
+
+
+def teach_weight(self_rating, endorsement_count):
+    return self_rating / 5 * (1 + math.log1p(endorsement_count))
+
+
+def learn_weight(self_rating):
+    # 1 -> 1.0, 2 -> 0.5 with the default threshold
+    return (TEACH_MIN_RATING - self_rating) / (TEACH_MIN_RATING - 1)
+
+
+# --- Loading ---
+
+class CardSet:
+    """
+    The public cards of every user, as (row, column, weight) triplets of the
+    teach and learn matrices. Rows are users, columns are skills.
+
+    Ids, rows and columns are array('q') and weights array('d'): 8 bytes per
+    value rather than a pointer to an int or float object, and NumPy reads the
+    buffers in place.
+    """
+    def __init__(self):
+        self.user_ids = array('q')
+        self.user_index = {}
+        self.skill_index = {}
+        self.teach = (array('q'), array('q'), array('d'))
+        self.learn = (array('q'), array('q'), array('d'))
+
+    @classmethod
+    def from_database(cls, chunk_size=10000):
+        cards = cls()
+        rows = (
+            UserSkill.objects.filter(is_public=True)
+            .order_by()
+            .annotate(endorsed=Coalesce('endorsement_stats__count', 0))
+            .values_list('profile_id', 'skill_id', 'self_rating', 'endorsed')
+            .iterator(chunk_size=chunk_size)
+        )
+        for user_id, skill_id, self_rating, endorsed in rows:
+            cards.add(user_id, skill_id, self_rating, endorsed)
+        return cards
+
+    def add(self, user_id, skill_id, self_rating, endorsed):
+        row = self.user_index.get(user_id)
+        if row is None:
+            row = self.user_index[user_id] = len(self.user_ids)
+            self.user_ids.append(user_id)
+        col = self.skill_index.setdefault(skill_id, len(self.skill_index))
+        if self_rating >= TEACH_MIN_RATING:
+            target, weight = self.teach, teach_weight(self_rating, endorsed)
+        else:
+            target, weight = self.learn, learn_weight(self_rating)
+        target[0].append(row)
+        target[1].append(col)
+        target[2].append(weight)
+
+
+# --- Engines ---
+
+class SparseMatrixEngine:
+    """
+    Vectorized scoring with SciPy CSR matrices.
+    """
+    def __init__(self, cards):
+        shape = (len(cards.user_ids), len(cards.skill_index))
+        # np.asarray() wraps the CardSet's array buffers without copying them
+        self.user_ids = np.asarray(cards.user_ids)
+        self.teach = self._normalized(cards.teach, shape)
+        self.learn = self._normalized(cards.learn, shape)
+        # Transposed (skill x users) and truncated once, so each block is a plain CSR x CSR product
+        self.teach_t = self._truncated(self.teach.T.tocsr())
+        self.learn_t = self._truncated(self.learn.T.tocsr())
+        # Upper bound on the score entries each user's row produces
+        self.row_cost = (
+            self.learn.astype(bool).astype(np.int64) @ np.diff(self.teach_t.indptr)
+            + self.teach.astype(bool).astype(np.int64) @ np.diff(self.learn_t.indptr)
+        )
+
+    @staticmethod
+    def _truncated(postings):
+        # Keeps the MAX_POSTINGS largest weights in each skill row
+        counts = np.diff(postings.indptr)
+        if counts.max(initial=0) <= MAX_POSTINGS:
+            return postings
+        keep = np.ones(postings.nnz, dtype=bool)
+        for row in np.flatnonzero(counts > MAX_POSTINGS):
+            lo, hi = postings.indptr[row], postings.indptr[row + 1]
+            order = np.lexsort((postings.indices[lo:hi], -postings.data[lo:hi]))
+            keep[lo + order[MAX_POSTINGS:]] = False
+        rows = np.repeat(np.arange(postings.shape[0]), counts)[keep]
+        return sparse.csr_matrix(
+            (postings.data[keep], (rows, postings.indices[keep])), shape=postings.shape
+        )
+
+    @staticmethod
+    def _normalized(triplets, shape):
+        rows, cols, weights = triplets
+        matrix = sparse.csr_matrix(
+            (np.asarray(weights, dtype=np.float32), (np.asarray(rows), np.asarray(cols))), shape=shape
+        )
+        norms = np.sqrt(np.asarray(matrix.multiply(matrix).sum(axis=1)).ravel())
+        norms[norms == 0] = 1
+        return sparse.diags(1 / norms).dot(matrix).tocsr()
+
+    def __len__(self):
+        return len(self.user_ids)
+
+    def top_k(self, start, stop, k):
+        while start < stop:
+            cost = np.cumsum(self.row_cost[start:stop])
+            end = start + max(1, int(np.searchsorted(cost, MAX_BLOCK_NNZ, side='right')))
+            yield from self._block_top_k(start, min(end, stop), k)
+            start = end
+
+    def _block_top_k(self, start, stop, k):
+        scores = (self.learn[start:stop] @ self.teach_t + self.teach[start:stop] @ self.learn_t).tocsr()
+        for offset in range(stop - start):
+            lo, hi = scores.indptr[offset], scores.indptr[offset + 1]
+            cols, values = scores.indices[lo:hi], scores.data[lo:hi]
+            keep = (cols != start + offset) & (values > 0)
+            cols, values = cols[keep], values[keep]
+            if len(values) > k:
+                best = np.argpartition(-values, k)[:k]
+                cols, values = cols[best], values[best]
+            order = np.argsort(-values, kind='stable')
+            yield int(self.user_ids[start + offset]), [
+                (int(self.user_ids[c]), float(v)) for c, v in zip(cols[order], values[order])
+            ]
+
+
+class PythonEngine:
+    """
+    The same scoring with dictionaries and per-skill posting lists.
+    """
+    def __init__(self, cards):
+        self.user_ids = cards.user_ids
+        self.teach_rows = self._rows(cards.teach)
+        self.learn_rows = self._rows(cards.learn)
+        self.teachers = self._postings(self.teach_rows)
+        self.learners = self._postings(self.learn_rows)
+
+    @staticmethod
+    def _rows(triplets):
+        rows = defaultdict(dict)
+        for row, col, weight in zip(*triplets):
+            rows[row][col] = weight
+        for vector in rows.values():
+            norm = math.sqrt(sum(w * w for w in vector.values())) or 1
+            for col in vector:
+                vector[col] /= norm
+        return rows
+
+    @staticmethod
+    def _postings(rows):
+        postings = defaultdict(list)
+        for row, vector in rows.items():
+            for col, weight in vector.items():
+                postings[col].append((row, weight))
+        for col, entries in postings.items():
+            if len(entries) > MAX_POSTINGS:
+                entries.sort(key=lambda entry: (-entry[1], entry[0]))
+                del entries[MAX_POSTINGS:]
+        return postings
+
+    def __len__(self):
+        return len(self.user_ids)
+
+    def top_k(self, start, stop, k):
+        for row in range(start, stop):
+            scores = defaultdict(float)
+            for vector, postings in ((self.learn_rows.get(row, {}), self.teachers),
+                                     (self.teach_rows.get(row, {}), self.learners)):
+                for col, weight in vector.items():
+                    for other, other_weight in postings[col]:
+                        scores[other] += weight * other_weight
+            scores.pop(row, None)
+            best = heapq.nlargest(k, scores.items(), key=lambda item: (item[1], -item[0]))
+            yield self.user_ids[row], [(self.user_ids[other], score) for other, score in best if score > 0]
+
+
+def build_engine(cards):
+    if sparse is not None:
+        return SparseMatrixEngine(cards)
+    return PythonEngine(cards)
+
+
+# --- Batch job ---
+
+def compute_matches(top_k=DEFAULT_TOP_K, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Recomputes SkillMatch for every user with public cards, one block of users per
+    transaction, and drops matches left over from earlier runs. Yields the number
+    of users processed after each block.
+    """
+    started = timezone.now()
+    cards = CardSet.from_database()
+    engine = build_engine(cards) if cards.user_ids else []
+
+    for start in range(0, len(engine), chunk_size):
+        stop = min(start + chunk_size, len(engine))
+        block = list(engine.top_k(start, stop, top_k))
+        with transaction.atomic():
+            SkillMatch.objects.filter(user_id__in=[user_id for user_id, _ in block]).delete()
+            SkillMatch.objects.bulk_create(
+                [
+                    SkillMatch(user_id=user_id, candidate_id=candidate_id, rank=rank, score=score)
+                    for user_id, matches in block
+                    for rank, (candidate_id, score) in enumerate(matches, start=1)
+                ],
+                batch_size=5000,
+            )
+        yield stop
+
+    # Users who no longer have any public cards
+    SkillMatch.objects.filter(computed_at__lt=started).delete()
@@ -0,0 +1,375 @@
+"""
+Per-view request metrics, exposed in the Prometheus text format at /metrics.
+
+MetricsMiddleware records for every request, labelled with the resolved view
+(e.g. 'PostViewSet.user_feed') and method:
+
+    skilllink_request_duration_seconds      wall time
+    skilllink_db_queries                    number of SQL statements
+    skilllink_db_duration_seconds           time spent executing them
+    skilllink_serializer_duration_seconds   time in top-level DRF serializer .data
+    skilllink_response_size_bytes           body size
+    skilllink_responses_total               responses by status code
+
+Observations go into fixed-bucket histograms held in process memory, so the
+cost per request is a few perf_counter() calls and one bisect per histogram.
+The middleware runs natively under both WSGI and ASGI. SQL is counted by an
+execute wrapper installed on every connection, which charges the statement to
+the request in the current context (so queries run through sync_to_async are
+counted too). A streamed response (exports, the ICS feed) is recorded once
+its body has been consumed, so its time, queries and size cover the stream.
+Each worker process keeps its own numbers; scrape every worker (or run one
+per container) when there are several.
+
+The endpoint lists every view with its traffic, so by default it only answers
+staff users, clients in METRICS_ALLOWED_NETWORKS (loopback unless configured)
+and any client when DEBUG is on. Set METRICS_AUTH_TOKEN to require a bearer
+token from the scraper instead, or METRICS_PUBLIC = True to open it to anyone.
+
+Set METRICS_SLOW_REQUEST_MS to log requests slower than that, with their most
+expensive SQL statements, to the 'core.metrics.slow' logger.
+"""
+import bisect
+import contextvars
+import ipaddress
+import logging
+import threading
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseForbidden
+from rest_framework import serializers
+
+SLOW_REQUEST_MS = getattr(settings, 'METRICS_SLOW_REQUEST_MS', None)
+SLOW_REQUEST_STATEMENTS = 10
+# Optional shared secret for /metrics: 'Authorization: Bearer <token>'
+AUTH_TOKEN = getattr(settings, 'METRICS_AUTH_TOKEN', None)
+# Without a token: addresses that may scrape, besides staff users and DEBUG
+ALLOWED_NETWORKS = tuple(
+    ipaddress.ip_network(network) for network in getattr(settings, 'METRICS_ALLOWED_NETWORKS', ('127.0.0.0/8', '::1/128'))
+)
+# Opt-in: serve /metrics to anyone when no token is set
+PUBLIC = getattr(settings, 'METRICS_PUBLIC', False)
+
+TIME_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100, 200, 500)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216)
+
+slow_log = logging.getLogger('core.metrics.slow')
+
+
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+
+
+class Registry:
+    """
+    Histograms keyed by (metric, labels) plus response counters. Thread-safe.
+    """
+    METRICS = {
+        'skilllink_request_duration_seconds': ('Wall time per request.', TIME_BUCKETS),
+        'skilllink_db_queries': ('SQL statements per request.', COUNT_BUCKETS),
+        'skilllink_db_duration_seconds': ('Time executing SQL per request.', TIME_BUCKETS),
+        'skilllink_serializer_duration_seconds': ('Time in DRF serializers per request.', TIME_BUCKETS),
+        'skilllink_response_size_bytes': ('Response body size.', SIZE_BUCKETS),
+    }
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._histograms = {}
+        self._responses = {}
+
+    def record(self, labels, status_code, observations):
+        with self._lock:
+            for metric, value in observations.items():
+                histogram = self._histograms.get((metric, labels))
+                if histogram is None:
+                    histogram = self._histograms[(metric, labels)] = Histogram(self.METRICS[metric][1])
+                histogram.observe(value)
+            key = labels + (('status', str(status_code)),)
+            self._responses[key] = self._responses.get(key, 0) + 1
+
+    def clear(self):
+        with self._lock:
+            self._histograms.clear()
+            self._responses.clear()
+
+    def exposition(self):
+        """
+        The registry in the Prometheus text exposition format (version 0.0.4).
+        """
+        with self._lock:
+            histograms = {key: (list(h.counts), h.sum) for key, h in self._histograms.items()}
+            responses = dict(self._responses)
+
+        lines = []
+        for metric, (help_text, buckets) in self.METRICS.items():
+            lines += [f'# HELP {metric} {help_text}', f'# TYPE {metric} histogram']
+            for (name, labels), (counts, total) in sorted(histograms.items()):
+                if name != metric:
+                    continue
+                cumulative = 0
+                for bound, count in zip(buckets + (float('inf'),), counts):
+                    cumulative += count
+                    le = '+Inf' if bound == float('inf') else repr(bound)
+                    lines.append(f'{metric}_bucket{_labels(labels + (("le", le),))} {cumulative}')
+                lines.append(f'{metric}_sum{_labels(labels)} {total!r}')
+                lines.append(f'{metric}_count{_labels(labels)} {cumulative}')
+        lines += ['# HELP skilllink_responses_total Responses by view and status.', '# TYPE skilllink_responses_total counter']
+        lines += [f'skilllink_responses_total{_labels(labels)} {count}' for labels, count in sorted(responses.items())]
+        return '\n'.join(lines) + '\n'
+
+
+def _escape(value):
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(pairs):
+    return '{' + ','.join(f'{key}="{_escape(value)}"' for key, value in pairs) + '}'
+
+
+registry = Registry()
+
+
+# --- Request accounting ---
+
+class RequestStats:
+    __slots__ = ('queries', 'db_time', 'serializer_time', 'serializing', 'statements')
+
+    def __init__(self, keep_statements):
+        self.queries = 0
+        self.db_time = 0.0
+        self.serializer_time = 0.0
+        self.serializing = False
+        self.statements = [] if keep_statements else None
+
+    def __call__(self, execute, sql, params, many, context):
+        # connection.execute_wrapper hook
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed = time.perf_counter() - started
+            self.queries += 1
+            self.db_time += elapsed
+            if self.statements is not None:
+                self.statements.append((elapsed, sql))
+
+
+_current = contextvars.ContextVar('skilllink_request_stats', default=None)
+
+
+def _record_query(execute, sql, params, many, context):
+    stats = _current.get()
+    if stats is None:
+        return execute(sql, params, many, context)
+    return stats(execute, sql, params, many, context)
+
+
+def install_query_wrapper(sender, connection, **kwargs):
+    """
+    connection_created receiver, connected from CoreConfig.ready(). The wrapper
+    goes first (outermost), so execute_wrapper() blocks that are open while the
+    connection is established still pop their own wrapper.
+    """
+    if _record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.insert(0, _record_query)
+
+
+def _timed_data(data_property):
+    def data(serializer):
+        stats = _current.get()
+        if stats is None or stats.serializing:
+            return data_property.fget(serializer)
+        # Only the outermost .data is timed; nested serializers run inside it
+        stats.serializing = True
+        started = time.perf_counter()
+        try:
+            return data_property.fget(serializer)
+        finally:
+            stats.serializer_time += time.perf_counter() - started
+            stats.serializing = False
+    return property(data)
+
+
+def instrument_serializers():
+    """
+    Times Serializer.data and ListSerializer.data for the request in progress.
+    Called once from CoreConfig.ready().
+    """
+    for cls in (serializers.Serializer, serializers.ListSerializer):
+        if not getattr(cls.data.fget, 'skilllink_timed', False):
+            cls.data = _timed_data(cls.data)
+            cls.data.fget.skilllink_timed = True
+
+
+def view_name(request):
+    match = getattr(request, 'resolver_match', None)
+    if match is None:
+        return '<unresolved>'
+    func = match.func
+    cls = getattr(func, 'cls', None)
+    if cls is None:
+        return f'{func.__module__.rsplit(".", 1)[-1]}.{func.__name__}'
+    actions = getattr(func, 'actions', None) or {}
+    action = actions.get(request.method.lower(), request.method.lower())
+    return f'{cls.__name__}.{action}'
+
+
+class MetricsMiddleware:
+    """
+    Records the metrics above for each request. Put it first in MIDDLEWARE so
+    the time spent in the rest of the stack is counted too.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if request.path == '/metrics':
+            return self.get_response(request)
+
+        stats = RequestStats(keep_statements=SLOW_REQUEST_MS is not None)
+        started = time.perf_counter()
+        token = _current.set(stats)
+        try:
+            response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self.finish(request, response, stats, started)
+
+    async def __acall__(self, request):
+        if request.path == '/metrics':
+            return await self.get_response(request)
+
+        stats = RequestStats(keep_statements=SLOW_REQUEST_MS is not None)
+        started = time.perf_counter()
+        token = _current.set(stats)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self.finish(request, response, stats, started)
+
+    def finish(self, request, response, stats, started):
+        if not response.streaming:
+            self.record(request, response, stats, started, len(response.content))
+            return response
+
+        def done(size):
+            self.record(request, response, stats, started, size)
+        stream = AsyncMeasuredStream if response.is_async else MeasuredStream
+        response.streaming_content = stream(response.streaming_content, stats, done)
+        return response
+
+    def record(self, request, response, stats, started, size):
+        elapsed = time.perf_counter() - started
+        name = view_name(request)
+        registry.record((('view', name), ('method', request.method)), response.status_code, {
+            'skilllink_request_duration_seconds': elapsed,
+            'skilllink_db_queries': stats.queries,
+            'skilllink_db_duration_seconds': stats.db_time,
+            'skilllink_serializer_duration_seconds': stats.serializer_time,
+            'skilllink_response_size_bytes': size,
+        })
+
+        if SLOW_REQUEST_MS is not None and elapsed * 1000 >= SLOW_REQUEST_MS:
+            worst = sorted(stats.statements, key=lambda statement: statement[0], reverse=True)[:SLOW_REQUEST_STATEMENTS]
+            slow_log.warning(
+                '%s %s (%s) took %.1f ms: %d queries in %.1f ms, serializers %.1f ms\n%s',
+                request.method, request.get_full_path(), name, elapsed * 1000, stats.queries,
+                stats.db_time * 1000, stats.serializer_time * 1000,
+                '\n'.join(f'  {seconds * 1000:8.2f} ms  {sql}' for seconds, sql in worst),
+            )
+
+
+class MeasuredStream:
+    """
+    Wraps a streaming body: each block is produced with the request's stats
+    current, and done(size in bytes) is called once, when the body is exhausted
+    or the response is closed.
+    """
+    def __init__(self, blocks, stats, done):
+        self.blocks = blocks
+        self.stats = stats
+        self.done = done
+        self.size = 0
+        self.finished = False
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        token = _current.set(self.stats)
+        try:
+            block = next(self.blocks)
+        except StopIteration:
+            self.close()
+            raise
+        finally:
+            _current.reset(token)
+        self.size += len(block)
+        return block
+
+    def close(self):
+        # Called by the server through response.close(), as well as at the end
+        if not self.finished:
+            self.finished = True
+            self.done(self.size)
+
+
+class AsyncMeasuredStream(MeasuredStream):
+    """
+    MeasuredStream for an async body (ASGI).
+    """
+    __iter__ = __next__ = None
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        token = _current.set(self.stats)
+        try:
+            block = await anext(self.blocks)
+        except StopAsyncIteration:
+            self.close()
+            raise
+        finally:
+            _current.reset(token)
+        self.size += len(block)
+        return block
+
+
+def _from_allowed_network(request):
+    try:
+        address = ipaddress.ip_address(request.META.get('REMOTE_ADDR', ''))
+    except ValueError:
+        return False
+    return any(address in network for network in ALLOWED_NETWORKS)
+
+
+def may_scrape(request):
+    if AUTH_TOKEN:
+        return request.headers.get('Authorization') == f'Bearer {AUTH_TOKEN}'
+    user = getattr(request, 'user', None)
+    return PUBLIC or settings.DEBUG or bool(user and user.is_staff) or _from_allowed_network(request)
+
+
+def metrics_view(request):
+    if not may_scrape(request):
+        return HttpResponseForbidden()
+    return HttpResponse(registry.exposition(), content_type='text/plain; version=0.0.4; charset=utf-8')
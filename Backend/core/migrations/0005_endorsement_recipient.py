@@ -0,0 +1,45 @@
+# Generated by Django 5.2.18 on 2026-10-18 04:12
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+
+
+def backfill_recipient(apps, schema_editor):
+    Endorsement = apps.get_model('core', 'Endorsement')
+    UserSkill = apps.get_model('core', 'UserSkill')
+    # One UPDATE ... SET recipient_id = (SELECT profile_id ...) for the whole table
+    Endorsement.objects.filter(recipient__isnull=True).update(
+        recipient_id=Subquery(UserSkill.objects.filter(pk=OuterRef('skill_card_id')).values('profile_id')[:1])
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0004_keyset_pagination_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='endorsement',
+            name='recipient',
+            field=models.ForeignKey(editable=False, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='received_endorsements', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.RunPython(backfill_recipient, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='endorsement',
+            name='recipient',
+            field=models.ForeignKey(editable=False, on_delete=django.db.models.deletion.CASCADE, related_name='received_endorsements', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddIndex(
+            model_name='endorsement',
+            index=models.Index(fields=['endorser', '-endorsed_at', '-id'], name='endorsement_endorser_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='endorsement',
+            index=models.Index(fields=['recipient', '-endorsed_at', '-id'], name='endorsement_recipient_idx'),
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 5.2.18 on 2026-10-18 04:02
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0005_endorsement_recipient'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EndorsementStats',
+            fields=[
+                ('skill_card', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='endorsement_stats', serialize=False, to='core.userskill')),
+                ('count', models.PositiveIntegerField(default=0)),
+                ('rating_count', models.PositiveIntegerField(default=0)),
+                ('rating_sum', models.PositiveIntegerField(default=0)),
+                ('rating_1', models.PositiveIntegerField(default=0)),
+                ('rating_2', models.PositiveIntegerField(default=0)),
+                ('rating_3', models.PositiveIntegerField(default=0)),
+                ('rating_4', models.PositiveIntegerField(default=0)),
+                ('rating_5', models.PositiveIntegerField(default=0)),
+                ('last_endorsed_at', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'verbose_name_plural': 'Endorsement Stats',
+            },
+        ),
+    ]
@@ -0,0 +1,62 @@
+# Generated by Django 5.2.18 on 2026-10-18 04:40
+
+from django.db import migrations
+
+# External-content FTS5 index over core_skill, kept in sync by triggers.
+# Only created on SQLite; other databases use the in-memory or plain query backends.
+CREATE_SQL = [
+    """
+    CREATE VIRTUAL TABLE core_skill_fts USING fts5(
+        name, description,
+        content='core_skill', content_rowid='id',
+        tokenize='unicode61', prefix='2 3'
+    )
+    """,
+    """
+    CREATE TRIGGER core_skill_fts_ai AFTER INSERT ON core_skill BEGIN
+        INSERT INTO core_skill_fts(rowid, name, description) VALUES (new.id, new.name, new.description);
+    END
+    """,
+    """
+    CREATE TRIGGER core_skill_fts_ad AFTER DELETE ON core_skill BEGIN
+        INSERT INTO core_skill_fts(core_skill_fts, rowid, name, description) VALUES ('delete', old.id, old.name, old.description);
+    END
+    """,
+    """
+    CREATE TRIGGER core_skill_fts_au AFTER UPDATE ON core_skill BEGIN
+        INSERT INTO core_skill_fts(core_skill_fts, rowid, name, description) VALUES ('delete', old.id, old.name, old.description);
+        INSERT INTO core_skill_fts(rowid, name, description) VALUES (new.id, new.name, new.description);
+    END
+    """,
+    "INSERT INTO core_skill_fts(core_skill_fts) VALUES ('rebuild')",
+]
+
+DROP_SQL = [
+    "DROP TRIGGER IF EXISTS core_skill_fts_ai",
+    "DROP TRIGGER IF EXISTS core_skill_fts_ad",
+    "DROP TRIGGER IF EXISTS core_skill_fts_au",
+    "DROP TABLE IF EXISTS core_skill_fts",
+]
+
+
+def create_fts(apps, schema_editor):
+    if schema_editor.connection.vendor == 'sqlite':
+        for statement in CREATE_SQL:
+            schema_editor.execute(statement)
+
+
+def drop_fts(apps, schema_editor):
+    if schema_editor.connection.vendor == 'sqlite':
+        for statement in DROP_SQL:
+            schema_editor.execute(statement)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0006_endorsementstats'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_fts, drop_fts),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 5.2.18 on 2026-10-18 04:08
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def backfill_self_links(apps, schema_editor):
+    # Every existing skill is a root, so its only closure row is itself at depth 0
+    Skill = apps.get_model('core', 'Skill')
+    SkillClosure = apps.get_model('core', 'SkillClosure')
+    SkillClosure.objects.bulk_create(
+        (SkillClosure(ancestor_id=pk, descendant_id=pk, depth=0) for pk in Skill.objects.values_list('pk', flat=True)),
+        batch_size=5000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0008_skillmatch'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='skill',
+            name='parent_skill',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='sub_skills', to='core.skill'),
+        ),
+        migrations.CreateModel(
+            name='SkillClosure',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('depth', models.PositiveSmallIntegerField()),
+                ('ancestor', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='descendant_links', to='core.skill')),
+                ('descendant', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='ancestor_links', to='core.skill')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['descendant', 'depth'], name='skillclosure_descendant_idx')],
+                'unique_together': {('ancestor', 'descendant')},
+            },
+        ),
+        migrations.RunPython(backfill_self_links, migrations.RunPython.noop),
+    ]
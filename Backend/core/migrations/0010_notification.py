@@ -0,0 +1,34 @@
+# Generated by Django 5.2.18 on 2026-10-18 04:18
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0009_skill_hierarchy'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Notification',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.PositiveSmallIntegerField(choices=[(1, 'endorsement'), (2, 'post')])),
+                ('group_key', models.CharField(max_length=48)),
+                ('object_id', models.UUIDField()),
+                ('event_count', models.PositiveIntegerField(default=1)),
+                ('updated_at', models.DateTimeField()),
+                ('read_at', models.DateTimeField(blank=True, null=True)),
+                ('actor', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL)),
+                ('recipient', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='notifications', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['-updated_at'],
+                'indexes': [models.Index(fields=['recipient', '-updated_at', '-id'], name='notification_recipient_idx'), models.Index(condition=models.Q(('read_at__isnull', True)), fields=['recipient', 'group_key'], name='notification_unread_group_idx')],
+            },
+        ),
+    ]
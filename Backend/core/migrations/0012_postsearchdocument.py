@@ -0,0 +1,87 @@
+# Generated by Django 5.2.18 on 2026-10-18 04:50
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+# The full-text index over PostSearchDocument.tokens (see core.post_search).
+# The tokens are already split and lower-cased, so each database only indexes words.
+# SQLite: an external-content FTS5 table kept in sync by triggers.
+SQLITE_CREATE_SQL = [
+    """
+    CREATE VIRTUAL TABLE core_post_fts USING fts5(
+        tokens,
+        content='core_postsearchdocument', content_rowid='id',
+        tokenize="unicode61 tokenchars '_'", prefix='2 3'
+    )
+    """,
+    """
+    CREATE TRIGGER core_post_fts_ai AFTER INSERT ON core_postsearchdocument BEGIN
+        INSERT INTO core_post_fts(rowid, tokens) VALUES (new.id, new.tokens);
+    END
+    """,
+    """
+    CREATE TRIGGER core_post_fts_ad AFTER DELETE ON core_postsearchdocument BEGIN
+        INSERT INTO core_post_fts(core_post_fts, rowid, tokens) VALUES ('delete', old.id, old.tokens);
+    END
+    """,
+    """
+    CREATE TRIGGER core_post_fts_au AFTER UPDATE ON core_postsearchdocument BEGIN
+        INSERT INTO core_post_fts(core_post_fts, rowid, tokens) VALUES ('delete', old.id, old.tokens);
+        INSERT INTO core_post_fts(rowid, tokens) VALUES (new.id, new.tokens);
+    END
+    """,
+]
+
+SQLITE_DROP_SQL = [
+    "DROP TRIGGER IF EXISTS core_post_fts_ai",
+    "DROP TRIGGER IF EXISTS core_post_fts_ad",
+    "DROP TRIGGER IF EXISTS core_post_fts_au",
+    "DROP TABLE IF EXISTS core_post_fts",
+]
+
+# PostgreSQL: a generated tsvector column with a GIN index. The 'simple'
+# configuration keeps every token as it is (no stemming or stop words).
+POSTGRES_CREATE_SQL = [
+    """
+    ALTER TABLE core_postsearchdocument
+        ADD COLUMN vector tsvector GENERATED ALWAYS AS (to_tsvector('simple', tokens)) STORED
+    """,
+    "CREATE INDEX core_post_search_vector_idx ON core_postsearchdocument USING gin (vector)",
+]
+
+POSTGRES_DROP_SQL = [
+    "DROP INDEX IF EXISTS core_post_search_vector_idx",
+    "ALTER TABLE core_postsearchdocument DROP COLUMN IF EXISTS vector",
+]
+
+
+def create_index(apps, schema_editor):
+    statements = {'sqlite': SQLITE_CREATE_SQL, 'postgresql': POSTGRES_CREATE_SQL}
+    for statement in statements.get(schema_editor.connection.vendor, ()):
+        schema_editor.execute(statement)
+
+
+def drop_index(apps, schema_editor):
+    statements = {'sqlite': SQLITE_DROP_SQL, 'postgresql': POSTGRES_DROP_SQL}
+    for statement in statements.get(schema_editor.connection.vendor, ()):
+        schema_editor.execute(statement)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0011_connection'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PostSearchDocument',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('tokens', models.TextField()),
+                ('post', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='search_document', to='core.post')),
+            ],
+        ),
+        # Existing posts are indexed by 'manage.py reindex_posts'
+        migrations.RunPython(create_index, drop_index),
+    ]
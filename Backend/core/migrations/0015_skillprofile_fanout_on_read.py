@@ -0,0 +1,27 @@
+# Generated by Django 5.2.18 on 2026-10-18 05:52
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+def set_fanout_on_read(apps, schema_editor):
+    SkillProfile = apps.get_model('core', 'SkillProfile')
+    # The mode the follower counts called for before the flag existed
+    threshold = getattr(settings, 'TIMELINE_FANOUT_FOLLOWER_THRESHOLD', 10000)
+    SkillProfile.objects.filter(follower_count__gte=threshold).update(fanout_on_read=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0014_revokedtoken'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='skillprofile',
+            name='fanout_on_read',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.RunPython(set_fanout_on_read, migrations.RunPython.noop),
+    ]
@@ -1,10 +1,16 @@
-from django.db import models
+from django.db import models, transaction
 from django.contrib.auth.models import User
+from django.core.exceptions import ValidationError
 from django.core.validators import MinValueValidator, MaxValueValidator
+from django.db.models.functions import Greatest, Least
+from django.utils import timezone
 import uuid
 
 # --- Core Skill Definitions ---
 
+# Marks a Skill loaded without its parent_skill column
+UNKNOWN_PARENT = object()
+
 class Skill(models.Model):
     """
     A foundational model for all available skills (e.g., 'Python', 'Leadership', 'Cooking').
@@ -12,12 +18,51 @@ class Skill(models.Model):
     name = models.CharField(max_length=100, unique=True, db_index=True)
     description = models.TextField(blank=True, null=True)
 
+    # Optional broader skill this one sits under (e.g. 'Django' under 'Python').
+    # The transitive hierarchy is materialized in SkillClosure by core.skill_tree.
+    parent_skill = models.ForeignKey(
+        'self', on_delete=models.SET_NULL, null=True, blank=True, related_name='sub_skills'
+    )
+
     def __str__(self):
         return self.name
     
     class Meta:
         ordering = ['name']
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remembered so core.skill_tree can tell a reparent from an ordinary save.
+        # If the column was deferred the parent is unknown, and the next save re-links.
+        instance._loaded_parent_id = instance.__dict__.get('parent_skill_id', UNKNOWN_PARENT)
+        return instance
+
+    def clean(self):
+        from .skill_tree import would_create_cycle
+        if self.pk and self.parent_skill_id and would_create_cycle(self.pk, self.parent_skill_id):
+            raise ValidationError({'parent_skill': "A skill cannot be placed under itself or one of its sub-skills."})
+
+
+class SkillClosure(models.Model):
+    """
+    One (ancestor, descendant) pair of the skill hierarchy, including each skill
+    paired with itself at depth 0. Subtree and ancestor queries become a single
+    indexed join at any depth.
+    """
+    ancestor = models.ForeignKey(Skill, on_delete=models.CASCADE, related_name='descendant_links')
+    descendant = models.ForeignKey(Skill, on_delete=models.CASCADE, related_name='ancestor_links')
+    depth = models.PositiveSmallIntegerField()
+
+    class Meta:
+        unique_together = ('ancestor', 'descendant')
+        indexes = [
+            models.Index(fields=['descendant', 'depth'], name='skillclosure_descendant_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.ancestor_id} -> {self.descendant_id} ({self.depth})"
+
 
 # --- Profile & User Skills ---
 
@@ -29,6 +74,14 @@ class SkillProfile(models.Model):
     bio = models.TextField(blank=True, null=True)
     location = models.CharField(max_length=100, blank=True, null=True)
     profile_picture_url = models.URLField(blank=True, null=True)
+
+    # Denormalized count of Follow rows pointing at this user. Kept in sync by
+    # core.timeline so the feed can decide between fan-out-on-write and
+    # fan-out-on-read without counting followers on every request.
+    follower_count = models.PositiveIntegerField(default=0)
+    # Whether the author's posts are merged into feeds on read rather than
+    # fanned out. Switched by core.timeline, with hysteresis around the threshold.
+    fanout_on_read = models.BooleanField(default=False)
     
     def __str__(self):
         return f"Profile for {self.user.username}"
@@ -72,11 +125,109 @@ class Post(models.Model):
 
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            # Keyset pagination on (created_at, id)
+            models.Index(fields=['-created_at', '-id'], name='post_created_id_idx'),
+            # Serves fan-out-on-read for high-follower authors (latest posts by author)
+            models.Index(fields=['author', '-created_at'], name='post_author_created_idx'),
+        ]
 
     def __str__(self):
         return f"Post by {self.author.username}"
 
 
+class PostSearchDocument(models.Model):
+    """
+    A post's content as search tokens (core.post_search), kept current on every
+    save and deleted with the post. The integer id is the row id the full-text
+    index (FTS5 on SQLite, tsvector on PostgreSQL) refers to.
+    """
+    post = models.OneToOneField(Post, on_delete=models.CASCADE, related_name='search_document')
+    tokens = models.TextField()
+
+    def __str__(self):
+        return f"Search document for post {self.post_id}"
+
+
+class Follow(models.Model):
+    """
+    A directed 'follows' edge between two users. Drives the per-user timeline.
+    """
+    follower = models.ForeignKey(User, related_name='following', on_delete=models.CASCADE)
+    followee = models.ForeignKey(User, related_name='followers', on_delete=models.CASCADE)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        unique_together = ('follower', 'followee')
+        indexes = [
+            # Fan-out walks the followers of an author
+            models.Index(fields=['followee', 'follower'], name='follow_followee_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.follower.username} follows {self.followee.username}"
+
+
+class Connection(models.Model):
+    """
+    A symmetric connection ("friend") between two users: requested by from_user,
+    accepted by to_user. One row per pair whichever way it was requested.
+    Accepted edges are mirrored in the in-memory adjacency index in core.graph.
+    """
+    PENDING = 0
+    ACCEPTED = 1
+    STATUS_CHOICES = ((PENDING, 'pending'), (ACCEPTED, 'accepted'))
+
+    from_user = models.ForeignKey(User, related_name='connections_sent', on_delete=models.CASCADE)
+    to_user = models.ForeignKey(User, related_name='connections_received', on_delete=models.CASCADE)
+    status = models.PositiveSmallIntegerField(choices=STATUS_CHOICES, default=PENDING)
+    created_at = models.DateTimeField(auto_now_add=True)
+    accepted_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['-created_at']
+        constraints = [
+            # One row per unordered pair
+            models.UniqueConstraint(Least('from_user', 'to_user'), Greatest('from_user', 'to_user'),
+                                    name='connection_unique_pair'),
+            models.CheckConstraint(condition=~models.Q(from_user=models.F('to_user')), name='connection_not_self'),
+        ]
+        indexes = [
+            # Edge lists from each side, by state
+            models.Index(fields=['from_user', 'status', 'to_user'], name='connection_from_idx'),
+            models.Index(fields=['to_user', 'status', 'from_user'], name='connection_to_idx'),
+        ]
+
+    def other(self, user_id):
+        return self.to_user if self.from_user_id == user_id else self.from_user
+
+    def __str__(self):
+        return f"{self.from_user.username} - {self.to_user.username} ({self.get_status_display()})"
+
+
+class TimelineEntry(models.Model):
+    """
+    A materialized feed row: 'post' appears in 'user''s timeline.
+    Rows are written by fan-out when a post is created, so reading a feed page
+    is a single index range scan on (user, -created_at).
+    """
+    user = models.ForeignKey(User, related_name='timeline_entries', on_delete=models.CASCADE)
+    post = models.ForeignKey(Post, related_name='timeline_entries', on_delete=models.CASCADE)
+    # Copied from Post.created_at so the feed can be ordered without joining posts
+    created_at = models.DateTimeField(db_index=False)
+
+    class Meta:
+        unique_together = ('user', 'post')
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['user', '-created_at', '-post'], name='timeline_user_created_idx'),
+        ]
+        verbose_name_plural = "Timeline Entries"
+
+    def __str__(self):
+        return f"Timeline entry for {self.user.username}"
+
+
 class Endorsement(models.Model):
     """
     Represents an endorsement given by one user to another user's skill (UserSkill).
@@ -84,6 +235,9 @@ class Endorsement(models.Model):
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     endorser = models.ForeignKey(User, related_name='given_endorsements', on_delete=models.CASCADE)
     skill_card = models.ForeignKey(UserSkill, related_name='endorsements', on_delete=models.CASCADE)
+    # Denormalized owner of skill_card, so "received" can be served from one index
+    # instead of joining through UserSkill and SkillProfile. Set in save().
+    recipient = models.ForeignKey(User, related_name='received_endorsements', on_delete=models.CASCADE, editable=False)
     
     comment = models.TextField(blank=True, null=True)
     
@@ -96,6 +250,214 @@ class Endorsement(models.Model):
     class Meta:
         unique_together = ('endorser', 'skill_card')
         ordering = ['-endorsed_at']
+        indexes = [
+            # Keyset pagination on (endorsed_at, id)
+            models.Index(fields=['-endorsed_at', '-id'], name='endorsement_endorsed_id_idx'),
+            # "Given" and "received" streams, newest first
+            models.Index(fields=['endorser', '-endorsed_at', '-id'], name='endorsement_endorser_idx'),
+            models.Index(fields=['recipient', '-endorsed_at', '-id'], name='endorsement_recipient_idx'),
+        ]
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remembered so the handlers in core.signals can update the card and
+        # recipient an edit moves the endorsement away from (None if deferred)
+        instance._loaded_skill_card_id = instance.__dict__.get('skill_card_id')
+        instance._loaded_recipient_id = instance.__dict__.get('recipient_id')
+        return instance
+
+    def _snapshot(self):
+        # Once the row matches the instance, the next save starts from here
+        self._loaded_skill_card_id = self.__dict__.get('skill_card_id')
+        self._loaded_recipient_id = self.__dict__.get('recipient_id')
+
+    def save(self, *args, **kwargs):
+        # Only a new row or a move to another card changes the recipient
+        if self._state.adding or self.skill_card_id != getattr(self, '_loaded_skill_card_id', None):
+            if Endorsement.skill_card.is_cached(self):
+                # SkillProfile's primary key is its user, so the card's profile_id is the recipient's user id
+                self.recipient_id = self.skill_card.profile_id
+            else:
+                self.recipient_id = UserSkill.objects.filter(pk=self.skill_card_id).values_list('profile__user_id', flat=True).get()
+        # The post_save handlers that maintain EndorsementStats run inside this transaction
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+        self._snapshot()
+
+    def delete(self, *args, **kwargs):
+        result = super().delete(*args, **kwargs)
+        self._snapshot()
+        return result
+
+    def __str__(self):
+        return f"Endorsement for {self.skill_card.profile.user.username}'s {self.skill_card.skill.name}"
+
+
+class EndorsementStats(models.Model):
+    """
+    Precomputed endorsement aggregates for one UserSkill card, so profile pages
+    can show counts and average ratings without aggregating over Endorsement.
+    Maintained incrementally by core.endorsement_stats; rebuild in bulk with
+    'manage.py rebuild_endorsement_stats'.
+    """
+    skill_card = models.OneToOneField(UserSkill, on_delete=models.CASCADE, primary_key=True, related_name='endorsement_stats')
+    count = models.PositiveIntegerField(default=0)
+
+    # Only endorsements that carry an endorser_rating contribute to these
+    rating_count = models.PositiveIntegerField(default=0)
+    rating_sum = models.PositiveIntegerField(default=0)
+    rating_1 = models.PositiveIntegerField(default=0)
+    rating_2 = models.PositiveIntegerField(default=0)
+    rating_3 = models.PositiveIntegerField(default=0)
+    rating_4 = models.PositiveIntegerField(default=0)
+    rating_5 = models.PositiveIntegerField(default=0)
+
+    last_endorsed_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        verbose_name_plural = "Endorsement Stats"
+
+    @property
+    def average_rating(self):
+        return round(self.rating_sum / self.rating_count, 2) if self.rating_count else None
+
+    @property
+    def rating_histogram(self):
+        return [self.rating_1, self.rating_2, self.rating_3, self.rating_4, self.rating_5]
+
+    def __str__(self):
+        return f"Endorsement stats for {self.skill_card_id}"
+
+
+# --- Matching ---
+
+class SkillMatch(models.Model):
+    """
+    A precomputed teach/learn match: 'candidate' is one of the top-K people for
+    'user' to exchange skills with. Rewritten in bulk by core.matching.
+    """
+    user = models.ForeignKey(User, related_name='skill_matches', on_delete=models.CASCADE)
+    candidate = models.ForeignKey(User, related_name='+', on_delete=models.CASCADE)
+    rank = models.PositiveSmallIntegerField()
+    score = models.FloatField()
+    computed_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        unique_together = ('user', 'rank')
+        ordering = ['user', 'rank']
+        verbose_name_plural = "Skill Matches"
+
+    def __str__(self):
+        return f"Match #{self.rank} for {self.user.username}: {self.candidate.username}"
+
+
+# --- Notifications ---
+
+class Notification(models.Model):
+    """
+    One row per (recipient, subject) burst: repeated events for the same group
+    (endorsements of one card, posts by one author) within the coalescing window
+    update the unread row instead of adding new ones. Written by core.notifications.
+    """
+    ENDORSEMENT = 1
+    POST = 2
+    KIND_CHOICES = ((ENDORSEMENT, 'endorsement'), (POST, 'post'))
+
+    recipient = models.ForeignKey(User, related_name='notifications', on_delete=models.CASCADE)
+    kind = models.PositiveSmallIntegerField(choices=KIND_CHOICES)
+    # Endorsement: the skill card; post: the author. Rows sharing it are coalesced.
+    group_key = models.CharField(max_length=48)
+    # Most recent actor and object of the burst, and how many events it covers
+    actor = models.ForeignKey(User, related_name='+', on_delete=models.CASCADE)
+    object_id = models.UUIDField()
+    event_count = models.PositiveIntegerField(default=1)
+    updated_at = models.DateTimeField()
+    read_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['-updated_at']
+        indexes = [
+            # The recipient's list, newest first (keyset pagination on updated_at, id)
+            models.Index(fields=['recipient', '-updated_at', '-id'], name='notification_recipient_idx'),
+            # Finding the open burst to coalesce into
+            models.Index(fields=['recipient', 'group_key'], name='notification_unread_group_idx',
+                         condition=models.Q(read_at__isnull=True)),
+        ]
+
+    def __str__(self):
+        return f"{self.get_kind_display()} notification for {self.recipient.username}"
+
+
+# --- Chat ---
+
+class Chat(models.Model):
+    """
+    A conversation. 'last_seq' is the seq of its latest message and hands out the
+    next ones (core.chat); 'updated_at' is when the latest message was sent.
+    """
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(default=timezone.now)
+    last_seq = models.PositiveBigIntegerField(default=0)
+
+    class Meta:
+        ordering = ['-updated_at']
+
+    def __str__(self):
+        return f"Chat #{self.pk}"
+
+
+class ChatMember(models.Model):
+    """
+    A member of a chat. Read receipts are a high-water mark: the member has read
+    every message up to 'read_seq', so reading a thousand messages is one update.
+    """
+    chat = models.ForeignKey(Chat, related_name='members', on_delete=models.CASCADE)
+    user = models.ForeignKey(User, related_name='chat_memberships', on_delete=models.CASCADE)
+    read_seq = models.PositiveBigIntegerField(default=0)
+    joined_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['chat', 'user'], name='chat_member_unique'),
+        ]
+
+    def __str__(self):
+        return f"{self.user.username} in chat #{self.chat_id}"
+
+
+class Message(models.Model):
+    """
+    One entry of a chat's append-only log, keyed by (chat, seq). seq counts up
+    from 1 in each chat with no gaps, so a client that knows the last seq it saw
+    can fetch exactly what it missed, and each chat's log is one contiguous
+    range of the primary key index.
+    """
+    pk = models.CompositePrimaryKey('chat', 'seq')
+    # The primary key already indexes chat first
+    chat = models.ForeignKey(Chat, related_name='messages', on_delete=models.CASCADE, db_index=False)
+    seq = models.PositiveBigIntegerField()
+    sender = models.ForeignKey(User, related_name='+', on_delete=models.CASCADE)
+    content = models.TextField()
+    created_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        ordering = ['chat', 'seq']
+
+    def __str__(self):
+        return f"Message {self.seq} in chat #{self.chat_id}"
+
+
+# --- Token denylist ---
+
+class RevokedToken(models.Model):
+    """
+    A revoked JWT, by its jti claim (core.denylist). Kept until the token
+    expires, after which it would be refused anyway.
+    """
+    jti = models.CharField(max_length=255, unique=True)
+    expires_at = models.DateTimeField(db_index=True)
+    revoked_at = models.DateTimeField(auto_now_add=True, db_index=True)
 
     def __str__(self):
-        return f"Endorsement for {self.skill_card.profile.user.username}'s {self.skill_card.skill.name}"
\ No newline at end of file
+        return f"Revoked token {self.jti}"
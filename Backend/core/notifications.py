@@ -0,0 +1,313 @@
+"""
+Notifications for new endorsements and posts, pushed to connected clients.
+
+Writing: every event becomes at most one row per recipient. Events for the same
+group (endorsements of one skill card, posts by one author) that arrive while
+the recipient's previous notification for that group is unread and younger
+than COALESCE_WINDOW update that row (latest actor, event_count + 1) instead of
+adding one, so a burst of activity is a single "Ana and 4 others endorsed your
+Python" entry. Rows are written in batches with one lookup of the open bursts,
+one UPDATE and one bulk INSERT per batch.
+
+Pushing: after commit, the serialized rows are handed to the configured broker.
+LocalBroker delivers them to the in-process Hub, which wakes the SSE streams of
+the recipients connected to this process (see async_views.notification_stream).
+With several server processes, RedisBroker publishes to a Redis channel that
+every process subscribes to and relays into its own Hub. Streams wait
+PUSH_DIGEST_DELAY after the first message of a burst and send each notification
+once, in its latest state, so a burst costs the client one update.
+"""
+import asyncio
+import json
+import threading
+from collections import defaultdict
+from datetime import timedelta
+from itertools import islice
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from . import timeline
+from .models import Follow, Notification
+from .serializers import NotificationSerializer
+
+# --- Tunables (override in settings.py) ---
+
+COALESCE_WINDOW = timedelta(seconds=getattr(settings, 'NOTIFICATION_COALESCE_SECONDS', 3600))
+
+# Rows looked up and written per batch when fanning a post out to followers
+BATCH_SIZE = getattr(settings, 'NOTIFICATION_BATCH_SIZE', 1000)
+
+# Seconds a stream waits after the first message of a burst before sending
+PUSH_DIGEST_DELAY = getattr(settings, 'NOTIFICATION_PUSH_DIGEST_DELAY', 0.5)
+
+# Messages buffered per connected stream; the oldest are dropped beyond this
+STREAM_BUFFER = 100
+
+
+# Seconds between keep-alive comments on an idle stream
+HEARTBEAT_SECONDS = 15
+
+
+# --- Writing ---
+
+def _batches(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        batch = list(islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+
+
+def _coalesce(kind, actor, batch, at):
+    """
+    Applies one batch of (recipient_id, group_key, object_id) events: open bursts
+    are updated in place, everyone else gets a new row. Returns the rows.
+    """
+    latest, counts = {}, defaultdict(int)
+    for recipient_id, group_key, object_id in batch:
+        latest[(recipient_id, group_key)] = object_id
+        counts[(recipient_id, group_key)] += 1
+
+    open_rows = Notification.objects.filter(
+        recipient_id__in={r for r, _ in latest},
+        group_key__in={g for _, g in latest},
+        read_at__isnull=True,
+        updated_at__gte=at - COALESCE_WINDOW,
+    ).order_by('updated_at')
+    # The lookup is a cross product of recipients and groups; keep the pairs asked for
+    found = {}
+    for row in open_rows:
+        if (row.recipient_id, row.group_key) in latest:
+            found[(row.recipient_id, row.group_key)] = row
+
+    for key, row in found.items():
+        row.event_count += counts[key]
+        row.actor, row.object_id, row.updated_at = actor, latest[key], at
+    Notification.objects.bulk_update(list(found.values()), ['event_count', 'actor', 'object_id', 'updated_at'])
+
+    created = Notification.objects.bulk_create([
+        Notification(recipient_id=recipient_id, kind=kind, group_key=group_key, actor=actor,
+                     object_id=object_id, event_count=counts[(recipient_id, group_key)], updated_at=at)
+        for (recipient_id, group_key), object_id in latest.items()
+        if (recipient_id, group_key) not in found
+    ])
+    return list(found.values()) + created
+
+
+def record(kind, actor, events, at=None):
+    """
+    Records events of one kind by one actor. 'events' is an iterable of
+    (recipient_id, group_key, object_id); events addressed to the actor are
+    skipped. Returns the number of notification rows written or updated.
+    """
+    at = at or timezone.now()
+    broker = get_broker()
+    events = ((r, g, o) for r, g, o in events if r != actor.pk)
+    messages, total = [], 0
+    with transaction.atomic():
+        for batch in _batches(events, BATCH_SIZE):
+            rows = _coalesce(kind, actor, batch, at)
+            total += len(rows)
+            # Only serialize what some connected stream will receive
+            pushed = [row for row in rows if broker.wants(row.recipient_id)]
+            messages.extend(zip([row.recipient_id for row in pushed], NotificationSerializer(pushed, many=True).data))
+    if messages:
+        transaction.on_commit(lambda: broker.publish(messages))
+    return total
+
+
+def endorsements_created(endorsements):
+    """
+    Notifies the owners of the endorsed cards, one group per card.
+    """
+    by_endorser = defaultdict(list)
+    for endorsement in endorsements:
+        by_endorser[endorsement.endorser_id].append(endorsement)
+    for batch in by_endorser.values():
+        record(
+            Notification.ENDORSEMENT,
+            batch[0].endorser,
+            [(e.recipient_id, f'card:{e.skill_card_id}', e.pk) for e in batch],
+            at=max(e.endorsed_at for e in batch),
+        )
+
+
+def post_created(post):
+    """
+    Notifies the author's followers, one group per author. Authors served by
+    fan-out-on-read are skipped: a row per follower is exactly the write cost the
+    timeline avoids for them, and their posts still reach the feed.
+    """
+    if timeline.is_fanout_on_read(post.author_id):
+        return 0
+    followers = (
+        Follow.objects.filter(followee_id=post.author_id)
+        .values_list('follower_id', flat=True)
+        .iterator(chunk_size=BATCH_SIZE)
+    )
+    group_key = f'author:{post.author_id}'
+    return record(Notification.POST, post.author, ((f, group_key, post.pk) for f in followers), at=post.created_at)
+
+
+# --- Pub/sub ---
+
+def _offer(queue, data):
+    if queue.full():
+        # A stalled client loses its oldest updates, not the newest
+        queue.get_nowait()
+    queue.put_nowait(data)
+
+
+class Hub:
+    """
+    The notification streams connected to this process, by user id. Thread-safe:
+    dispatch() is called from request threads while the streams wait in an event loop.
+    """
+    def __init__(self, buffer=STREAM_BUFFER):
+        self.buffer = buffer
+        self._streams = defaultdict(set)
+        self._lock = threading.Lock()
+
+    def subscribe(self, user_id):
+        subscription = (asyncio.get_running_loop(), asyncio.Queue(self.buffer))
+        with self._lock:
+            self._streams[user_id].add(subscription)
+        return subscription
+
+    def unsubscribe(self, user_id, subscription):
+        with self._lock:
+            streams = self._streams.get(user_id)
+            if streams is not None:
+                streams.discard(subscription)
+                if not streams:
+                    del self._streams[user_id]
+
+    def has_subscribers(self, user_id):
+        return user_id in self._streams
+
+    def dispatch(self, messages):
+        with self._lock:
+            deliveries = [(list(self._streams[user_id]), data) for user_id, data in messages if user_id in self._streams]
+        for subscriptions, data in deliveries:
+            for loop, queue in subscriptions:
+                try:
+                    loop.call_soon_threadsafe(_offer, queue, data)
+                except RuntimeError:
+                    # The stream's loop has shut down; it unsubscribes as it unwinds
+                    pass
+
+
+class LocalBroker:
+    """
+    Delivers straight to this process' hub. Enough for a single server process.
+    """
+    def __init__(self, hub):
+        self.hub = hub
+
+    def wants(self, user_id):
+        return self.hub.has_subscribers(user_id)
+
+    def publish(self, messages):
+        self.hub.dispatch(messages)
+
+    def connect(self):
+        pass
+
+
+class RedisBroker:
+    """
+    Publishes to a Redis channel that every server process listens to and relays
+    into its own hub. Works with any redis-py compatible client.
+    """
+    def __init__(self, hub, client=None, client_class='redis.Redis', url=None, channel='skilllink:notifications'):
+        if client is None:
+            client_class = import_string(client_class)
+            client = client_class.from_url(url) if url else client_class()
+        self.hub = hub
+        self.client = client
+        self.channel = channel
+        self._listener = None
+        self._lock = threading.Lock()
+
+    def wants(self, user_id):
+        # Subscribers may be connected to any process
+        return True
+
+    def publish(self, messages):
+        self.client.publish(self.channel, json.dumps(messages))
+
+    def connect(self):
+        # Starts relaying on the first stream this process serves
+        with self._lock:
+            if self._listener is None:
+                self._listener = threading.Thread(target=self._listen, name='notification-relay', daemon=True)
+                self._listener.start()
+
+    def _listen(self):
+        pubsub = self.client.pubsub(ignore_subscribe_messages=True)
+        pubsub.subscribe(self.channel)
+        for message in pubsub.listen():
+            self.hub.dispatch(json.loads(message['data']))
+
+
+hub = Hub()
+_broker = None
+_broker_lock = threading.Lock()
+
+
+def get_broker():
+    global _broker
+    if _broker is None:
+        with _broker_lock:
+            if _broker is None:
+                config = getattr(settings, 'NOTIFICATION_BROKER', {})
+                broker_class = import_string(config.get('BACKEND', 'core.notifications.LocalBroker'))
+                _broker = broker_class(hub, **config.get('OPTIONS', {}))
+    return _broker
+
+
+# --- Streaming ---
+
+def _event(data):
+    return f"id: {data['updated_at']}\nevent: notification\ndata: {json.dumps(data)}\n\n"
+
+
+async def stream(user_id, since=None):
+    """
+    Server-Sent Events for one connected client. After a reconnect ('since' is
+    the Last-Event-ID the client saw), notifications updated in the meantime are
+    replayed first.
+    """
+    get_broker().connect()
+    subscription = hub.subscribe(user_id)
+    _, queue = subscription
+    try:
+        if since is not None:
+            missed = NotificationSerializer.query_plan.apply(
+                Notification.objects.filter(recipient_id=user_id, updated_at__gt=since)
+            ).order_by('updated_at')[:STREAM_BUFFER]
+            async for row in missed:
+                yield _event(NotificationSerializer(row).data)
+        yield ': connected\n\n'
+
+        while True:
+            try:
+                first = await asyncio.wait_for(queue.get(), HEARTBEAT_SECONDS)
+            except asyncio.TimeoutError:
+                yield ': keep-alive\n\n'
+                continue
+            # Let the rest of a burst arrive, then send each notification once in its latest state
+            await asyncio.sleep(PUSH_DIGEST_DELAY)
+            burst = {first['id']: first}
+            while not queue.empty():
+                data = queue.get_nowait()
+                burst.pop(data['id'], None)
+                burst[data['id']] = data
+            for data in burst.values():
+                yield _event(data)
+    finally:
+        hub.unsubscribe(user_id, subscription)
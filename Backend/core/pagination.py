@@ -0,0 +1,288 @@
+"""
+Keyset (cursor) pagination for the core API.
+
+Unlike OFFSET pagination, each page is fetched with a WHERE clause on the sort
+key of the last row seen, so the database walks an index from that position and
+the cost of a page does not grow as clients page deeper into the data.
+
+The sort key is the ordering the model already declares (e.g. Post.created_at),
+with the primary key appended as a tie-breaker so rows sharing a timestamp or
+name are never skipped or repeated across pages.
+"""
+import base64
+import heapq
+import json
+from collections import OrderedDict
+
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.db.models import CompositePrimaryKey, Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+def _encode_value(value):
+    # isoformat() keeps microseconds, which the keyset comparison needs to be exact
+    if hasattr(value, 'isoformat'):
+        return value.isoformat()
+    if value is None or isinstance(value, (int, float, str, bool)):
+        return value
+    return str(value)
+
+
+def _resolve(obj, path):
+    # Follows 'skill__name' style paths on a model instance or a .values() dict
+    if isinstance(obj, dict):
+        return obj[path]
+    for attr in path.split('__'):
+        obj = getattr(obj, attr)
+    return obj
+
+
+class KeysetPagination(BasePagination):
+    """
+    Cursor pagination on a (sort field..., primary key) keyset.
+
+    The ordering is taken from, in priority order, the view's 'keyset_ordering'
+    attribute, the queryset's explicit order_by(), or the model's Meta.ordering.
+    """
+    page_size = api_settings.PAGE_SIZE or 50
+    page_size_query_param = 'page_size'
+    max_page_size = 200
+    cursor_query_param = 'cursor'
+    invalid_cursor_message = 'Invalid cursor'
+
+    # --- Ordering ---
+
+    def get_ordering(self, queryset, view=None):
+        ordering = getattr(view, 'keyset_ordering', None)
+        if not ordering:
+            ordering = queryset.query.order_by or queryset.model._meta.ordering
+        ordering = [f for f in ordering if isinstance(f, str)]
+
+        pk = queryset.model._meta.pk
+        # By name rather than 'pk', so .values() rows carry it too. A composite
+        # key (Message's (chat, seq)) is made of its fields' columns.
+        key = [field.attname for field in pk] if isinstance(pk, CompositePrimaryKey) else [pk.name]
+        named = {self._field_name(f) for f in ordering}
+        if 'pk' not in named and not named.issuperset(key):
+            descending = bool(ordering) and ordering[-1].startswith('-')
+            ordering.extend('-' + name if descending else name for name in key if name not in named)
+        return tuple(ordering)
+
+    @staticmethod
+    def _field_name(field):
+        return field.lstrip('-')
+
+    @staticmethod
+    def _reverse(ordering):
+        return tuple(f[1:] if f.startswith('-') else '-' + f for f in ordering)
+
+    def keyset_filter(self, ordering, values):
+        """
+        Builds the 'strictly after this position' condition for the ordering:
+        (a > x) OR (a = x AND b > y) OR ..., flipping comparisons for descending fields.
+        """
+        condition = Q()
+        equal = {}
+        for field, value in zip(ordering, values):
+            name = self._field_name(field)
+            op = 'lt' if field.startswith('-') else 'gt'
+            condition |= Q(**equal, **{f'{name}__{op}': value})
+            equal[name] = value
+        return condition
+
+    def position_of(self, obj, ordering):
+        values = []
+        for field in ordering:
+            name = self._field_name(field)
+            values.append(_encode_value(obj.pk if name == 'pk' and not isinstance(obj, dict) else _resolve(obj, name)))
+        return values
+
+    # --- Cursor encoding ---
+
+    def encode_cursor(self, values, reverse=False):
+        payload = json.dumps({'v': values, 'r': int(reverse)}, separators=(',', ':'))
+        cursor = base64.urlsafe_b64encode(payload.encode('utf-8')).decode('ascii')
+        return replace_query_param(self.base_url, self.cursor_query_param, cursor)
+
+    def decode_cursor(self, request, ordering):
+        """
+        Returns (values, reverse) for the request's cursor, or (None, False) for the first page.
+        """
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None, False
+        try:
+            payload = json.loads(base64.urlsafe_b64decode(encoded.encode('ascii')).decode('utf-8'))
+            values, reverse = payload['v'], bool(payload.get('r'))
+        except (TypeError, ValueError, KeyError, UnicodeError):
+            raise NotFound(self.invalid_cursor_message)
+        if not isinstance(values, list) or len(values) != len(ordering):
+            raise NotFound(self.invalid_cursor_message)
+        return values, reverse
+
+    def get_page_size(self, request):
+        if self.page_size_query_param:
+            try:
+                size = int(request.query_params[self.page_size_query_param])
+                if size > 0:
+                    return min(size, self.max_page_size)
+            except (KeyError, ValueError):
+                pass
+        return self.page_size
+
+    # --- Paging ---
+
+    def _start(self, request, ordering):
+        self.request = request
+        self.base_url = request.build_absolute_uri()
+        self.limit = self.get_page_size(request)
+        self.ordering = tuple(ordering)
+        values, reverse = self.decode_cursor(request, self.ordering)
+        return values, reverse, (self._reverse(self.ordering) if reverse else self.ordering)
+
+    def _page_queryset(self, queryset, ordering, values):
+        queryset = queryset.order_by(*ordering)
+        if values is not None:
+            queryset = queryset.filter(self.keyset_filter(ordering, values))
+        return queryset[:self.limit + 1]
+
+    def paginate_queryset(self, queryset, request, view=None):
+        values, reverse, ordering = self._start(request, self.get_ordering(queryset, view))
+        try:
+            rows = list(self._page_queryset(queryset, ordering, values))
+        except DjangoValidationError:
+            # Cursor values that do not parse as the field's type
+            raise NotFound(self.invalid_cursor_message)
+        return self._build_page(rows, values is not None, reverse)
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        """
+        paginate_queryset() for async views, reading the page with the async ORM.
+        """
+        values, reverse, ordering = self._start(request, self.get_ordering(queryset, view))
+        try:
+            rows = [obj async for obj in self._page_queryset(queryset, ordering, values)]
+        except DjangoValidationError:
+            raise NotFound(self.invalid_cursor_message)
+        return self._build_page(rows, values is not None, reverse)
+
+    def _start_merged(self, querysets, request, view):
+        values, reverse, ordering = self._start(request, self.get_ordering(querysets[0], view))
+        descending = ordering[0].startswith('-')
+        if any(f.startswith('-') != descending for f in ordering):
+            raise ValueError('paginate_merged requires all ordering fields to share one direction')
+        return values, reverse, ordering
+
+    def _merge_streams(self, streams, ordering, values, reverse):
+        fields = [self._field_name(f) for f in ordering]
+        sort_key = lambda obj: tuple(obj.pk if f == 'pk' else _resolve(obj, f) for f in fields)
+
+        rows, seen = [], set()
+        for obj in heapq.merge(*streams, key=sort_key, reverse=ordering[0].startswith('-')):
+            # The ordering ends with the primary key (see get_ordering)
+            pk = sort_key(obj)[-1]
+            if pk in seen:
+                continue
+            seen.add(pk)
+            rows.append(obj)
+            if len(rows) > self.limit:
+                break
+        return self._build_page(rows, values is not None, reverse)
+
+    def paginate_merged(self, querysets, request, view=None):
+        """
+        Paginates the union of several querysets that share one ordering, e.g. the
+        "given" and "received" endorsement streams. Each stream is read from its own
+        index for at most one page past the cursor, then the streams are merged in
+        memory and de-duplicated by primary key.
+        """
+        values, reverse, ordering = self._start_merged(querysets, request, view)
+        streams = []
+        for queryset in querysets:
+            try:
+                streams.append(list(self._page_queryset(queryset, ordering, values)))
+            except DjangoValidationError:
+                raise NotFound(self.invalid_cursor_message)
+        return self._merge_streams(streams, ordering, values, reverse)
+
+    async def apaginate_merged(self, querysets, request, view=None):
+        values, reverse, ordering = self._start_merged(querysets, request, view)
+        streams = []
+        for queryset in querysets:
+            try:
+                streams.append([obj async for obj in self._page_queryset(queryset, ordering, values)])
+            except DjangoValidationError:
+                raise NotFound(self.invalid_cursor_message)
+        return self._merge_streams(streams, ordering, values, reverse)
+
+    def paginate_forward(self, fetch, request, ordering):
+        """
+        Paginates a custom data source that can only be read newest-first, such as
+        the materialized feed. 'fetch(after, limit)' receives the keyset position
+        of the previous page's last row (or None) and returns up to 'limit' items.
+        """
+        values, _, _ = self._start(request, ordering)
+        try:
+            rows = list(fetch(values, self.limit + 1))
+        except DjangoValidationError:
+            raise NotFound(self.invalid_cursor_message)
+        return self._build_page(rows, False, False)
+
+    async def apaginate_forward(self, fetch, request, ordering):
+        """
+        paginate_forward() where 'fetch' is a coroutine function.
+        """
+        values, _, _ = self._start(request, ordering)
+        try:
+            rows = list(await fetch(values, self.limit + 1))
+        except DjangoValidationError:
+            raise NotFound(self.invalid_cursor_message)
+        return self._build_page(rows, False, False)
+
+    def _build_page(self, rows, has_cursor, reverse):
+        has_more = len(rows) > self.limit
+        rows = rows[:self.limit]
+        if reverse:
+            rows.reverse()
+            self.has_previous, self.has_next = has_more, True
+        else:
+            self.has_previous, self.has_next = has_cursor, has_more
+        self.page = rows
+        return rows
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        return self.encode_cursor(self.position_of(self.page[-1], self.ordering))
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        if not self.page:
+            return remove_query_param(self.base_url, self.cursor_query_param)
+        return self.encode_cursor(self.position_of(self.page[0], self._reverse(self.ordering)), reverse=True)
+
+    def get_paginated_data(self, data):
+        return OrderedDict([
+            ('next', self.get_next_link()),
+            ('previous', self.get_previous_link()),
+            ('results', data),
+        ])
+
+    def get_paginated_response(self, data):
+        return Response(self.get_paginated_data(data))
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'previous': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
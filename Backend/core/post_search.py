@@ -0,0 +1,212 @@
+"""
+Full-text search over post content.
+
+Every post has a PostSearchDocument holding its content as search tokens:
+lower-cased words with stop words and overlong runs dropped. The database
+keeps an inverted index over those tokens:
+
+* SQLite: the FTS5 table core_post_fts, ranked with bm25(),
+* PostgreSQL: a generated tsvector column with a GIN index, ranked with ts_rank_cd(),
+* anything else: no index, a LIKE scan over the tokens, newest first.
+
+Queries go through the same tokenizer, so a document and a query always agree
+on what a word is. All words must match; the last one also matches as a
+prefix, for search-as-you-type. Equally relevant posts come newest first.
+
+The documents are written by the Post post_save handler in core.signals and
+deleted with their post. Rows written around the ORM (bulk_create, raw SQL)
+are picked up by 'manage.py reindex_posts', which also indexes the posts that
+existed before migration 0012.
+"""
+import re
+
+from django.conf import settings
+from django.db import connection, transaction
+
+from .models import Post, PostSearchDocument
+
+WORD_RE = re.compile(r'\w+')
+
+# Too common to narrow a search down; dropped from documents and queries alike
+STOP_WORDS = frozenset((
+    'a', 'an', 'and', 'are', 'as', 'at', 'be', 'but', 'by', 'for', 'if', 'in', 'into', 'is', 'it',
+    'of', 'on', 'or', 'so', 'that', 'the', 'their', 'then', 'there', 'these', 'they', 'this', 'to',
+    'was', 'were', 'will', 'with',
+))
+
+# Longer runs of word characters are hashes, encoded data or keyboard mashing, not words
+MAX_TOKEN_LENGTH = 40
+
+# Words of a query past this many are ignored; each one is another posting list to intersect
+MAX_QUERY_TOKENS = 16
+
+BATCH_SIZE = 1000
+
+
+def tokenize(text):
+    return [
+        word for word in WORD_RE.findall((text or '').lower())
+        if word not in STOP_WORDS and len(word) <= MAX_TOKEN_LENGTH
+    ]
+
+
+# --- Index maintenance ---
+
+def index_post(post, created=False):
+    """
+    Writes the post's search document. A new post's document is inserted
+    without looking for an existing one.
+    """
+    tokens = ' '.join(tokenize(post.content))
+    if created:
+        PostSearchDocument.objects.create(post=post, tokens=tokens)
+    else:
+        PostSearchDocument.objects.update_or_create(post=post, defaults={'tokens': tokens})
+
+
+def index_posts(rows):
+    """
+    Upserts the search documents of (post id, content) pairs in batches.
+    """
+    documents = [PostSearchDocument(post_id=post_id, tokens=' '.join(tokenize(content))) for post_id, content in rows]
+    PostSearchDocument.objects.bulk_create(
+        documents, batch_size=BATCH_SIZE,
+        update_conflicts=True, unique_fields=['post'], update_fields=['tokens'],
+    )
+    return len(documents)
+
+
+def reindex_all(chunk_size=2000):
+    """
+    Rewrites every post's search document, walking Post in primary-key chunks
+    with one transaction each, so memory and lock time stay flat however many
+    posts there are. Yields the number of posts indexed so far after each chunk.
+    """
+    last_pk, indexed = None, 0
+    while True:
+        chunk = Post.objects.order_by('pk')
+        if last_pk is not None:
+            chunk = chunk.filter(pk__gt=last_pk)
+        rows = list(chunk.values_list('pk', 'content')[:chunk_size])
+        if not rows:
+            break
+        with transaction.atomic():
+            indexed += index_posts(rows)
+        last_pk = rows[-1][0]
+        yield indexed
+    optimize()
+
+
+def optimize():
+    """
+    Merges the FTS5 index's segments after a bulk load (a no-op elsewhere;
+    PostgreSQL's GIN index is maintained by VACUUM).
+    """
+    if connection.vendor == 'sqlite':
+        with connection.cursor() as cursor:
+            cursor.execute("INSERT INTO core_post_fts(core_post_fts) VALUES ('optimize')")
+
+
+# --- Backends ---
+
+def filter_sql(author=None, related_skill=None):
+    clauses, params = [], []
+    if author is not None:
+        clauses.append('p.author_id = %s')
+        params.append(author)
+    if related_skill is not None:
+        clauses.append('p.related_skill_id = %s')
+        params.append(related_skill)
+    return ''.join(f' AND {clause}' for clause in clauses), params
+
+
+class FTS5PostIndex:
+    """
+    SQLite FTS5 over core_post_fts, best bm25() score first.
+    """
+    def match_expression(self, tokens):
+        # Quoted, so no word can be read as FTS5 syntax
+        return ' '.join(f'"{token}"' for token in tokens) + '*'
+
+    def search(self, tokens, limit, offset=0, author=None, related_skill=None):
+        filters, params = filter_sql(author, related_skill)
+        sql = f"""
+            SELECT p.id
+            FROM core_post_fts f
+            JOIN core_postsearchdocument d ON d.id = f.rowid
+            JOIN core_post p ON p.id = d.post_id
+            WHERE core_post_fts MATCH %s{filters}
+            ORDER BY f.rank, p.created_at DESC
+            LIMIT %s OFFSET %s
+        """
+        with connection.cursor() as cursor:
+            cursor.execute(sql, [self.match_expression(tokens), *params, limit, offset])
+            return [row[0] for row in cursor.fetchall()]
+
+
+class PostgresPostIndex:
+    """
+    PostgreSQL tsvector / GIN, best ts_rank_cd() score first.
+    """
+    def match_expression(self, tokens):
+        # Tokens are runs of word characters, which to_tsquery reads as plain lexemes
+        return ' & '.join(tokens) + ':*'
+
+    def search(self, tokens, limit, offset=0, author=None, related_skill=None):
+        filters, params = filter_sql(author, related_skill)
+        sql = f"""
+            SELECT p.id
+            FROM core_postsearchdocument d
+            JOIN core_post p ON p.id = d.post_id,
+                 to_tsquery('simple', %s) AS query
+            WHERE d.vector @@ query{filters}
+            ORDER BY ts_rank_cd(d.vector, query) DESC, p.created_at DESC
+            LIMIT %s OFFSET %s
+        """
+        with connection.cursor() as cursor:
+            cursor.execute(sql, [self.match_expression(tokens), *params, limit, offset])
+            return [row[0] for row in cursor.fetchall()]
+
+
+class DatabasePostIndex:
+    """
+    Works on any database without a full-text index: every word must appear in
+    the tokens, newest post first.
+    """
+    def search(self, tokens, limit, offset=0, author=None, related_skill=None):
+        posts = Post.objects.order_by('-created_at', '-id')
+        for token in tokens:
+            posts = posts.filter(search_document__tokens__contains=token)
+        if author is not None:
+            posts = posts.filter(author_id=author)
+        if related_skill is not None:
+            posts = posts.filter(related_skill_id=related_skill)
+        return list(posts.values_list('pk', flat=True)[offset:offset + limit])
+
+
+BACKENDS = {'fts5': FTS5PostIndex, 'postgres': PostgresPostIndex, 'database': DatabasePostIndex}
+VENDOR_BACKENDS = {'sqlite': 'fts5', 'postgresql': 'postgres'}
+
+
+def get_index():
+    """
+    The POST_SEARCH_BACKEND setting's backend; 'auto' picks the database's own index.
+    """
+    backend = getattr(settings, 'POST_SEARCH_BACKEND', 'auto')
+    if backend == 'auto':
+        backend = VENDOR_BACKENDS.get(connection.vendor, 'database')
+    return BACKENDS[backend]()
+
+
+def search(query, limit=10, offset=0, author=None, related_skill=None):
+    """
+    Returns the ids of up to 'limit' posts matching every word of the query,
+    most relevant first, optionally only those by an author (user id) or about
+    a skill (skill id).
+    """
+    tokens = tokenize(query)[:MAX_QUERY_TOKENS]
+    if not tokens:
+        return []
+    to_python = Post._meta.pk.to_python
+    ids = get_index().search(tokens, limit, offset, author=author, related_skill=related_skill)
+    return [to_python(post_id) for post_id in ids]
@@ -0,0 +1,166 @@
+"""
+Materialized profile cards: the JSON body of GET /api/profiles/<username>/,
+rendered once and kept as bytes in an in-process LRU keyed by username.
+
+Each card is stored with the response cache versions (core.response_cache) of
+the namespaces it was rendered from, read before its rows were. A card is
+served while those versions are current, so a hit costs one version lookup and
+no query or serializer, and a card rendered from rows that changed during the
+render is never served. Because the versions live in the shared response cache
+backend, a write handled by one worker also retires the cards of the others.
+
+When a profile, card, endorsement or user changes, the handlers in core.signals
+call invalidate() for the users concerned. After the write commits, those of
+their cards this process holds (the ones being read) are re-rendered, so the
+next reader usually still gets a hit: by a background thread with its own
+connection when PROFILE_CARD_ASYNC_REBUILD is on, else in the committing
+request. The test runner (skilllink_backend_config.test_runner) turns it off,
+so no thread writes to the test database behind a test's back. Other cards,
+and all cards after a Skill change, are re-rendered by their next reader.
+"""
+import threading
+from collections import OrderedDict
+
+from django.conf import settings
+from django.db import transaction
+
+from . import response_cache
+from .background import BatchWorker
+from .models import SkillProfile
+from .renderers import ORJSONRenderer
+from .serializers import SkillProfileSerializer
+
+MAX_ENTRIES = getattr(settings, 'PROFILE_CARD_CACHE_SIZE', 10000)
+REBUILD_BATCH_SIZE = 200
+
+
+def namespaces(username):
+    """
+    What a card shows: skill names, its own rows, and anything bulk repairs touch.
+    """
+    return ['profile:' + username, 'profiles', 'skills']
+
+
+def _versions(username):
+    names = namespaces(username)
+    current = response_cache.versions(names)
+    return tuple(current[name] for name in names)
+
+
+class ProfileCardCache:
+    """
+    username -> (user_id, versions, content), with LRU eviction. Thread-safe.
+    """
+    def __init__(self, max_entries=MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._cards = OrderedDict()
+        self._usernames = {}   # user_id -> username, for cached cards
+
+    def __len__(self):
+        return len(self._cards)
+
+    def get(self, username, versions):
+        with self._lock:
+            entry = self._cards.get(username)
+            if entry is None or entry[1] != versions:
+                return None
+            self._cards.move_to_end(username)
+            return entry[2]
+
+    def put(self, user_id, username, versions, content):
+        with self._lock:
+            self._drop(user_id)
+            self._cards[username] = (user_id, versions, content)
+            self._usernames[user_id] = username
+            while len(self._cards) > self.max_entries:
+                _, (evicted_id, _, _) = self._cards.popitem(last=False)
+                self._usernames.pop(evicted_id, None)
+
+    def _drop(self, user_id):
+        username = self._usernames.pop(user_id, None)
+        if username is not None:
+            self._cards.pop(username, None)
+        return username is not None
+
+    def discard(self, user_ids):
+        """
+        Drops the users' cards. Returns the ids of those that were cached.
+        """
+        with self._lock:
+            return {user_id for user_id in user_ids if self._drop(user_id)}
+
+    def clear(self):
+        with self._lock:
+            self._cards.clear()
+            self._usernames.clear()
+
+
+cache = ProfileCardCache()
+
+
+# --- Rendering ---
+
+def _render(profiles):
+    renderer = ORJSONRenderer()
+    for profile in profiles:
+        yield profile.user_id, profile.user.username, renderer.render(SkillProfileSerializer(profile).data)
+
+
+def get_card(username):
+    """
+    The rendered card for the username, or None if there is no such profile.
+    """
+    versions = _versions(username)
+    content = cache.get(username, versions)
+    if content is not None:
+        return content
+    profiles = SkillProfileSerializer.query_plan.apply(SkillProfile.objects.filter(user__username=username))
+    for user_id, name, content in _render(profiles):
+        cache.put(user_id, name, versions, content)
+        return content
+    return None
+
+
+def rebuild(user_ids):
+    """
+    Renders and stores the cards of the given users, a batch per query plan.
+    """
+    user_ids = list(user_ids)
+    for start in range(0, len(user_ids), REBUILD_BATCH_SIZE):
+        batch = user_ids[start:start + REBUILD_BATCH_SIZE]
+        usernames = SkillProfile.objects.filter(user_id__in=batch).values_list('user__username', flat=True)
+        # Versions first, so a write landing during the render makes the card stale
+        versions = {username: _versions(username) for username in usernames}
+        profiles = SkillProfileSerializer.query_plan.apply(SkillProfile.objects.filter(user_id__in=batch))
+        for user_id, username, content in _render(profiles):
+            if username in versions:
+                cache.put(user_id, username, versions[username], content)
+
+
+# Looks rebuild up on each run, so tests can patch it
+rebuilder = BatchWorker('profile-card-rebuilder', lambda user_ids: rebuild(user_ids))
+
+
+# --- Invalidation ---
+
+def invalidate(user_ids):
+    """
+    Call with the users whose cards a write in progress changes, alongside the
+    response cache invalidation that makes their cards stale. Once the write
+    commits, the ones cached here are re-rendered.
+    """
+    user_ids = set(user_ids)
+    if not user_ids:
+        return
+
+    def refresh():
+        hot = cache.discard(user_ids)
+        if not hot:
+            return
+        # Read on every commit, so the test runner and override_settings apply
+        if getattr(settings, 'PROFILE_CARD_ASYNC_REBUILD', True):
+            rebuilder.schedule(hot)
+        else:
+            rebuild(hot)
+    transaction.on_commit(refresh)
@@ -0,0 +1,107 @@
+"""
+Declarative eager loading for serializers.
+
+Each serializer declares the select_related / prefetch_related / only() it needs
+as a 'query_plan' class attribute, and nested serializers contribute their own
+plan under the field's path. Viewsets using QueryPlanMixin apply the plan of
+their serializer to every queryset they list or retrieve, so a page of results
+costs a fixed number of queries no matter how many rows it holds.
+"""
+from django.db.models import Prefetch
+
+
+def _merge(first, second):
+    # Concatenates lookups while keeping the first occurrence of each
+    merged = list(first)
+    keys = {_lookup_key(item) for item in merged}
+    for item in second:
+        if _lookup_key(item) not in keys:
+            merged.append(item)
+            keys.add(_lookup_key(item))
+    return tuple(merged)
+
+
+def _lookup_key(item):
+    return item.prefetch_to if isinstance(item, Prefetch) else item
+
+
+class QueryPlan:
+    """
+    The related rows and columns a serializer reads.
+    """
+    def __init__(self, select_related=(), prefetch_related=(), only=()):
+        self.select_related = tuple(select_related)
+        self.prefetch_related = tuple(prefetch_related)
+        self.only = tuple(only)
+
+    def __add__(self, other):
+        return QueryPlan(
+            select_related=_merge(self.select_related, other.select_related),
+            prefetch_related=_merge(self.prefetch_related, other.prefetch_related),
+            only=_merge(self.only, other.only),
+        )
+
+    def __repr__(self):
+        return (f"QueryPlan(select_related={self.select_related!r}, "
+                f"prefetch_related={self.prefetch_related!r}, only={self.only!r})")
+
+    def nested(self, path):
+        """
+        Re-roots this plan under a forward relation, e.g. UserSerializer's plan
+        under 'endorser' becomes select_related('endorser') + only('endorser__username', ...).
+        """
+        prefetches = []
+        for item in self.prefetch_related:
+            if isinstance(item, Prefetch):
+                prefetches.append(Prefetch(f'{path}__{item.prefetch_through}', queryset=item.queryset, to_attr=item.to_attr))
+            else:
+                prefetches.append(f'{path}__{item}')
+        return QueryPlan(
+            select_related=(path,) + tuple(f'{path}__{s}' for s in self.select_related),
+            prefetch_related=prefetches,
+            only=tuple(f'{path}__{f}' for f in self.only),
+        )
+
+    @classmethod
+    def many(cls, lookup, queryset, plan):
+        """
+        A plan that prefetches a to-many relation, loading it with the nested serializer's plan.
+        """
+        return cls(prefetch_related=(Prefetch(lookup, queryset=plan.apply(queryset)),))
+
+    def apply(self, queryset):
+        if self.select_related:
+            queryset = queryset.select_related(*self.select_related)
+        if self.prefetch_related:
+            queryset = queryset.prefetch_related(*self.prefetch_related)
+        if self.only:
+            queryset = queryset.only(*self.only)
+        return queryset
+
+
+EMPTY_PLAN = QueryPlan()
+
+
+def plan_for(serializer_class):
+    return getattr(serializer_class, 'query_plan', EMPTY_PLAN)
+
+
+class QueryPlanMixin:
+    """
+    ViewSet mixin that applies the serializer's query plan to list and detail querysets.
+
+    Actions named in 'values_serializer_classes' are served by that serializer
+    instead, which reads .values() rows holding just its 'columns'.
+    """
+    values_serializer_classes = {}
+
+    def get_serializer_class(self):
+        return self.values_serializer_classes.get(getattr(self, 'action', None)) or super().get_serializer_class()
+
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+        serializer_class = self.get_serializer_class()
+        columns = getattr(serializer_class, 'columns', None)
+        if columns is not None:
+            return queryset.values(*columns)
+        return plan_for(serializer_class).apply(queryset)
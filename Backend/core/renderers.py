@@ -0,0 +1,82 @@
+"""
+JSON renderer and parser backed by orjson, a drop-in for DRF's JSONRenderer and
+JSONParser (the defaults in REST_FRAMEWORK).
+
+orjson encodes and decodes several times faster than the stdlib json module and
+writes UTF-8 bytes directly instead of building a str first. The output is
+byte-for-byte what JSONRenderer produces with the default settings: compact
+separators, UTF-8 rather than \\u escapes, \\u2028 / \\u2029 escaped, and
+datetimes, Decimals, lazy strings and the like converted by DRF's encoder.
+
+Both classes fall back to the DRF implementation when orjson is not installed
+and for anything orjson does differently: indented output (?indent= or the
+browsable API), non-default UNICODE_JSON / COMPACT_JSON / STRICT_JSON settings,
+integers outside 64 bits and non-UTF-8 request bodies.
+"""
+import io
+import re
+
+from rest_framework.parsers import JSONParser, get_encoding
+from rest_framework.renderers import JSONRenderer
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# orjson decodes integers beyond 64 bits as floats; bodies with such a run of
+# digits (even inside a string) are left to json
+LONG_NUMBER = re.compile(rb'\d{20}')
+
+if orjson is not None:
+    # Datetimes go to DRF's encoder, which formats them as JSONRenderer does
+    OPTIONS = orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS
+
+
+class ORJSONRenderer(JSONRenderer):
+    """
+    JSONRenderer with orjson doing the encoding.
+    """
+    def __init__(self):
+        self._default = self.encoder_class().default
+
+    def supported(self, accepted_media_type, renderer_context):
+        return (
+            orjson is not None
+            and self.compact and self.strict and not self.ensure_ascii
+            and self.get_indent(accepted_media_type, renderer_context or {}) is None
+        )
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        if not self.supported(accepted_media_type, renderer_context):
+            return super().render(data, accepted_media_type, renderer_context)
+        try:
+            ret = orjson.dumps(data, default=self._default, option=OPTIONS)
+        except orjson.JSONEncodeError:
+            # e.g. integers over 64 bits, which json encodes and orjson refuses
+            return super().render(data, accepted_media_type, renderer_context)
+        if b'\xe2\x80\xa8' in ret or b'\xe2\x80\xa9' in ret:
+            ret = ret.replace(b'\xe2\x80\xa8', b'\\u2028').replace(b'\xe2\x80\xa9', b'\\u2029')
+        return ret
+
+
+class ORJSONParser(JSONParser):
+    """
+    JSONParser with orjson doing the decoding.
+    """
+    renderer_class = ORJSONRenderer
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        encoding = get_encoding(parser_context or {})
+        if orjson is None or not self.strict or encoding.lower().replace('_', '-') not in ('utf-8', 'utf8'):
+            return super().parse(stream, media_type, parser_context)
+        body = stream.read()
+        if LONG_NUMBER.search(body):
+            return super().parse(io.BytesIO(body), media_type, parser_context)
+        try:
+            return orjson.loads(body)
+        except orjson.JSONDecodeError:
+            # Let json word the error, as clients already see it
+            return super().parse(io.BytesIO(body), media_type, parser_context)
@@ -0,0 +1,114 @@
+"""
+Read-replica routing for read-only API actions.
+
+Nothing goes to a replica by default. Views opt in with ReplicaReadMixin, which
+marks the listed actions (SkillViewSet list / retrieve) as replica-safe for the
+duration of the request; PrimaryReplicaRouter then sends their reads to one of
+settings.DATABASE_REPLICAS. Writes, migrations and every other read stay on
+'default'.
+
+Replicas lag behind the primary, so a replica-safe read still goes to the
+primary when:
+
+* the client wrote something within DATABASE_REPLICA_LAG_SECONDS
+  (read-your-writes: ReplicaPinMiddleware sets a short-lived cookie after any
+  successful unsafe request), or
+* combined with CachedResponseMixin, the data the action depends on changed
+  within that window, so a lagging replica cannot get stale rows cached under
+  the new version.
+"""
+import contextvars
+import random
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from rest_framework.permissions import SAFE_METHODS
+
+LAG_SECONDS = getattr(settings, 'DATABASE_REPLICA_LAG_SECONDS', 5)
+PIN_COOKIE = 'skilllink_primary'
+
+_replica_safe = contextvars.ContextVar('skilllink_replica_safe', default=False)
+
+
+def replica_aliases():
+    return getattr(settings, 'DATABASE_REPLICAS', ())
+
+
+def pick_replica():
+    return random.choice(replica_aliases())
+
+
+class PrimaryReplicaRouter:
+    def db_for_read(self, model, **hints):
+        if _replica_safe.get() and replica_aliases():
+            return pick_replica()
+        return 'default'
+
+    def db_for_write(self, model, **hints):
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold the same rows as the primary
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db not in replica_aliases()
+
+
+class ReplicaReadMixin:
+    """
+    Lets the actions in 'replica_actions' read from a replica.
+    """
+    replica_actions = ('list', 'retrieve')
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        self._replica_token = None
+        if (
+            self.action in self.replica_actions
+            and request.method in SAFE_METHODS
+            and replica_aliases()
+            and PIN_COOKIE not in request.COOKIES
+            and not self._recently_changed()
+        ):
+            self._replica_token = _replica_safe.set(True)
+
+    def _recently_changed(self):
+        newest = getattr(self, '_newest_version', None)
+        # Version tokens are microsecond timestamps (core.response_cache)
+        return newest is not None and time.time_ns() // 1000 - newest < LAG_SECONDS * 1_000_000
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        if getattr(self, '_replica_token', None) is not None:
+            _replica_safe.reset(self._replica_token)
+            self._replica_token = None
+        return super().finalize_response(request, response, *args, **kwargs)
+
+
+class ReplicaPinMiddleware:
+    """
+    Pins a client to the primary for DATABASE_REPLICA_LAG_SECONDS after it
+    writes, via a cookie, so it reads its own writes on any worker.
+    Runs natively under both WSGI and ASGI.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        return self.pin(request, self.get_response(request))
+
+    async def __acall__(self, request):
+        return self.pin(request, await self.get_response(request))
+
+    def pin(self, request, response):
+        if request.method not in SAFE_METHODS and response.status_code < 400 and replica_aliases():
+            response.set_cookie(PIN_COOKIE, '1', max_age=LAG_SECONDS, httponly=True, samesite='Lax')
+        return response
@@ -0,0 +1,259 @@
+"""
+Versioned response cache with conditional GET support for read-mostly endpoints.
+
+Every cached action declares the "namespaces" its output depends on, e.g. a
+profile page depends on 'skills' and 'profile:<username>'. Each namespace has a
+version token (a microsecond timestamp) that the signal handlers in
+core.signals bump after a write commits. The ETag of a response is a hash of
+the URL, the negotiated media type and the versions of its namespaces, so:
+
+* a client presenting a current ETag (If-None-Match) or date (If-Modified-Since)
+  gets a 304 without any query or serialization, and
+* other clients get the rendered bytes stored under that ETag, until any
+  dependency changes and the key naturally stops being used.
+
+Stale entries are never deleted explicitly; the LRU backend evicts them.
+Writes that bypass model signals (bulk_create, queryset.update()) must call
+bump() for the namespaces they touch.
+
+The backend is configured with RESPONSE_CACHE in settings.py. The default
+local-memory LRU is per process, so multi-process deployments should use
+RedisBackend, which works with any client exposing the redis-py get/set/mget
+methods (redis.Redis, or an in-process stand-in such as fakeredis).
+"""
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.http import HttpResponse, HttpResponseNotModified
+from django.utils.http import http_date, parse_http_date_safe, quote_etag
+from django.utils.module_loading import import_string
+from rest_framework.response import Response
+
+# --- Backends ---
+
+class LocMemLRUBackend:
+    """
+    Thread-safe in-process LRU map. Version tokens are kept in their own LRU
+    of up to 'max_versions' (per-user namespaces add one for every user seen).
+    Evicting a version is safe: the namespace gets a new one, newer than any
+    evicted, so whatever was cached under the old one is simply missed.
+    """
+    local = True
+
+    def __init__(self, max_entries=5000, max_versions=100_000):
+        self.max_entries = max_entries
+        self.max_versions = max_versions
+        self._entries = OrderedDict()
+        self._versions = OrderedDict()
+        self._evicted_version = 0
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            value = self._entries.get(key)
+            if value is not None:
+                self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def get_versions(self, names):
+        with self._lock:
+            found = {name: self._versions[name] for name in names if name in self._versions}
+            for name in found:
+                self._versions.move_to_end(name)
+            return found
+
+    def set_version(self, name, token):
+        with self._lock:
+            # Never move backwards, so Last-Modified only increases
+            self._versions[name] = max(token, self._versions.get(name, self._evicted_version) + 1)
+            self._versions.move_to_end(name)
+            while len(self._versions) > self.max_versions:
+                _, evicted = self._versions.popitem(last=False)
+                self._evicted_version = max(self._evicted_version, evicted)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._versions.clear()
+            self._evicted_version = 0
+
+
+class RedisBackend:
+    """
+    Shared backend over a redis-py compatible client. Responses expire after
+    'timeout' seconds so Redis' own eviction can reclaim them.
+    """
+    local = False
+
+    def __init__(self, client=None, client_class='redis.Redis', url=None, prefix='skilllink:rc:', timeout=3600):
+        if client is None:
+            client_class = import_string(client_class)
+            client = client_class.from_url(url) if url else client_class()
+        self.client = client
+        self.prefix = prefix
+        self.timeout = timeout
+
+    def get(self, key):
+        return self.client.get(self.prefix + key)
+
+    def set(self, key, value):
+        self.client.set(self.prefix + key, value, ex=self.timeout)
+
+    def get_versions(self, names):
+        values = self.client.mget([self.prefix + 'v:' + name for name in names])
+        return {name: int(value) for name, value in zip(names, values) if value is not None}
+
+    def set_version(self, name, token):
+        self.client.set(self.prefix + 'v:' + name, token)
+
+    def clear(self):
+        for key in self.client.scan_iter(self.prefix + '*'):
+            self.client.delete(key)
+
+
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def get_backend():
+    global _backend
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                config = getattr(settings, 'RESPONSE_CACHE', {})
+                backend_class = import_string(config.get('BACKEND', 'core.response_cache.LocMemLRUBackend'))
+                _backend = backend_class(**config.get('OPTIONS', {}))
+    return _backend
+
+
+def set_backend(backend):
+    """
+    Replaces the configured backend (used by tests).
+    """
+    global _backend
+    _backend = backend
+
+
+# --- Versions ---
+
+def _now_token():
+    return time.time_ns() // 1000
+
+
+def bump(*namespaces):
+    """
+    Marks namespaces as changed. Call after the write has committed.
+    """
+    backend = get_backend()
+    token = _now_token()
+    for name in namespaces:
+        backend.set_version(name, token)
+
+
+def invalidate(*namespaces):
+    """
+    Bumps the namespaces for a write in progress: right away, so later reads in
+    the same transaction miss, and again after commit, so nothing another request
+    cached from the old rows in the meantime is served afterwards.
+    """
+    bump(*namespaces)
+    transaction.on_commit(lambda: bump(*namespaces))
+
+
+def invalidate_profiles(user_ids):
+    usernames = User.objects.filter(pk__in=list(user_ids)).values_list('username', flat=True)
+    invalidate(*('profile:' + username for username in usernames))
+
+
+def versions(namespaces):
+    backend = get_backend()
+    found = backend.get_versions(namespaces)
+    for name in namespaces:
+        if name not in found:
+            # First sight of a namespace: start its clock now
+            backend.set_version(name, _now_token())
+    found.update(backend.get_versions([n for n in namespaces if n not in found]))
+    return found
+
+
+# --- ViewSet mixin ---
+
+class CachedResponseMixin:
+    """
+    Serves the actions listed in 'cache_dependencies' from the response cache.
+
+    'cache_dependencies' maps an action name to a function of the view that
+    returns the namespaces that action's output depends on.
+    """
+    cache_dependencies = {}
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        self._cache_key = self._newest_version = None
+        dependencies = self.cache_dependencies.get(self.action)
+        if request.method not in ('GET', 'HEAD') or dependencies is None:
+            return
+
+        namespaces = sorted(dependencies(self))
+        current = versions(namespaces)
+        digest = hashlib.sha1(
+            '\n'.join(
+                [request.get_full_path(), request.accepted_media_type or '']
+                + [f'{name}={current[name]}' for name in namespaces]
+            ).encode('utf-8')
+        ).hexdigest()
+        self._cache_key = 'resp:' + digest
+        self._etag = quote_etag(digest)
+        self._newest_version = max(current.values()) if current else None
+        # Rounded up: HTTP dates are whole seconds, and a date that a later change
+        # in the same second shares must not validate the older response
+        self._last_modified = -(-self._newest_version // 1_000_000) if current else None
+
+        cached = self._conditional_response(request) or self._stored_response()
+        if cached is not None:
+            # Short-circuit the handler: DRF looks it up after initial() returns
+            setattr(self, request.method.lower(), lambda *a, **kw: cached)
+
+    def _conditional_response(self, request):
+        if_none_match = request.headers.get('If-None-Match')
+        if if_none_match is not None:
+            if self._etag in [tag.strip() for tag in if_none_match.split(',')] or if_none_match.strip() == '*':
+                return HttpResponseNotModified()
+            return None
+        since = parse_http_date_safe(request.headers.get('If-Modified-Since', ''))
+        if since is not None and self._last_modified is not None and self._last_modified <= since:
+            return HttpResponseNotModified()
+        return None
+
+    def _stored_response(self):
+        stored = get_backend().get(self._cache_key)
+        if stored is None:
+            return None
+        content_type, _, content = bytes(stored).partition(b'\n')
+        return HttpResponse(content, content_type=content_type.decode('ascii'))
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(request, response, *args, **kwargs)
+        if getattr(self, '_cache_key', None) is None:
+            return response
+        if isinstance(response, Response) and response.status_code == 200:
+            response.render()
+            get_backend().set(self._cache_key, response['Content-Type'].encode('ascii') + b'\n' + response.content)
+        if response.status_code in (200, 304):
+            response['ETag'] = self._etag
+            # Sent once that second has passed, so no later change can share it
+            if self._last_modified is not None and self._last_modified <= time.time():
+                response['Last-Modified'] = http_date(self._last_modified)
+        return response
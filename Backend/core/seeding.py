@@ -0,0 +1,227 @@
+"""
+Synthetic data at production-like volumes, for reproducing slow paths locally.
+
+Popularity follows a power law (Zipf, exponent ALPHA): a few skills are listed on
+most profiles, a few users collect most followers, endorsements and connections,
+and the long tail gets little. Everything is written with batched bulk_create,
+one transaction per chunk of users, so memory and transaction size stay bounded
+whatever the total.
+
+bulk_create sends no model signals, so the derived data the handlers normally
+keep (closure table, endorsement stats, follower counts, timelines) is rebuilt
+here and the in-process indexes and response cache are reset at the end.
+"""
+import bisect
+import itertools
+import random
+
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from . import endorsement_stats, graph, post_search, response_cache, skill_search, skill_tree, timeline
+from .models import Skill, SkillProfile, UserSkill, Post, Endorsement, Follow, Connection
+
+ALPHA = 1.1
+BATCH_SIZE = 2000
+
+SKILL_WORDS = (
+    'Python', 'JavaScript', 'TypeScript', 'Go', 'Rust', 'Java', 'Kotlin', 'Swift', 'C++', 'SQL',
+    'Django', 'React', 'Vue', 'Node.js', 'Docker', 'Kubernetes', 'Linux', 'Git', 'GraphQL', 'PostgreSQL',
+    'Machine Learning', 'Data Analysis', 'Statistics', 'Excel', 'Figma', 'UX Research', 'Copywriting',
+    'Photography', 'Video Editing', 'Public Speaking', 'Spanish', 'French', 'German', 'Japanese',
+    'Guitar', 'Piano', 'Drawing', 'Cooking', 'Yoga', 'Chess', 'Accounting', 'Marketing', 'SEO',
+)
+SKILL_LEVELS = ('Basics', 'Advanced', 'Testing', 'Performance', 'Tooling', 'Design', 'Teaching')
+POST_WORDS = (
+    'learning', 'today', 'finally', 'shipped', 'looking', 'for', 'someone', 'to', 'practice', 'with',
+    'great', 'session', 'thanks', 'tips', 'project', 'help', 'weekend', 'question', 'about', 'the',
+)
+
+
+class Zipf:
+    """
+    Draws items with probability proportional to 1 / rank**alpha.
+    """
+    def __init__(self, items, rng, alpha=ALPHA):
+        self.items = list(items)
+        self.rng = rng
+        self.cumulative = list(itertools.accumulate(1 / rank ** alpha for rank in range(1, len(self.items) + 1)))
+
+    def draw(self):
+        return self.items[bisect.bisect(self.cumulative, self.rng.random() * self.cumulative[-1])]
+
+    def distinct(self, k, exclude=()):
+        """
+        Up to k distinct items; gives up after a bounded number of draws, so
+        asking for more than the head of the distribution cannot loop forever.
+        """
+        picked = set()
+        for _ in range(k * 4):
+            if len(picked) == k:
+                break
+            item = self.draw()
+            if item not in exclude:
+                picked.add(item)
+        return picked
+
+
+def _about(rng, mean):
+    # Exponentially distributed count with the given mean; most small, a few large
+    return int(rng.expovariate(1 / mean) + 0.5) if mean > 0 else 0
+
+
+def _chunks(items, size):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def _skill_names(count, rng):
+    taken = set(Skill.objects.values_list('name', flat=True))
+    names = []
+    for name in itertools.chain(
+        SKILL_WORDS,
+        (f'{word} {level}' for level in SKILL_LEVELS for word in SKILL_WORDS),
+        (f'Skill {n}' for n in itertools.count(1)),
+    ):
+        if len(names) == count:
+            break
+        if name not in taken:
+            names.append(name)
+            taken.add(name)
+    rng.shuffle(names)
+    return names
+
+
+def _first_free_suffix(prefix):
+    suffixes = [
+        int(name[len(prefix):]) for name in User.objects.filter(username__startswith=prefix).values_list('username', flat=True)
+        if name[len(prefix):].isdigit()
+    ]
+    return max(suffixes, default=0) + 1
+
+
+# --- Stages ---
+
+def seed_skills(count, rng):
+    """
+    Creates 'count' skills: about a fifth are roots, the rest sit one level below
+    a random root. Returns their ids in popularity order, most popular first.
+    """
+    names = _skill_names(count, rng)
+    roots = Skill.objects.bulk_create([Skill(name=name) for name in names[:max(1, count // 5)]], batch_size=BATCH_SIZE)
+    children = Skill.objects.bulk_create(
+        [Skill(name=name, parent_skill_id=rng.choice(roots).pk) for name in names[len(roots):]], batch_size=BATCH_SIZE
+    )
+    skill_ids = [skill.pk for skill in roots + children]
+    rng.shuffle(skill_ids)
+    return skill_ids
+
+
+def seed_users(count, prefix):
+    """
+    Creates users (with unusable passwords) and their profiles. Returns the ids.
+    """
+    start = _first_free_suffix(prefix)
+    user_ids = []
+    for numbers in _chunks(range(start, start + count), BATCH_SIZE):
+        with transaction.atomic():
+            users = User.objects.bulk_create([User(username=f'{prefix}{n}', password='!') for n in numbers])
+            SkillProfile.objects.bulk_create([SkillProfile(user=user, bio=f'Seeded profile {user.username}') for user in users])
+        user_ids.extend(user.pk for user in users)
+    return user_ids
+
+
+def seed_activity(chunk, skills, people, rng, skills_per_user, endorsements_per_card,
+                  posts_per_user, follows_per_user, connections_per_user):
+    """
+    Writes the cards, endorsements, posts, follows and connections of one chunk
+    of users in one transaction.
+    """
+    cards, endorsements, posts, follows, connections = [], [], [], [], []
+    for user_id in chunk:
+        owned = [
+            UserSkill(profile_id=user_id, skill_id=skill_id, self_rating=rng.randint(1, 5), is_public=rng.random() < 0.9)
+            for skill_id in skills.distinct(max(1, _about(rng, skills_per_user)))
+        ]
+        cards.extend(owned)
+        for card in owned:
+            endorsements.extend(
+                Endorsement(
+                    endorser_id=endorser_id, recipient_id=user_id, skill_card_id=card.pk,
+                    endorser_rating=rng.choice((None, 3, 4, 4, 5, 5)), comment=None,
+                )
+                for endorser_id in people.distinct(_about(rng, endorsements_per_card), exclude={user_id})
+            )
+        posts.extend(
+            Post(author_id=user_id, content=' '.join(rng.choices(POST_WORDS, k=rng.randint(5, 30))),
+                 related_skill_id=rng.choice(owned).skill_id if owned and rng.random() < 0.5 else None)
+            for _ in range(_about(rng, posts_per_user))
+        )
+        follows.extend(
+            Follow(follower_id=user_id, followee_id=followee_id)
+            for followee_id in people.distinct(_about(rng, follows_per_user), exclude={user_id})
+        )
+        connections.extend(
+            Connection(from_user_id=user_id, to_user_id=other_id, status=Connection.ACCEPTED)
+            for other_id in people.distinct(_about(rng, connections_per_user), exclude={user_id})
+        )
+
+    with transaction.atomic():
+        UserSkill.objects.bulk_create(cards, batch_size=BATCH_SIZE)
+        Endorsement.objects.bulk_create(endorsements, batch_size=BATCH_SIZE)
+        Post.objects.bulk_create(posts, batch_size=BATCH_SIZE)
+        post_search.index_posts((post.pk, post.content) for post in posts)
+        Follow.objects.bulk_create(follows, batch_size=BATCH_SIZE)
+        # The same pair may be drawn from both ends; the unordered-pair constraint keeps one
+        Connection.objects.bulk_create(connections, batch_size=BATCH_SIZE, ignore_conflicts=True)
+        endorsement_stats.rebuild(card.pk for card in cards)
+
+
+def count_followers(user_ids):
+    """
+    Sets follower_count from the Follow table for the given users, and their
+    fan-out mode from that.
+    """
+    followers = Follow.objects.filter(followee_id=OuterRef('user_id')).order_by().values('followee_id').annotate(n=Count('*')).values('n')
+    for chunk in _chunks(list(user_ids), BATCH_SIZE):
+        SkillProfile.objects.filter(user_id__in=chunk).update(follower_count=Coalesce(Subquery(followers), 0))
+        timeline.sync_fanout_modes(chunk)
+
+
+def seed(users=1000, skills=200, skills_per_user=5, endorsements_per_card=2, posts_per_user=5,
+         follows_per_user=10, connections_per_user=5, prefix='seed', chunk_size=1000, random_seed=None):
+    """
+    Generates the data set, yielding (stage, done, total) progress tuples.
+    """
+    rng = random.Random(random_seed)
+    skill_ids = seed_skills(skills, rng)
+    skill_tree.rebuild()
+    yield 'skills', skills, skills
+
+    user_ids = seed_users(users, prefix)
+    yield 'users', users, users
+
+    if not user_ids or not skill_ids:
+        return
+    skill_picker = Zipf(skill_ids, rng)
+    # Popularity is independent of sign-up order
+    people = Zipf(rng.sample(user_ids, len(user_ids)), rng)
+    for done, chunk in enumerate(_chunks(user_ids, chunk_size), start=1):
+        seed_activity(
+            chunk, skill_picker, people, rng, skills_per_user, endorsements_per_card,
+            posts_per_user, follows_per_user, connections_per_user,
+        )
+        yield 'activity', min(done * chunk_size, users), users
+
+    count_followers(user_ids)
+    for done, chunk in enumerate(_chunks(user_ids, chunk_size), start=1):
+        with transaction.atomic():
+            timeline.backfill_timelines(chunk)
+        yield 'timelines', min(done * chunk_size, users), users
+
+    # The in-process indexes and cached responses predate these rows
+    skill_search.reset()
+    graph.reset()
+    response_cache.bump('skills', 'skill-popularity', 'profiles')
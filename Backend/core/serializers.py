@@ -1,6 +1,13 @@
 from rest_framework import serializers
 from django.contrib.auth.models import User
-from .models import Skill, SkillProfile, UserSkill, Post, Endorsement
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.exceptions import InvalidToken, TokenError
+from rest_framework_simplejwt.serializers import TokenRefreshSerializer
+from rest_framework_simplejwt.settings import api_settings as jwt_settings
+from rest_framework_simplejwt.tokens import RefreshToken
+from . import denylist
+from .models import Skill, SkillProfile, UserSkill, Post, Endorsement, EndorsementStats, SkillMatch, Notification, Connection, Chat, ChatMember
+from .query_plans import QueryPlan
 
 # --- Helper Serializers ---
 
@@ -8,6 +15,8 @@ class UserSerializer(serializers.ModelSerializer):
     """
     Serializer for the basic Django User model, exposing only necessary fields.
     """
+    query_plan = QueryPlan(only=('id', 'username', 'first_name', 'last_name'))
+
     class Meta:
         model = User
         fields = ('id', 'username', 'first_name', 'last_name')
@@ -17,23 +26,69 @@ class SkillSerializer(serializers.ModelSerializer):
     """
     Serializer for the base Skill model (e.g., 'Python', 'Leadership').
     """
+    query_plan = QueryPlan(only=('id', 'name'))
+
     class Meta:
         model = Skill
         fields = ('id', 'name')
 
+class EndorsementStatsSerializer(serializers.ModelSerializer):
+    """
+    Serializer for the precomputed endorsement aggregates of a UserSkill card.
+    """
+    average_rating = serializers.FloatField(read_only=True)
+    rating_histogram = serializers.ListField(child=serializers.IntegerField(), read_only=True)
+
+    query_plan = QueryPlan(only=(
+        'count', 'rating_count', 'rating_sum',
+        'rating_1', 'rating_2', 'rating_3', 'rating_4', 'rating_5', 'last_endorsed_at',
+    ))
+
+    class Meta:
+        model = EndorsementStats
+        fields = ('count', 'average_rating', 'rating_histogram', 'last_endorsed_at')
+
+class SkillTreeSerializer(serializers.ModelSerializer):
+    """
+    Serializer for a skill as a node of the skill hierarchy.
+    """
+    query_plan = QueryPlan(only=('id', 'name', 'parent_skill'))
+
+    class Meta:
+        model = Skill
+        fields = ('id', 'name', 'parent_skill')
+
 # --- Core Profile Serializers ---
 
 class UserSkillSerializer(serializers.ModelSerializer):
     """
-    Serializer for the UserSkill card, showing the skill name and rating.
+    Serializer for the UserSkill card, showing the skill name, rating and endorsement totals.
     """
     skill = SkillSerializer(read_only=True) # Nested serializer to show skill details
+    endorsements = serializers.SerializerMethodField()
+
+    # 'profile' is kept so the card can be prefetched onto its profile
+    query_plan = (
+        QueryPlan(only=('id', 'profile', 'self_rating', 'is_public'))
+        + SkillSerializer.query_plan.nested('skill')
+        + EndorsementStatsSerializer.query_plan.nested('endorsement_stats')
+    )
+
+    # Shown for cards that have never been endorsed (no stats row yet)
+    EMPTY_STATS = {'count': 0, 'average_rating': None, 'rating_histogram': [0, 0, 0, 0, 0], 'last_endorsed_at': None}
 
     class Meta:
         model = UserSkill
-        fields = ('id', 'skill', 'self_rating', 'is_public')
+        fields = ('id', 'skill', 'self_rating', 'is_public', 'endorsements')
         read_only_fields = ('profile',)
 
+    def get_endorsements(self, obj):
+        try:
+            stats = obj.endorsement_stats
+        except EndorsementStats.DoesNotExist:
+            return dict(self.EMPTY_STATS)
+        return EndorsementStatsSerializer(stats).data
+
 
 class SkillProfileSerializer(serializers.ModelSerializer):
     """
@@ -43,6 +98,12 @@ class SkillProfileSerializer(serializers.ModelSerializer):
     # Use the UserSkillSerializer to represent the skills listed on the profile
     listed_skills = UserSkillSerializer(source='userskill_set', many=True, read_only=True)
 
+    query_plan = (
+        QueryPlan(only=('bio', 'location', 'profile_picture_url'))
+        + UserSerializer.query_plan.nested('user')
+        + QueryPlan.many('userskill_set', UserSkill.objects.all(), UserSkillSerializer.query_plan)
+    )
+
     class Meta:
         model = SkillProfile
         fields = ('user', 'bio', 'location', 'profile_picture_url', 'listed_skills')
@@ -66,9 +127,18 @@ class EndorsementSerializer(serializers.ModelSerializer):
     )
     
     # Read-only fields to display the endorsed skill and recipient
-    recipient_username = serializers.CharField(source='skill_card.profile.user.username', read_only=True)
+    recipient_username = serializers.CharField(source='recipient.username', read_only=True)
     endorsed_skill_name = serializers.CharField(source='skill_card.skill.name', read_only=True)
 
+    query_plan = (
+        QueryPlan(only=('id', 'comment', 'endorser_rating', 'endorsed_at'))
+        + UserSerializer.query_plan.nested('endorser')
+        + QueryPlan(
+            select_related=('recipient', 'skill_card__skill'),
+            only=('recipient__username', 'skill_card__id', 'skill_card__profile', 'skill_card__skill__name'),
+        )
+    )
+
     class Meta:
         model = Endorsement
         fields = (
@@ -93,7 +163,277 @@ class PostSerializer(serializers.ModelSerializer):
         required=False
     )
 
+    query_plan = (
+        QueryPlan(only=('id', 'content', 'created_at'))
+        + UserSerializer.query_plan.nested('author')
+        + SkillSerializer.query_plan.nested('related_skill')
+    )
+
     class Meta:
         model = Post
         fields = ('id', 'author', 'content', 'related_skill', 'related_skill_id', 'created_at')
-        read_only_fields = ('author',)
\ No newline at end of file
+        read_only_fields = ('author',)
+
+class SkillMatchSerializer(serializers.ModelSerializer):
+    """
+    Serializer for a precomputed teach/learn match.
+    """
+    candidate = UserSerializer(read_only=True)
+
+    query_plan = QueryPlan(only=('rank', 'score', 'computed_at')) + UserSerializer.query_plan.nested('candidate')
+
+    class Meta:
+        model = SkillMatch
+        fields = ('rank', 'candidate', 'score', 'computed_at')
+
+class NotificationSerializer(serializers.ModelSerializer):
+    """
+    Serializer for a (possibly coalesced) notification: 'actor' is the most recent
+    of the 'event_count' events it covers.
+    """
+    kind = serializers.CharField(source='get_kind_display', read_only=True)
+    actor = serializers.CharField(source='actor.username', read_only=True)
+    read = serializers.SerializerMethodField()
+
+    query_plan = (
+        QueryPlan(only=('id', 'kind', 'object_id', 'event_count', 'updated_at', 'read_at'))
+        + QueryPlan(select_related=('actor',), only=('actor__username',))
+    )
+
+    class Meta:
+        model = Notification
+        fields = ('id', 'kind', 'actor', 'event_count', 'object_id', 'updated_at', 'read')
+
+    def get_read(self, obj):
+        return obj.read_at is not None
+
+
+class ConnectionSerializer(serializers.ModelSerializer):
+    """
+    Serializer for a connection as seen by one of its two users: 'user' is the
+    other person and 'direction' says who sent the request.
+    """
+    user = serializers.SerializerMethodField()
+    direction = serializers.SerializerMethodField()
+    status = serializers.CharField(source='get_status_display', read_only=True)
+
+    query_plan = (
+        QueryPlan(only=('id', 'status', 'created_at', 'accepted_at'))
+        + UserSerializer.query_plan.nested('from_user')
+        + UserSerializer.query_plan.nested('to_user')
+    )
+
+    class Meta:
+        model = Connection
+        fields = ('id', 'user', 'direction', 'status', 'created_at', 'accepted_at')
+
+    def _viewer_id(self):
+        return self.context['request'].user.pk
+
+    def get_user(self, obj):
+        return UserSerializer(obj.other(self._viewer_id())).data
+
+    def get_direction(self, obj):
+        return 'outgoing' if obj.from_user_id == self._viewer_id() else 'incoming'
+
+
+class ChatMemberSerializer(serializers.ModelSerializer):
+    """
+    A chat member and their read receipt: they have read every message up to 'read_seq'.
+    """
+    id = serializers.IntegerField(source='user_id', read_only=True)
+    username = serializers.CharField(source='user.username', read_only=True)
+
+    query_plan = (
+        QueryPlan(only=('id', 'chat', 'user', 'read_seq'))
+        + QueryPlan(select_related=('user',), only=('user__username',))
+    )
+
+    class Meta:
+        model = ChatMember
+        fields = ('id', 'username', 'read_seq')
+
+
+class ChatSerializer(serializers.ModelSerializer):
+    """
+    Serializer for a chat in the viewer's inbox. 'last_seq' is the seq of the latest
+    message and 'unread' how many came after the viewer's read receipt.
+    """
+    members = ChatMemberSerializer(many=True, read_only=True)
+    unread = serializers.SerializerMethodField()
+
+    query_plan = (
+        QueryPlan(only=('id', 'created_at', 'updated_at', 'last_seq'))
+        + QueryPlan.many('members', ChatMember.objects.order_by('id'), ChatMemberSerializer.query_plan)
+    )
+
+    class Meta:
+        model = Chat
+        fields = ('id', 'members', 'last_seq', 'unread', 'created_at', 'updated_at')
+
+    def get_unread(self, obj):
+        viewer_id = self.context['request'].user.pk
+        read_seq = next((m.read_seq for m in obj.members.all() if m.user_id == viewer_id), 0)
+        return obj.last_seq - read_seq
+
+
+# --- Values Serializers ---
+# Read-only counterparts of PostSerializer, EndorsementSerializer and
+# UserSkillSerializer for list endpoints. They build the same output from
+# .values(*columns) rows, skipping model instances and the per-field
+# to_representation calls of the nested serializers.
+
+class ValuesSerializer(serializers.BaseSerializer):
+    """
+    Base for serializers of .values(*columns) rows. QueryPlanMixin loads the rows
+    for the actions listed in a view's 'values_serializer_classes'.
+    """
+    columns = ()
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # Formats as DateTimeField does, with the active timezone looked up once
+        # rather than for every value
+        current_timezone = serializers.DateTimeField().default_timezone()
+        self.datetime = serializers.DateTimeField(default_timezone=current_timezone).to_representation
+
+
+class PostValuesSerializer(ValuesSerializer):
+    columns = (
+        'id', 'content', 'created_at', 'related_skill_id', 'related_skill__name',
+        'author_id', 'author__username', 'author__first_name', 'author__last_name',
+    )
+
+    def to_representation(self, row):
+        skill_id = row['related_skill_id']
+        return {
+            'id': str(row['id']),
+            'author': {
+                'id': row['author_id'],
+                'username': row['author__username'],
+                'first_name': row['author__first_name'],
+                'last_name': row['author__last_name'],
+            },
+            'content': row['content'],
+            'related_skill': None if skill_id is None else {'id': skill_id, 'name': row['related_skill__name']},
+            'created_at': self.datetime(row['created_at']),
+        }
+
+
+class EndorsementValuesSerializer(ValuesSerializer):
+    columns = (
+        'id', 'skill_card_id', 'comment', 'endorser_rating', 'endorsed_at',
+        'recipient__username', 'skill_card__skill__name',
+        'endorser_id', 'endorser__username', 'endorser__first_name', 'endorser__last_name',
+    )
+
+    def to_representation(self, row):
+        return {
+            'id': str(row['id']),
+            'endorser': {
+                'id': row['endorser_id'],
+                'username': row['endorser__username'],
+                'first_name': row['endorser__first_name'],
+                'last_name': row['endorser__last_name'],
+            },
+            'skill_card': row['skill_card_id'],
+            'recipient_username': row['recipient__username'],
+            'endorsed_skill_name': row['skill_card__skill__name'],
+            'comment': row['comment'],
+            'endorser_rating': row['endorser_rating'],
+            'endorsed_at': self.datetime(row['endorsed_at']),
+        }
+
+
+class UserSkillValuesSerializer(ValuesSerializer):
+    columns = (
+        'id', 'self_rating', 'is_public', 'skill_id', 'skill__name',
+        'endorsement_stats__count', 'endorsement_stats__rating_count', 'endorsement_stats__rating_sum',
+        'endorsement_stats__rating_1', 'endorsement_stats__rating_2', 'endorsement_stats__rating_3',
+        'endorsement_stats__rating_4', 'endorsement_stats__rating_5', 'endorsement_stats__last_endorsed_at',
+    )
+
+    def to_representation(self, row):
+        count = row['endorsement_stats__count']
+        if count is None:
+            # No stats row: the card has never been endorsed
+            endorsements = dict(UserSkillSerializer.EMPTY_STATS)
+        else:
+            rating_count = row['endorsement_stats__rating_count']
+            endorsements = {
+                'count': count,
+                'average_rating': round(row['endorsement_stats__rating_sum'] / rating_count, 2) if rating_count else None,
+                'rating_histogram': [
+                    row['endorsement_stats__rating_1'], row['endorsement_stats__rating_2'],
+                    row['endorsement_stats__rating_3'], row['endorsement_stats__rating_4'],
+                    row['endorsement_stats__rating_5'],
+                ],
+                'last_endorsed_at': self.datetime(row['endorsement_stats__last_endorsed_at']),
+            }
+        return {
+            'id': str(row['id']),
+            'skill': {'id': row['skill_id'], 'name': row['skill__name']},
+            'self_rating': row['self_rating'],
+            'is_public': row['is_public'],
+            'endorsements': endorsements,
+        }
+
+
+class MessageValuesSerializer(ValuesSerializer):
+    """
+    A chat message (core.chat). Messages are only ever read as .values() rows.
+    """
+    columns = ('chat_id', 'seq', 'sender_id', 'content', 'created_at')
+
+    def to_representation(self, row):
+        return {
+            'chat': row['chat_id'],
+            'seq': row['seq'],
+            'sender': row['sender_id'],
+            'content': row['content'],
+            'created_at': self.datetime(row['created_at']),
+        }
+
+
+# --- Bulk Write Serializers ---
+# Validate one array item without touching the database; referenced rows are
+# resolved for the whole batch at once in core.bulk.
+
+class BulkUserSkillItemSerializer(serializers.Serializer):
+    skill_id = serializers.IntegerField()
+    self_rating = serializers.IntegerField(min_value=1, max_value=5, default=1)
+    is_public = serializers.BooleanField(default=True)
+
+
+class BulkEndorsementItemSerializer(serializers.Serializer):
+    skill_card_id = serializers.UUIDField()
+    endorser_rating = serializers.IntegerField(min_value=1, max_value=5, required=False, allow_null=True)
+    comment = serializers.CharField(required=False, allow_blank=True, allow_null=True)
+
+
+
+# --- Token Serializers ---
+# JWT authentication (core.authentication); revoked tokens are in core.denylist.
+
+class DenylistTokenRefreshSerializer(TokenRefreshSerializer):
+    """
+    TokenRefreshSerializer that refuses revoked refresh tokens.
+    """
+    def validate(self, attrs):
+        refresh = self.token_class(attrs['refresh'])
+        if denylist.is_revoked(refresh.get(jwt_settings.JTI_CLAIM)):
+            raise InvalidToken({'detail': _('Token has been revoked'), 'code': 'token_revoked'})
+        return super().validate(attrs)
+
+
+class TokenRevokeSerializer(serializers.Serializer):
+    """
+    Input for signing out: {"refresh": "<refresh token>"}.
+    """
+    refresh = serializers.CharField()
+
+    def validate_refresh(self, value):
+        try:
+            return RefreshToken(value)
+        except TokenError as e:
+            raise serializers.ValidationError(e.args[0])
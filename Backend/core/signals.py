@@ -0,0 +1,199 @@
+"""
+Model signal handlers for core. Connected in CoreConfig.ready().
+"""
+from django.db import transaction
+from django.contrib.auth.models import User
+from django.core.exceptions import ValidationError
+from django.db.models.signals import post_save, post_delete, pre_save, pre_delete
+from django.dispatch import receiver
+
+from . import authentication, endorsement_stats, graph, notifications, post_search, profile_cards, response_cache, skill_search, skill_tree
+from .models import Skill, SkillProfile, UserSkill, Post, Endorsement, Connection
+
+# --- Endorsement aggregates ---
+
+def _previous(instance, field):
+    """
+    The value 'field' had when the instance was loaded or last saved
+    (Endorsement.save), if it has changed since.
+    """
+    loaded = getattr(instance, f'_loaded_{field}', None)
+    return loaded if loaded is not None and loaded != getattr(instance, field) else None
+
+
+@receiver(post_save, sender=Endorsement)
+def endorsement_saved(sender, instance, created, **kwargs):
+    if created:
+        endorsement_stats.record_endorsement(instance)
+    else:
+        # An edit may have changed the rating, or moved the endorsement to another card
+        endorsement_stats.rebuild({instance.skill_card_id, _previous(instance, 'skill_card_id')} - {None})
+
+
+@receiver(post_delete, sender=Endorsement)
+def endorsement_deleted(sender, instance, **kwargs):
+    endorsement_stats.forget_endorsement(instance)
+
+
+# --- Notifications ---
+
+@receiver(post_save, sender=Endorsement)
+def endorsement_notify(sender, instance, created, **kwargs):
+    if created:
+        notifications.endorsements_created([instance])
+
+
+@receiver(post_save, sender=Post)
+def post_notify(sender, instance, created, **kwargs):
+    if created:
+        notifications.post_created(instance)
+
+
+# --- Post search documents ---
+# Written in the post's own transaction; a deleted post's document goes with it (CASCADE).
+
+@receiver(post_save, sender=Post)
+def post_search_saved(sender, instance, created, update_fields=None, **kwargs):
+    if update_fields is None or 'content' in update_fields:
+        post_search.index_post(instance, created=created)
+
+
+# --- Skill search index ---
+# Applied after commit so a rolled-back write never reaches the in-process index.
+
+@receiver(post_save, sender=Skill)
+def skill_saved(sender, instance, **kwargs):
+    index = skill_search.loaded_index()
+    if index is not None:
+        skill_id, name, description = instance.pk, instance.name, instance.description
+        transaction.on_commit(lambda: index.upsert(skill_id, name, description))
+
+
+@receiver(post_delete, sender=Skill)
+def skill_deleted(sender, instance, **kwargs):
+    index = skill_search.loaded_index()
+    if index is not None:
+        # Django clears instance.pk after the delete, so capture it now
+        skill_id = instance.pk
+        transaction.on_commit(lambda: index.remove(skill_id))
+
+
+@receiver(post_save, sender=UserSkill)
+def userskill_saved(sender, instance, created, **kwargs):
+    index = skill_search.loaded_index()
+    if created and index is not None:
+        skill_id = instance.skill_id
+        transaction.on_commit(lambda: index.adjust_popularity(skill_id, 1))
+
+
+@receiver(post_delete, sender=UserSkill)
+def userskill_deleted(sender, instance, **kwargs):
+    index = skill_search.loaded_index()
+    if index is not None:
+        skill_id = instance.skill_id
+        transaction.on_commit(lambda: index.adjust_popularity(skill_id, -1))
+
+
+# --- Connection graph ---
+# Like the search index, the in-process graph only changes once the write has committed.
+
+@receiver(post_save, sender=Connection)
+def connection_saved(sender, instance, **kwargs):
+    index = graph.loaded_graph()
+    if index is not None:
+        a, b = instance.from_user_id, instance.to_user_id
+        if instance.status == Connection.ACCEPTED:
+            transaction.on_commit(lambda: index.add_edge(a, b))
+        else:
+            transaction.on_commit(lambda: index.remove_edge(a, b))
+
+
+@receiver(post_delete, sender=Connection)
+def connection_deleted(sender, instance, **kwargs):
+    index = graph.loaded_graph()
+    if index is not None:
+        a, b = instance.from_user_id, instance.to_user_id
+        transaction.on_commit(lambda: index.remove_edge(a, b))
+
+
+# --- Skill hierarchy closure table ---
+
+def _parent_changed(skill):
+    return getattr(skill, '_loaded_parent_id', skill.parent_skill_id) != skill.parent_skill_id
+
+
+@receiver(pre_save, sender=Skill)
+def skill_reparenting(sender, instance, **kwargs):
+    # Checked before the row is written, so a rejected move leaves nothing to undo
+    if instance.pk and instance.parent_skill_id and _parent_changed(instance):
+        if skill_tree.would_create_cycle(instance.pk, instance.parent_skill_id):
+            raise ValidationError("A skill cannot be placed under itself or one of its sub-skills.")
+
+
+@receiver(post_save, sender=Skill)
+def skill_tree_saved(sender, instance, created, **kwargs):
+    if created:
+        skill_tree.skill_inserted(instance)
+    elif _parent_changed(instance):
+        skill_tree.skill_moved(instance)
+    instance._loaded_parent_id = instance.parent_skill_id
+
+
+@receiver(pre_delete, sender=Skill)
+def skill_tree_deleting(sender, instance, **kwargs):
+    skill_tree.skill_deleting(instance)
+
+
+# --- Response cache and profile card invalidation ---
+
+@receiver(post_save, sender=Skill)
+@receiver(post_delete, sender=Skill)
+def skill_changed(sender, **kwargs):
+    # Also retires every profile card (core.profile_cards), which show skill names
+    response_cache.invalidate('skills')
+
+
+@receiver(post_save, sender=SkillProfile)
+@receiver(post_delete, sender=SkillProfile)
+def profile_changed(sender, instance, **kwargs):
+    response_cache.invalidate_profiles([instance.user_id])
+    profile_cards.invalidate([instance.user_id])
+    authentication.invalidate([instance.user_id])
+
+
+@receiver(post_save, sender=UserSkill)
+@receiver(post_delete, sender=UserSkill)
+def userskill_changed(sender, instance, **kwargs):
+    response_cache.invalidate_profiles([instance.profile_id])
+    response_cache.invalidate('skill-popularity')
+    profile_cards.invalidate([instance.profile_id])
+
+
+@receiver(post_save, sender=Endorsement)
+@receiver(post_delete, sender=Endorsement)
+def endorsement_changed(sender, instance, **kwargs):
+    # The recipient's cards show endorsement totals, and so did the previous
+    # recipient's if the endorsement was moved to another card
+    recipients = {instance.recipient_id, _previous(instance, 'recipient_id')} - {None}
+    response_cache.invalidate_profiles(recipients)
+    profile_cards.invalidate(recipients)
+
+
+@receiver(pre_save, sender=User)
+def user_changing(sender, instance, update_fields=None, **kwargs):
+    # Logins only touch last_login; anything else may change what a profile shows,
+    # and a rename must also retire pages cached under the old username
+    if instance.pk and not (update_fields and set(update_fields) <= {'last_login', 'password'}):
+        old = User.objects.filter(pk=instance.pk).values_list('username', flat=True).first()
+        response_cache.invalidate(*{'profile:' + name for name in (instance.username, old) if name})
+        profile_cards.invalidate([instance.pk])
+
+
+# --- Authentication cache ---
+# Any change to a user, logins and password changes included, retires the cached
+# copy request.user is built from (core.authentication); profiles are handled above.
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def user_changed(sender, instance, **kwargs):
+    authentication.invalidate([instance.pk])
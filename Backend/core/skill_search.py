@@ -0,0 +1,424 @@
+"""
+Skill search and autocomplete.
+
+The default backend is an in-process index over Skill.name and description:
+
+* a sorted list of lower-cased names, bisected for prefix matches,
+* a sorted list of the individual words of each name, for word-prefix matches
+  ("des" finds "UI/UX Design"),
+* a trigram -> skill ids map, for substring and typo-tolerant matches,
+* a word -> skill ids map over descriptions.
+
+Results are ranked by match quality first and popularity (number of UserSkill
+cards listing the skill) second, and are returned straight from the index
+without touching the database. The index is kept current by the signal
+handlers in core.signals.
+
+Those handlers only reach the index of the process that made the write, so the
+index also remembers the response cache version (core.response_cache) of the
+'skills' namespace it was built at, and is rebuilt once that changes, which a
+Skill write in any process sharing the response cache backend does. The version
+is read at most every SKILL_SEARCH_VERSION_CHECK_SECONDS, not on every search.
+The index is also rebuilt after SKILL_SEARCH_INDEX_MAX_AGE seconds, to pick up
+popularity counts changed elsewhere.
+
+Builds happen off the request path: warm() (called on a process's first
+request, see CoreConfig.ready) starts one in a background thread, and a search
+that finds the index out of date keeps using it while a rebuild runs. Until the
+first build finishes, searches go to the database. With
+SKILL_SEARCH_ASYNC_BUILD = False (the test runner's setting) the searching
+thread builds the index itself.
+
+Set SKILL_SEARCH_BACKEND = 'fts5' to use the SQLite FTS5 table created by
+migration 0007 instead (one index per database rather than per process), or
+'database' for a plain indexed query on any database.
+"""
+import bisect
+import heapq
+import math
+import re
+import threading
+import time
+from collections import Counter
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import Case, Count, IntegerField, Q, Value, When
+
+from . import response_cache
+from .background import BatchWorker
+from .coalescing import SingleFlight
+from .models import Skill, UserSkill
+
+WORD_RE = re.compile(r'\w+')
+
+# Match-quality tiers; popularity only breaks ties inside a tier (and nudges fuzzy matches)
+EXACT, PREFIX, WORD_PREFIX, SUBSTRING, DESCRIPTION, FUZZY = 100, 80, 60, 40, 20, 10
+
+# Minimum share of the query's trigrams a fuzzy match must contain
+FUZZY_THRESHOLD = 0.4
+
+# Trigrams shared by more skills than this are too common to help fuzzy matching
+FUZZY_MAX_POSTING = 1000
+
+# Rebuild the in-memory index at least this often (popularity drifts between processes)
+INDEX_MAX_AGE = getattr(settings, 'SKILL_SEARCH_INDEX_MAX_AGE', 600)
+
+# Read that namespace's version at most this often (a round trip with a shared response cache)
+VERSION_CHECK_INTERVAL = getattr(settings, 'SKILL_SEARCH_VERSION_CHECK_SECONDS', 1)
+
+# Response cache namespace bumped by every Skill write (core.signals)
+VERSION_NAMESPACE = 'skills'
+
+
+def normalize(text):
+    return ' '.join(WORD_RE.findall((text or '').lower()))
+
+
+def trigrams(text, padded=True):
+    # Padding adds word-boundary grams ('  p', ' py'), which help rank fuzzy matches
+    if padded:
+        text = f'  {text} '
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+class InMemorySkillIndex:
+    """
+    Prefix, word-prefix, trigram and description index over all skills.
+    Every public method is safe to call from multiple threads.
+    """
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._skills = {}          # id -> (name, normalized name)
+        self._popularity = Counter()
+        self._names = []           # sorted [(normalized name, id)]
+        self._words = []           # sorted [(word, id)] for every word of every name
+        self._trigrams = {}        # trigram -> set(ids)
+        self._description = {}     # description word -> set(ids)
+        self._description_words = {}  # id -> words indexed for that skill
+        self._short_cache = {}     # one- and two-letter queries -> ranked results
+
+    def __len__(self):
+        return len(self._skills)
+
+    # --- Loading and incremental maintenance ---
+
+    @classmethod
+    def from_database(cls):
+        index = cls()
+        popularity = dict(
+            UserSkill.objects.order_by().values_list('skill_id').annotate(n=Count('pk')).values_list('skill_id', 'n')
+        )
+        rows = Skill.objects.order_by().values_list('id', 'name', 'description').iterator(chunk_size=5000)
+        with index._lock:
+            for skill_id, name, description in rows:
+                index._add(skill_id, name, description, sort=False)
+                index._popularity[skill_id] = popularity.get(skill_id, 0)
+            index._names.sort()
+            index._words.sort()
+        return index
+
+    def _add(self, skill_id, name, description, sort=True):
+        norm = normalize(name)
+        self._skills[skill_id] = (name, norm)
+        insert = bisect.insort if sort else (lambda seq, item: seq.append(item))
+        insert(self._names, (norm, skill_id))
+        for word in set(norm.split()):
+            insert(self._words, (word, skill_id))
+        for gram in trigrams(norm):
+            self._trigrams.setdefault(gram, set()).add(skill_id)
+        words = set(normalize(description).split())
+        self._description_words[skill_id] = words
+        for word in words:
+            self._description.setdefault(word, set()).add(skill_id)
+
+    def _remove(self, skill_id):
+        name, norm = self._skills.pop(skill_id)
+        self._names.pop(bisect.bisect_left(self._names, (norm, skill_id)))
+        for word in set(norm.split()):
+            self._words.pop(bisect.bisect_left(self._words, (word, skill_id)))
+        for gram in trigrams(norm):
+            self._trigrams[gram].discard(skill_id)
+        for word in self._description_words.pop(skill_id, ()):
+            self._description[word].discard(skill_id)
+
+    def upsert(self, skill_id, name, description):
+        with self._lock:
+            if skill_id in self._skills:
+                self._remove(skill_id)
+            self._add(skill_id, name, description)
+            self._short_cache.clear()
+
+    def remove(self, skill_id):
+        with self._lock:
+            if skill_id in self._skills:
+                self._remove(skill_id)
+                self._popularity.pop(skill_id, None)
+                self._short_cache.clear()
+
+    def adjust_popularity(self, skill_id, delta):
+        # Leaves the short-query cache alone: a card being added or removed only
+        # nudges popularity, and those results are refreshed on the next name change
+        with self._lock:
+            self._popularity[skill_id] = max(0, self._popularity[skill_id] + delta)
+
+    # --- Querying ---
+
+    def _prefix_range(self, seq, prefix):
+        start = bisect.bisect_left(seq, (prefix,))
+        end = bisect.bisect_left(seq, (prefix + '\uffff',), lo=start)
+        return seq[start:end]
+
+    def _candidates(self, query, limit):
+        scores = {}
+
+        def offer(skill_id, score):
+            if score > scores.get(skill_id, 0):
+                scores[skill_id] = score
+
+        for norm, skill_id in self._prefix_range(self._names, query):
+            offer(skill_id, EXACT if norm == query else PREFIX)
+
+        last_word = query.rsplit(' ', 1)[-1]
+        for _, skill_id in self._prefix_range(self._words, last_word):
+            if query in self._skills[skill_id][1]:
+                offer(skill_id, WORD_PREFIX)
+
+        if len(query) >= 3:
+            # Substring: every inner trigram must be present; intersect the rarest first
+            postings = sorted((self._trigrams.get(g, set()) for g in trigrams(query, padded=False)), key=len)
+            if postings[0]:
+                for skill_id in set.intersection(*postings):
+                    if query in self._skills[skill_id][1]:
+                        offer(skill_id, SUBSTRING)
+
+        words = query.split()
+        postings = [self._description.get(w, set()) for w in words]
+        for skill_id in set.intersection(*postings):
+            offer(skill_id, DESCRIPTION)
+
+        if len(query) >= 3 and len(scores) < limit:
+            # Fuzzy fallback when exact matching comes up short: enough shared trigrams, tolerating typos
+            grams = trigrams(query)
+            hits = Counter()
+            for gram in grams:
+                posting = self._trigrams.get(gram, ())
+                if len(posting) <= FUZZY_MAX_POSTING:
+                    hits.update(posting)
+            needed = FUZZY_THRESHOLD * len(grams)
+            for skill_id, n in hits.items():
+                if n >= needed and skill_id not in scores:
+                    offer(skill_id, FUZZY * n / len(grams))
+        return scores
+
+    def search(self, query, limit=10):
+        """
+        Returns up to 'limit' {'id', 'name'} dicts, best match first.
+        """
+        query = normalize(query)
+        with self._lock:
+            # Empty and one- or two-letter queries match the most rows; their
+            # results are remembered until the index next changes
+            short = len(query) <= 2
+            if short and (query, limit) in self._short_cache:
+                return self._short_cache[(query, limit)]
+
+            if query:
+                scores = self._candidates(query, limit)
+            else:
+                scores = dict.fromkeys(self._skills, 0)
+            ranked = heapq.nsmallest(
+                limit, scores,
+                key=lambda i: (-(scores[i] + math.log1p(self._popularity[i])), self._skills[i][1]),
+            )
+            results = [{'id': i, 'name': self._skills[i][0]} for i in ranked]
+            if short:
+                self._short_cache[(query, limit)] = results
+            return results
+
+
+# --- FTS5 backend (SQLite) ---
+
+FTS_TABLE = 'core_skill_fts'
+
+
+def fts5_match_expression(query):
+    # Each word becomes a quoted prefix term, so user input can never be parsed as FTS syntax
+    return ' '.join('"%s"*' % word for word in normalize(query).split())
+
+
+class FTS5SkillIndex:
+    """
+    Ranks with SQLite's bm25() over the external-content FTS5 table, with names
+    weighted above descriptions and popularity as the tie-breaker.
+    """
+    CANDIDATES = 50
+
+    def search(self, query, limit=10):
+        match = fts5_match_expression(query)
+        if not match:
+            return DatabaseSkillIndex().search(query, limit)
+        sql = f"""
+            SELECT s.id, s.name
+            FROM (
+                SELECT rowid, bm25({FTS_TABLE}, 10.0, 1.0) AS rank
+                FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s
+                ORDER BY rank LIMIT %s
+            ) AS hit
+            JOIN core_skill s ON s.id = hit.rowid
+            ORDER BY hit.rank, (SELECT COUNT(*) FROM core_userskill u WHERE u.skill_id = s.id) DESC, s.name
+            LIMIT %s
+        """
+        with connection.cursor() as cursor:
+            cursor.execute(sql, [match, self.CANDIDATES, limit])
+            return [{'id': skill_id, 'name': name} for skill_id, name in cursor.fetchall()]
+
+
+# --- Plain database backend ---
+
+class DatabaseSkillIndex:
+    """
+    Works on any database: prefix matches (which can use the name index) rank
+    above substring matches, then popularity.
+    """
+    def search(self, query, limit=10):
+        query = (query or '').strip()
+        skills = Skill.objects.annotate(popularity=Count('userskill'))
+        if query:
+            skills = skills.filter(Q(name__istartswith=query) | Q(name__icontains=query)).annotate(
+                quality=Case(When(name__istartswith=query, then=Value(1)), default=Value(0), output_field=IntegerField())
+            ).order_by('-quality', '-popularity', 'name')
+        else:
+            skills = skills.order_by('-popularity', 'name')
+        return list(skills.values('id', 'name')[:limit])
+
+
+# --- Backend selection ---
+
+_index = None
+_index_lock = threading.Lock()
+
+flights = SingleFlight()
+
+
+def _version():
+    return response_cache.versions([VERSION_NAMESPACE])[VERSION_NAMESPACE]
+
+
+def _build():
+    # The version is read before the rows, so a write landing in between makes the index stale
+    version = _version()
+    index = InMemorySkillIndex.from_database()
+    index.version, index.built_at = version, time.monotonic()
+    index.checked_at = index.built_at
+    return index
+
+
+def _is_current(index):
+    now = time.monotonic()
+    if now - index.built_at >= INDEX_MAX_AGE:
+        return False
+    if now - index.checked_at < VERSION_CHECK_INTERVAL:
+        return True
+    if index.version != _version():
+        return False
+    index.checked_at = now
+    return True
+
+
+def _async_build():
+    # Read on every call, so the test runner and override_settings apply
+    return getattr(settings, 'SKILL_SEARCH_ASYNC_BUILD', True)
+
+
+def _rebuild(keys=None):
+    global _index
+    index = _build()
+    with _index_lock:
+        _index = index
+
+
+builder = BatchWorker('skill-index-builder', _rebuild)
+
+
+def warm():
+    """
+    Starts building the in-memory index in the background if it is the
+    configured backend and has not been built yet.
+    """
+    if getattr(settings, 'SKILL_SEARCH_BACKEND', 'memory') == 'memory' and _index is None and _async_build():
+        builder.schedule({VERSION_NAMESPACE})
+
+
+def get_index():
+    """
+    Returns the configured search backend. For the in-memory index, one that is
+    out of date is still returned while a background rebuild runs, and the
+    database answers until the first build is done.
+    """
+    global _index
+    backend = getattr(settings, 'SKILL_SEARCH_BACKEND', 'memory')
+    if backend == 'fts5':
+        return FTS5SkillIndex()
+    if backend == 'database':
+        return DatabaseSkillIndex()
+    index = _index
+    if index is not None and _is_current(index):
+        return index
+    if _async_build():
+        builder.schedule({VERSION_NAMESPACE})
+        return index if index is not None else DatabaseSkillIndex()
+    with _index_lock:
+        # Unless another thread rebuilt it while this one waited
+        if _index is index:
+            _index = _build()
+    return _index
+
+
+def current_index():
+    """
+    The in-memory index if it is the configured backend and built, else None.
+    Never builds, so the async read path can call it without a thread (it may
+    read the 'skills' version: I/O with a shared response cache). An out of date
+    index is returned while a background rebuild runs, or None when the
+    searching thread would rebuild it (SKILL_SEARCH_ASYNC_BUILD off).
+    """
+    index = _index
+    if getattr(settings, 'SKILL_SEARCH_BACKEND', 'memory') != 'memory' or index is None:
+        return None
+    if _is_current(index):
+        return index
+    if _async_build():
+        builder.schedule({VERSION_NAMESPACE})
+        return index
+    return None
+
+
+def loaded_index():
+    """
+    The in-memory index if it has been built, else None. Signal handlers only
+    maintain an index that exists; one built later reads the current rows anyway.
+    """
+    return _index
+
+
+def reset():
+    """
+    Drops the in-memory index so the next search rebuilds it (used by tests).
+    """
+    global _index
+    with _index_lock:
+        _index = None
+
+
+def search(query, limit=10):
+    """
+    Searches the configured backend. On the database backends, identical
+    searches arriving while one is running share its result (core.coalescing),
+    so a burst of the same autocomplete query costs one query.
+    """
+    index = get_index()
+    if isinstance(index, InMemorySkillIndex):
+        # In memory: nothing to coalesce
+        return index.search(query, limit)
+    return flights.do((type(index).__name__, query, limit), lambda: index.search(query, limit))
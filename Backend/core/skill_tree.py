@@ -0,0 +1,129 @@
+"""
+Closure-table maintenance for the Skill.parent_skill hierarchy.
+
+SkillClosure stores every (ancestor, descendant, depth) pair, so "everything
+under Python" is one indexed lookup on ancestor and "everything above Django"
+is one on descendant, however deep the tree is. The handlers below are
+connected in core.signals and keep the table consistent on insert, reparent
+and delete. Writes that bypass signals (bulk_create, queryset.update() of
+parent_skill) must call rebuild() afterwards.
+"""
+from django.contrib.auth.models import User
+from django.db import transaction
+
+from . import response_cache
+from .models import Skill, SkillClosure
+
+
+def would_create_cycle(skill_id, new_parent_id):
+    """
+    True if new_parent_id is the skill itself or one of its descendants.
+    """
+    return SkillClosure.objects.filter(ancestor_id=skill_id, descendant_id=new_parent_id).exists()
+
+
+def _link_subtree(subtree, parent_id):
+    # Connects every node of the subtree to the parent and all of its ancestors
+    ancestors = SkillClosure.objects.filter(descendant_id=parent_id).values_list('ancestor_id', 'depth')
+    SkillClosure.objects.bulk_create(
+        [
+            SkillClosure(ancestor_id=ancestor_id, descendant_id=node_id, depth=up + down + 1)
+            for ancestor_id, up in ancestors
+            for node_id, down in subtree
+        ],
+        batch_size=5000,
+    )
+
+
+def skill_inserted(skill):
+    with transaction.atomic():
+        SkillClosure.objects.create(ancestor=skill, descendant=skill, depth=0)
+        if skill.parent_skill_id:
+            _link_subtree([(skill.pk, 0)], skill.parent_skill_id)
+
+
+def skill_moved(skill):
+    """
+    Re-links the skill's subtree under its new parent (or makes it a root).
+    """
+    with transaction.atomic():
+        subtree = list(SkillClosure.objects.filter(ancestor=skill).values_list('descendant_id', 'depth'))
+        subtree_ids = [node_id for node_id, _ in subtree]
+        # Drop every link from outside the subtree into it, then hang it under the new parent
+        SkillClosure.objects.filter(descendant_id__in=subtree_ids).exclude(ancestor_id__in=subtree_ids).delete()
+        if skill.parent_skill_id:
+            _link_subtree(subtree, skill.parent_skill_id)
+
+
+def skill_deleting(skill):
+    """
+    Called before a skill is deleted. Its children become roots (parent_skill is
+    SET_NULL), so their subtrees are detached from the deleted skill's ancestors;
+    rows that mention the skill itself are removed by the CASCADE.
+    """
+    below = SkillClosure.objects.filter(ancestor=skill, depth__gt=0).values_list('descendant_id', flat=True)
+    above = SkillClosure.objects.filter(descendant=skill, depth__gt=0).values_list('ancestor_id', flat=True)
+    SkillClosure.objects.filter(descendant_id__in=list(below), ancestor_id__in=list(above)).delete()
+
+
+def rebuild():
+    """
+    Recomputes the whole closure table from parent_skill, one tree level at a time.
+    """
+    with transaction.atomic():
+        SkillClosure.objects.all().delete()
+        parents = dict(Skill.objects.values_list('pk', 'parent_skill_id'))
+        SkillClosure.objects.bulk_create(
+            (SkillClosure(ancestor_id=pk, descendant_id=pk, depth=0) for pk in parents), batch_size=5000
+        )
+        children = {}
+        for pk, parent_id in parents.items():
+            if parent_id is not None:
+                children.setdefault(parent_id, []).append(pk)
+
+        # Walk down from the roots; each node inherits its parent's ancestor list
+        ancestors = {pk: [] for pk, parent_id in parents.items() if parent_id is None}
+        level = list(ancestors)
+        while level:
+            next_level, rows = [], []
+            for parent_id in level:
+                for child_id in children.get(parent_id, ()):
+                    chain = [parent_id] + ancestors[parent_id]
+                    ancestors[child_id] = chain
+                    rows.extend(
+                        SkillClosure(ancestor_id=a, descendant_id=child_id, depth=d)
+                        for d, a in enumerate(chain, start=1)
+                    )
+                    next_level.append(child_id)
+            SkillClosure.objects.bulk_create(rows, batch_size=5000)
+            level = next_level
+    response_cache.bump('skills')
+
+
+# --- Queries ---
+
+def subtree(skill_id):
+    """
+    The skill and everything under it, nearest first.
+    """
+    return Skill.objects.filter(ancestor_links__ancestor_id=skill_id).order_by('ancestor_links__depth', 'name')
+
+
+def ancestors(skill_id):
+    """
+    The skill's parents up to the root, nearest first (the skill itself excluded).
+    """
+    return Skill.objects.filter(
+        descendant_links__descendant_id=skill_id, descendant_links__depth__gt=0
+    ).order_by('descendant_links__depth')
+
+
+def users_with_skill_in_subtree(skill_id):
+    """
+    Users listing the skill or any skill under it on a public card: a single
+    closure -> UserSkill -> User join.
+    """
+    return User.objects.filter(
+        profile__userskill__skill__ancestor_links__ancestor_id=skill_id,
+        profile__userskill__is_public=True,
+    ).distinct()
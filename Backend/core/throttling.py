@@ -0,0 +1,203 @@
+"""
+Token-bucket rate limiting for write-heavy and hot endpoints.
+
+Each throttled action belongs to a scope configured in THROTTLE['SCOPES'] with
+a rate for the user and one for the client address, e.g.
+
+    'endorsements': {'user': '30/min', 'ip': '120/min'}
+
+A rate 'N/period' is a bucket holding up to N tokens that refills at N per
+period: a client may burst N requests, then gets one more each period / N.
+Authenticated requests draw a token from both their user's bucket and their
+address's bucket, anonymous ones from the address bucket only, so one account
+cannot flood from many addresses nor many accounts from one address. A request
+that finds a bucket empty gets 429 with Retry-After set to when a token is due.
+
+Bucket state lives in the THROTTLE['BACKEND']: LocMemBucketBackend keeps it in
+process memory, so each worker enforces the limits separately; RedisBucketBackend
+shares it between workers through any server speaking the Redis protocol with
+Lua scripting (Redis, Valkey, KeyDB, Dragonfly).
+
+Views opt in with TokenBucketThrottle in 'throttle_classes' and a
+'throttle_scopes' map from action name to scope.
+"""
+import threading
+import time
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+from rest_framework.exceptions import Throttled
+from rest_framework.throttling import BaseThrottle
+
+PERIODS = {'s': 1, 'sec': 1, 'm': 60, 'min': 60, 'h': 3600, 'hour': 3600, 'd': 86400, 'day': 86400}
+
+
+def parse_rate(rate):
+    """
+    '30/min' -> (capacity, tokens per second), i.e. (30, 0.5).
+    """
+    count, _, period = rate.partition('/')
+    count, seconds = int(count), PERIODS[period.strip().lower()]
+    return count, count / seconds
+
+
+# --- Backends ---
+
+class LocMemBucketBackend:
+    """
+    Thread-safe in-process buckets. Full buckets are dropped to bound memory.
+    """
+    local = True
+
+    def __init__(self, max_entries=100000):
+        self.max_entries = max_entries
+        self._buckets = {}   # key -> (tokens, updated_at, full_at)
+        self._lock = threading.Lock()
+
+    def take(self, key, capacity, refill_rate, now):
+        """
+        Takes a token from the bucket if it has one. Returns (allowed, seconds
+        until a token is available).
+        """
+        with self._lock:
+            tokens, updated_at, _ = self._buckets.get(key, (capacity, now, now))
+            tokens = min(capacity, tokens + max(0.0, now - updated_at) * refill_rate)
+            allowed = tokens >= 1
+            if allowed:
+                tokens -= 1
+            self._buckets[key] = (tokens, now, now + (capacity - tokens) / refill_rate)
+            if len(self._buckets) > self.max_entries:
+                self._prune(now)
+            return allowed, 0.0 if allowed else (1 - tokens) / refill_rate
+
+    def _prune(self, now):
+        # A bucket that has filled up again is the same as no bucket
+        for key, (_, _, full_at) in list(self._buckets.items()):
+            if full_at <= now:
+                del self._buckets[key]
+
+    def clear(self):
+        with self._lock:
+            self._buckets.clear()
+
+
+# KEYS[1] bucket hash; ARGV capacity, refill rate per second, now. Replies
+# {allowed, wait} with wait as a string, since Lua numbers become integers.
+TAKE_SCRIPT = """
+local capacity = tonumber(ARGV[1])
+local rate = tonumber(ARGV[2])
+local now = tonumber(ARGV[3])
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'updated_at')
+local tokens = tonumber(state[1]) or capacity
+local updated_at = tonumber(state[2]) or now
+tokens = math.min(capacity, tokens + math.max(0, now - updated_at) * rate)
+local allowed, wait = 0, 0
+if tokens >= 1 then
+    tokens = tokens - 1
+    allowed = 1
+else
+    wait = (1 - tokens) / rate
+end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'updated_at', tostring(now))
+redis.call('PEXPIRE', KEYS[1], math.ceil(capacity / rate * 1000) + 1000)
+return {allowed, tostring(wait)}
+"""
+
+
+class RedisBucketBackend:
+    """
+    Shared buckets over a redis-py compatible client, updated atomically by a
+    Lua script. Buckets expire once they would be full again.
+    """
+    local = False
+
+    def __init__(self, client=None, client_class='redis.Redis', url=None, prefix='skilllink:tb:'):
+        if client is None:
+            client_class = import_string(client_class)
+            client = client_class.from_url(url) if url else client_class()
+        self.client = client
+        self.prefix = prefix
+
+    def take(self, key, capacity, refill_rate, now):
+        allowed, wait = self.client.eval(TAKE_SCRIPT, 1, self.prefix + key, capacity, repr(refill_rate), repr(now))
+        return bool(int(allowed)), float(wait)
+
+    def clear(self):
+        for key in self.client.scan_iter(self.prefix + '*'):
+            self.client.delete(key)
+
+
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def get_backend():
+    global _backend
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                config = getattr(settings, 'THROTTLE', {})
+                backend_class = import_string(config.get('BACKEND', 'core.throttling.LocMemBucketBackend'))
+                _backend = backend_class(**config.get('OPTIONS', {}))
+    return _backend
+
+
+def set_backend(backend):
+    """
+    Replaces the configured backend (used by tests).
+    """
+    global _backend
+    _backend = backend
+
+
+def scope_rates(scope):
+    return getattr(settings, 'THROTTLE', {}).get('SCOPES', {}).get(scope, {})
+
+
+# --- Throttle ---
+
+class TokenBucketThrottle(BaseThrottle):
+    """
+    Throttles the actions listed in the view's 'throttle_scopes'.
+    """
+    def allow_request(self, request, view):
+        scope = getattr(view, 'throttle_scopes', {}).get(getattr(view, 'action', None))
+        if scope is None:
+            return True
+        allowed, self._wait = take(scope, request.user, self.get_ident(request))
+        return allowed
+
+    def wait(self):
+        return self._wait
+
+
+def take(scope, user, ident):
+    """
+    Takes a token for the scope from the user's bucket, then the address'.
+    Returns (allowed, seconds to wait). A user over their limit does not drain
+    the bucket they share with others at the same address.
+    """
+    now = time.time()
+    backend = get_backend()
+    rates = scope_rates(scope)
+    buckets = [('ip', ident)]
+    if user is not None and user.is_authenticated:
+        buckets.insert(0, ('user', user.pk))
+    for kind, value in buckets:
+        if kind not in rates:
+            continue
+        capacity, refill_rate = parse_rate(rates[kind])
+        allowed, wait = backend.take(f'{scope}:{kind}:{value}', capacity, refill_rate, now)
+        if not allowed:
+            return False, wait
+    return True, 0.0
+
+
+def check(scope, request, user):
+    """
+    take() for views outside DRF's throttling, e.g. the async read path.
+    Raises Throttled when a bucket is empty.
+    """
+    allowed, wait = take(scope, user, BaseThrottle().get_ident(request))
+    if not allowed:
+        raise Throttled(wait)
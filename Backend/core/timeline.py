@@ -0,0 +1,341 @@
+"""
+Materialized per-user timelines for the post feed.
+
+Posts are pushed into the timelines of the author's followers when they are
+written (fan-out-on-write), so reading a feed page is a single index range
+scan on TimelineEntry instead of a global sort over the posts table.
+
+Authors with a very large audience are the exception: copying each of their
+posts into hundreds of thousands of timelines would make every post expensive.
+Their posts are skipped during fan-out and merged into the feed when it is read
+(fan-out-on-read), using the (author, -created_at) index on Post.
+
+The mode is the SkillProfile.fanout_on_read flag. A follow that takes an author
+to FANOUT_FOLLOWER_THRESHOLD sets it. It is only cleared once unfollows take the
+author below the threshold minus FANOUT_HYSTERESIS, so an author hovering around
+the threshold does not switch back and forth. Leaving fan-out-on-read means
+copying the author's recent posts into every follower's timeline; that happens
+after the unfollow commits, in a background thread (core.background), never in
+the request. The sync_timeline_modes command performs any switch left undone.
+"""
+import heapq
+from itertools import islice
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Q
+
+from .background import BatchWorker
+from .models import SkillProfile, Post, Follow, TimelineEntry
+
+# --- Tunables (override in settings.py) ---
+
+# Number of timeline rows inserted per bulk_create during fan-out
+FANOUT_BATCH_SIZE = getattr(settings, 'TIMELINE_FANOUT_BATCH_SIZE', 1000)
+
+# Authors with at least this many followers are served by fan-out-on-read
+FANOUT_FOLLOWER_THRESHOLD = getattr(settings, 'TIMELINE_FANOUT_FOLLOWER_THRESHOLD', 10000)
+
+# ... and go back to fan-out-on-write only below FANOUT_FOLLOWER_THRESHOLD - FANOUT_HYSTERESIS
+FANOUT_HYSTERESIS = getattr(settings, 'TIMELINE_FANOUT_HYSTERESIS', 1000)
+
+# How many of a followee's recent posts are copied into a timeline on follow
+FOLLOW_BACKFILL_SIZE = getattr(settings, 'TIMELINE_FOLLOW_BACKFILL_SIZE', 50)
+
+
+def is_fanout_on_read(user_id):
+    return SkillProfile.objects.filter(user_id=user_id, fanout_on_read=True).exists()
+
+
+def _entering(profiles):
+    return profiles.filter(fanout_on_read=False, follower_count__gte=FANOUT_FOLLOWER_THRESHOLD)
+
+
+def _leaving(profiles):
+    return profiles.filter(fanout_on_read=True, follower_count__lt=FANOUT_FOLLOWER_THRESHOLD - FANOUT_HYSTERESIS)
+
+
+# --- Write path ---
+
+def fan_out_post(post):
+    """
+    Pushes a newly created post into the author's own timeline and, unless the
+    author is above the fan-out threshold, into every follower's timeline.
+    Followers are streamed and inserted in batches so memory stays bounded.
+    """
+    with transaction.atomic():
+        TimelineEntry.objects.bulk_create(
+            [TimelineEntry(user_id=post.author_id, post=post, created_at=post.created_at)],
+            ignore_conflicts=True,
+        )
+        if is_fanout_on_read(post.author_id):
+            return
+
+        follower_ids = (
+            Follow.objects.filter(followee_id=post.author_id)
+            .values_list('follower_id', flat=True)
+            .iterator(chunk_size=FANOUT_BATCH_SIZE)
+        )
+        while True:
+            batch = list(islice(follower_ids, FANOUT_BATCH_SIZE))
+            if not batch:
+                break
+            TimelineEntry.objects.bulk_create(
+                [TimelineEntry(user_id=uid, post=post, created_at=post.created_at) for uid in batch],
+                ignore_conflicts=True,
+            )
+
+
+def follow(follower, followee):
+    """
+    Creates the follow edge, bumps the followee's follower count and backfills
+    the followee's most recent posts into the follower's timeline.
+    Returns (follow, created).
+    """
+    with transaction.atomic():
+        edge, created = Follow.objects.get_or_create(follower=follower, followee=followee)
+        if not created:
+            return edge, False
+
+        SkillProfile.objects.get_or_create(user=followee)
+        SkillProfile.objects.filter(user=followee).update(follower_count=F('follower_count') + 1)
+        _entering(SkillProfile.objects.filter(user=followee)).update(fanout_on_read=True)
+
+        if not is_fanout_on_read(followee.pk):
+            recent = (
+                Post.objects.filter(author=followee)
+                .order_by('-created_at')
+                .values_list('id', 'created_at')[:FOLLOW_BACKFILL_SIZE]
+            )
+            TimelineEntry.objects.bulk_create(
+                [TimelineEntry(user=follower, post_id=pid, created_at=ts) for pid, ts in recent],
+                ignore_conflicts=True,
+            )
+    return edge, True
+
+
+def unfollow(follower, followee):
+    """
+    Removes the follow edge and the followee's posts from the follower's timeline.
+    If that takes the followee out of fan-out-on-read, their posts are copied
+    into the remaining followers' timelines after the commit (see
+    leave_fanout_on_read). Returns True if an edge was removed.
+    """
+    with transaction.atomic():
+        deleted, _ = Follow.objects.filter(follower=follower, followee=followee).delete()
+        if not deleted:
+            return False
+
+        SkillProfile.objects.filter(user=followee, follower_count__gt=0).update(
+            follower_count=F('follower_count') - 1
+        )
+        TimelineEntry.objects.filter(user=follower, post__author=followee).delete()
+        if _leaving(SkillProfile.objects.filter(user=followee)).exists():
+            author_id = followee.pk
+            transaction.on_commit(lambda: _leave_after_commit([author_id]))
+    return True
+
+
+def _leave_after_commit(author_ids):
+    # Read on every commit, so the test runner and override_settings apply
+    if getattr(settings, 'TIMELINE_ASYNC_MATERIALIZE', True):
+        materializer.schedule(author_ids)
+    else:
+        leave_fanout_on_read(author_ids)
+
+
+def leave_fanout_on_read(author_ids):
+    """
+    Switches the authors that are still below the hysteresis band back to
+    fan-out-on-write and materializes their recent posts. The flag is cleared
+    first, in its own transaction, so posts written from then on are fanned out
+    as usual; the copy overlaps them harmlessly. Returns the number of authors
+    switched.
+    """
+    switched = 0
+    for author_id in author_ids:
+        if _leaving(SkillProfile.objects.filter(user_id=author_id)).update(fanout_on_read=False):
+            materialize_author(author_id)
+            switched += 1
+    return switched
+
+
+# Looks leave_fanout_on_read up on each run, so tests can patch it
+materializer = BatchWorker('timeline-materializer', lambda author_ids: leave_fanout_on_read(author_ids))
+
+
+def sync_fanout_modes(user_ids=None):
+    """
+    Puts the given users (default: everyone) in the mode their follower count
+    calls for: for counts set in bulk (core.seeding) and for switches a
+    background thread did not get to. Returns (entered, left).
+    """
+    profiles = SkillProfile.objects.all()
+    if user_ids is not None:
+        profiles = profiles.filter(user_id__in=list(user_ids))
+    entered = _entering(profiles).update(fanout_on_read=True)
+    left = leave_fanout_on_read(list(_leaving(profiles).values_list('user_id', flat=True)))
+    return entered, left
+
+
+def materialize_author(author_id):
+    """
+    Copies the author's FOLLOW_BACKFILL_SIZE most recent posts into every
+    follower's timeline, as follow() would have, for an author moving from
+    fan-out-on-read to fan-out-on-write. Each batch commits on its own, so no
+    long transaction holds the timeline table. Returns the number of entries
+    written.
+    """
+    recent = list(
+        Post.objects.filter(author_id=author_id)
+        .order_by('-created_at')
+        .values_list('id', 'created_at')[:FOLLOW_BACKFILL_SIZE]
+    )
+    if not recent:
+        return 0
+    follower_ids = (
+        Follow.objects.filter(followee_id=author_id)
+        .values_list('follower_id', flat=True)
+        .iterator(chunk_size=FANOUT_BATCH_SIZE)
+    )
+    written = 0
+    # Batches of about FANOUT_BATCH_SIZE rows, like fan_out_post()
+    followers_per_batch = max(1, FANOUT_BATCH_SIZE // len(recent))
+    while True:
+        batch = list(islice(follower_ids, followers_per_batch))
+        if not batch:
+            return written
+        TimelineEntry.objects.bulk_create(
+            [TimelineEntry(user_id=uid, post_id=pid, created_at=ts) for uid in batch for pid, ts in recent],
+            ignore_conflicts=True,
+        )
+        written += len(batch) * len(recent)
+
+
+def backfill_timelines(user_ids):
+    """
+    Materializes the given users' timelines from Follow and Post, for rows that
+    were written without fan_out_post() / follow() (e.g. bulk_create seeding):
+    the user's own posts plus up to FOLLOW_BACKFILL_SIZE recent posts of each
+    followee served by fan-out-on-write. Returns the number of entries written.
+    """
+    user_ids = list(user_ids)
+    followees = {user_id: [user_id] for user_id in user_ids}
+    for follower_id, followee_id in Follow.objects.filter(follower_id__in=user_ids).values_list('follower_id', 'followee_id'):
+        followees[follower_id].append(followee_id)
+
+    authors = {author_id for ids in followees.values() for author_id in ids}
+    pulled = set(SkillProfile.objects.filter(
+        user_id__in=authors, fanout_on_read=True
+    ).values_list('user_id', flat=True))
+    recent = {}
+    posts = (
+        Post.objects.filter(author_id__in=authors - pulled)
+        .order_by('author_id', '-created_at')
+        .values_list('author_id', 'id', 'created_at')
+    )
+    for author_id, post_id, created_at in posts.iterator(chunk_size=FANOUT_BATCH_SIZE):
+        keys = recent.setdefault(author_id, [])
+        if len(keys) < FOLLOW_BACKFILL_SIZE:
+            keys.append((post_id, created_at))
+
+    entries = [
+        TimelineEntry(user_id=user_id, post_id=post_id, created_at=created_at)
+        for user_id, ids in followees.items()
+        for author_id in ids
+        for post_id, created_at in recent.get(author_id, ())
+    ]
+    # Authors above the threshold still get their own posts, as in fan_out_post()
+    own_pulled = Post.objects.filter(author_id__in=pulled & set(user_ids)).values_list('author_id', 'id', 'created_at')
+    entries.extend(TimelineEntry(user_id=a, post_id=p, created_at=c) for a, p, c in own_pulled)
+    TimelineEntry.objects.bulk_create(entries, batch_size=FANOUT_BATCH_SIZE, ignore_conflicts=True)
+    return len(entries)
+
+
+# --- Read path ---
+
+def _before(qs, field, pk_field, before):
+    # Keyset condition for a descending (created_at, id) ordering
+    if before is None:
+        return qs
+    created_at, pk = before
+    return qs.filter(Q(**{f'{field}__lt': created_at}) | Q(**{field: created_at, f'{pk_field}__lt': pk}))
+
+
+def _materialized_keys(user, limit, before):
+    return _before(
+        TimelineEntry.objects.filter(user=user), 'created_at', 'post_id', before
+    ).order_by('-created_at', '-post_id').values_list('created_at', 'post_id')[:limit]
+
+
+def _pulled_authors(user):
+    return Follow.objects.filter(
+        follower=user, followee__profile__fanout_on_read=True
+    ).values_list('followee_id', flat=True)
+
+
+def _pulled_keys(authors, limit, before):
+    return _before(
+        Post.objects.filter(author_id__in=authors), 'created_at', 'id', before
+    ).order_by('-created_at', '-id').values_list('created_at', 'id')[:limit]
+
+
+def _page_keys(streams, limit):
+    page_keys = []
+    seen = set()
+    for created_at, post_id in heapq.merge(*streams, reverse=True):
+        if post_id in seen:
+            continue
+        seen.add(post_id)
+        page_keys.append(post_id)
+        if len(page_keys) == limit:
+            break
+    return page_keys
+
+
+def _page_posts(page_keys, columns=None):
+    posts = Post.objects.order_by().filter(pk__in=page_keys)
+    if columns:
+        return posts.values(*columns)
+    return posts.select_related('author', 'related_skill')
+
+
+def _post_id(post):
+    return post['id'] if isinstance(post, dict) else post.pk
+
+
+def read_timeline(user, limit, before=None, columns=None):
+    """
+    Returns up to 'limit' posts for the user's feed, newest first.
+
+    'before' is an optional (created_at, post_id) keyset position; only posts
+    strictly older than it are returned. Cost is proportional to 'limit', not to
+    the size of the posts table: one range scan on the user's materialized
+    timeline, one range scan over the posts of any high-follower followees, and
+    one primary-key lookup for the page itself.
+
+    With 'columns' (which must include 'id' and 'created_at') the posts are
+    .values() dicts of those columns rather than Post instances.
+    """
+    streams = [list(_materialized_keys(user, limit, before))]
+    pulled_authors = list(_pulled_authors(user))
+    if pulled_authors:
+        streams.append(list(_pulled_keys(pulled_authors, limit, before)))
+
+    page_keys = _page_keys(streams, limit)
+    posts = {_post_id(post): post for post in _page_posts(page_keys, columns)}
+    return [posts[pk] for pk in page_keys if pk in posts]
+
+
+async def aread_timeline(user, limit, before=None):
+    """
+    read_timeline() with the async ORM, for the ASGI read path.
+    """
+    streams = [[key async for key in _materialized_keys(user, limit, before)]]
+    pulled_authors = [author async for author in _pulled_authors(user)]
+    if pulled_authors:
+        streams.append([key async for key in _pulled_keys(pulled_authors, limit, before)])
+
+    page_keys = _page_keys(streams, limit)
+    posts = {post.pk: post async for post in _page_posts(page_keys)}
+    return [posts[pk] for pk in page_keys if pk in posts]
@@ -1,5 +1,8 @@
+from django.urls import path
 from rest_framework.routers import DefaultRouter
-from .views import SkillViewSet, SkillProfileViewSet, UserSkillViewSet, EndorsementViewSet, PostViewSet
+from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView
+from . import async_views
+from .views import SkillViewSet, SkillProfileViewSet, UserSkillViewSet, EndorsementViewSet, PostViewSet, NotificationViewSet, ConnectionViewSet, ChatViewSet, ExportViewSet, TokenViewSet
 
 # 1. Initialize the DefaultRouter
 router = DefaultRouter()
@@ -11,6 +14,21 @@ router.register(r'profiles', SkillProfileViewSet, basename='profile')
 router.register(r'userskills', UserSkillViewSet, basename='userskill')
 router.register(r'endorsements', EndorsementViewSet, basename='endorsement')
 router.register(r'posts', PostViewSet, basename='post')
+router.register(r'notifications', NotificationViewSet, basename='notification')
+router.register(r'connections', ConnectionViewSet, basename='connection')
+router.register(r'chats', ChatViewSet, basename='chat')
+router.register(r'export', ExportViewSet, basename='export')
+router.register(r'token', TokenViewSet, basename='token')
 
-# 3. Assign the router's generated URLs to the mandatory 'urlpatterns' list
-urlpatterns = router.urls
\ No newline at end of file
+# 3. Assign the router's generated URLs to the mandatory 'urlpatterns' list,
+# plus JWT sign-in (core/authentication.py) and the async read path served when
+# running under ASGI (see core/async_views.py)
+urlpatterns = router.urls + [
+    path('token/', TokenObtainPairView.as_view(), name='token-obtain'),
+    path('token/refresh/', TokenRefreshView.as_view(), name='token-refresh'),
+    path('async/feed/', async_views.feed, name='async-feed'),
+    path('async/profiles/<str:username>/', async_views.profile, name='async-profile'),
+    path('async/skills/search/', async_views.skill_search_view, name='async-skill-search'),
+    path('async/endorsements/', async_views.endorsements, name='async-endorsements'),
+    path('async/notifications/stream/', async_views.notification_stream, name='async-notification-stream'),
+]
\ No newline at end of file
@@ -1,13 +1,26 @@
-from rest_framework import viewsets, permissions, status
+from rest_framework import mixins, viewsets, permissions, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
+from django.contrib.auth.models import User
+from django.db.models import Q
+from django.http import Http404, HttpResponse, StreamingHttpResponse
+from django.utils import timezone
 from django.shortcuts import get_object_or_404
+from rest_framework_simplejwt.tokens import Token
 
-from .models import Skill, SkillProfile, UserSkill, Post, Endorsement
+from . import bulk, chat, denylist, exports, graph, post_search, profile_cards, skill_search, skill_tree, timeline
+from .query_plans import QueryPlanMixin
+from .replicas import ReplicaReadMixin
+from .response_cache import CachedResponseMixin
+from .models import Skill, SkillProfile, UserSkill, Post, Endorsement, SkillMatch, Notification, Connection, Chat, ChatMember
 from .serializers import (
     SkillSerializer, SkillProfileSerializer, 
     UserSkillSerializer, PostSerializer, 
-    EndorsementSerializer
+    EndorsementSerializer, SkillMatchSerializer,
+    SkillTreeSerializer, UserSerializer, NotificationSerializer,
+    ConnectionSerializer, PostValuesSerializer, EndorsementValuesSerializer,
+    UserSkillValuesSerializer, ChatSerializer, MessageValuesSerializer,
+    TokenRevokeSerializer
 )
 
 # --- Permissions ---
@@ -23,17 +36,34 @@ class IsOwnerOrReadOnly(permissions.BasePermission):
             return True
         
         # Write permissions are only allowed to the owner of the profile.
-        if hasattr(obj, 'user'):
-             return obj.user == request.user
-        elif hasattr(obj, 'author'):
-             return obj.author == request.user
+        # Compared by id, so the owner row is never loaded just for this
+        if hasattr(obj, 'user_id'):
+             return obj.user_id == request.user.pk
+        elif hasattr(obj, 'author_id'):
+             return obj.author_id == request.user.pk
         # For UserSkill/Endorsement, we need more specific checks in the ViewSet
 
         return False
 
+# --- Bulk writes ---
+
+def bulk_response(request, write):
+    """
+    Runs a core.bulk writer over the request's array and returns its per-item results.
+    """
+    items = request.data
+    if not isinstance(items, list):
+        return Response({"detail": "Expected a list of items."}, status=status.HTTP_400_BAD_REQUEST)
+    if len(items) > bulk.MAX_ITEMS:
+        return Response({"detail": f"At most {bulk.MAX_ITEMS} items per request."}, status=status.HTTP_400_BAD_REQUEST)
+
+    results = write(request.user, items)
+    created = any(result['status'] == 'created' for result in results)
+    return Response({'results': results}, status=status.HTTP_201_CREATED if created else status.HTTP_200_OK)
+
 # --- ViewSets ---
 
-class SkillViewSet(viewsets.ReadOnlyModelViewSet):
+class SkillViewSet(ReplicaReadMixin, CachedResponseMixin, QueryPlanMixin, viewsets.ReadOnlyModelViewSet):
     """
     API endpoint that allows Skills to be viewed. No creation/update allowed via API.
     """
@@ -41,24 +71,63 @@ class SkillViewSet(viewsets.ReadOnlyModelViewSet):
     serializer_class = SkillSerializer
     permission_classes = [permissions.IsAuthenticatedOrReadOnly]
     search_fields = ['name']
+    throttle_scopes = {'search': 'search'}
+
+    # list / retrieve may read from a replica (core.replicas). Served from the
+    # response cache until a Skill (or, for search, a card) changes
+    cache_dependencies = {
+        'list': lambda view: ['skills'],
+        'retrieve': lambda view: ['skills'],
+        'search': lambda view: ['skills', 'skill-popularity'],
+        'subtree': lambda view: ['skills'],
+        'ancestors': lambda view: ['skills'],
+    }
     
     @action(detail=False, methods=['get'])
     def search(self, request):
         """
-        Custom action for fast skill search.
+        Custom action for fast skill search and autocomplete.
+        Ranked by match quality, then by how many profiles list the skill.
         """
         query = request.query_params.get('q', '')
-        if query:
-            # Case-insensitive search starting with the query
-            skills = self.queryset.filter(name__icontains=query)[:10] 
-        else:
-            skills = self.queryset.all()[:10]
-            
-        serializer = self.get_serializer(skills, many=True)
-        return Response(serializer.data)
+        try:
+            limit = min(max(int(request.query_params.get('limit', 10)), 1), 50)
+        except ValueError:
+            limit = 10
+
+        # The index returns the same {'id', 'name'} shape as SkillSerializer
+        return Response(skill_search.search(query, limit=limit))
+
+    @action(detail=True, methods=['get'])
+    def subtree(self, request, pk=None):
+        """
+        The skill and all of its sub-skills at any depth, nearest first.
+        """
+        skill = self.get_object()
+        skills = SkillTreeSerializer.query_plan.apply(skill_tree.subtree(skill.pk))
+        return Response(SkillTreeSerializer(skills, many=True).data)
+
+    @action(detail=True, methods=['get'])
+    def ancestors(self, request, pk=None):
+        """
+        The skill's broader skills from its parent up to the root.
+        """
+        skill = self.get_object()
+        skills = SkillTreeSerializer.query_plan.apply(skill_tree.ancestors(skill.pk))
+        return Response(SkillTreeSerializer(skills, many=True).data)
 
+    @action(detail=True, methods=['get'])
+    def users(self, request, pk=None):
+        """
+        Users with the skill or any of its sub-skills on a public card.
+        """
+        skill = self.get_object()
+        users = UserSerializer.query_plan.apply(skill_tree.users_with_skill_in_subtree(skill.pk))
+        page = self.paginator.paginate_queryset(users.order_by('username'), request, view=None)
+        return self.paginator.get_paginated_response(UserSerializer(page, many=True).data)
 
-class SkillProfileViewSet(viewsets.ModelViewSet):
+
+class SkillProfileViewSet(CachedResponseMixin, QueryPlanMixin, viewsets.ModelViewSet):
     """
     API endpoint that allows user profiles to be viewed or edited.
     """
@@ -67,14 +136,27 @@ class SkillProfileViewSet(viewsets.ModelViewSet):
     permission_classes = [permissions.IsAuthenticatedOrReadOnly, IsOwnerOrReadOnly]
     lookup_field = 'user__username' # Allows lookup via /profiles/username/
 
+    # A profile page shows skill names, so it also depends on the Skill table;
+    # 'profiles' is bumped by bulk repairs that touch every profile
+    cache_dependencies = {
+        'retrieve': lambda view: profile_cards.namespaces(view.kwargs['user__username']),
+    }
+
     def get_queryset(self):
-        # Optionally filter or limit profiles here
-        return self.queryset.select_related('user')
+        # Related rows are loaded by SkillProfileSerializer.query_plan
+        return self.queryset
 
     def retrieve(self, request, *args, **kwargs):
         """
         Custom retrieve to handle the case where a profile might not exist for a user.
+        Plain JSON requests are answered with the materialized profile card.
         """
+        if request.accepted_renderer.format == 'json' and request.accepted_media_type == 'application/json':
+            content = profile_cards.get_card(kwargs['user__username'])
+            if content is None:
+                return Response({"detail": "Not found."}, status=status.HTTP_404_NOT_FOUND)
+            return HttpResponse(content, content_type='application/json')
+
         try:
             instance = self.get_object()
         except Exception:
@@ -88,12 +170,42 @@ class SkillProfileViewSet(viewsets.ModelViewSet):
         # Ensure only the profile fields are updated, not the user object itself
         serializer.save()
 
+    @action(detail=True, methods=['post', 'delete'], permission_classes=[permissions.IsAuthenticated])
+    def follow(self, request, user__username=None):
+        """
+        POST follows the user, DELETE unfollows them. Their posts then appear in
+        (or disappear from) the caller's feed.
+        """
+        followee = get_object_or_404(User, username=user__username)
+        if followee == request.user:
+            return Response({"detail": "You cannot follow yourself."}, status=status.HTTP_400_BAD_REQUEST)
+
+        if request.method == 'DELETE':
+            timeline.unfollow(request.user, followee)
+            return Response(status=status.HTTP_204_NO_CONTENT)
 
-class UserSkillViewSet(viewsets.ModelViewSet):
+        _, created = timeline.follow(request.user, followee)
+        return Response(
+            {"following": followee.username},
+            status=status.HTTP_201_CREATED if created else status.HTTP_200_OK,
+        )
+
+    @action(detail=False, methods=['get'], permission_classes=[permissions.IsAuthenticated])
+    def matches(self, request):
+        """
+        The current user's best teach/learn matches, precomputed by 'manage.py compute_matches'.
+        """
+        matches = SkillMatch.objects.filter(user=request.user).order_by('rank')
+        matches = SkillMatchSerializer.query_plan.apply(matches)
+        return Response(SkillMatchSerializer(matches, many=True).data)
+
+
+class UserSkillViewSet(QueryPlanMixin, viewsets.ModelViewSet):
     """
     API endpoint for managing the skills listed on a user's profile (UserSkill cards).
     """
     serializer_class = UserSkillSerializer
+    values_serializer_classes = {'list': UserSkillValuesSerializer}
     permission_classes = [permissions.IsAuthenticated, IsOwnerOrReadOnly]
 
     def get_queryset(self):
@@ -103,10 +215,22 @@ class UserSkillViewSet(viewsets.ModelViewSet):
         return UserSkill.objects.none()
 
     def perform_create(self, serializer):
-        # Automatically link the new UserSkill to the current user's profile
-        profile, created = SkillProfile.objects.get_or_create(user=self.request.user)
+        # Automatically link the new UserSkill to the current user's profile,
+        # which the authentication cache has usually already attached to the user
+        try:
+            profile = self.request.user.profile
+        except SkillProfile.DoesNotExist:
+            profile, created = SkillProfile.objects.get_or_create(user=self.request.user)
         serializer.save(profile=profile)
 
+    @action(detail=False, methods=['post'])
+    def bulk(self, request):
+        """
+        Lists many skills at once: [{"skill_id": 1, "self_rating": 3, "is_public": true}, ...].
+        Skills already on the profile are reported as existing.
+        """
+        return bulk_response(request, bulk.add_user_skills)
+
     def get_permissions(self):
         # Check that the user is the profile owner for update/destroy actions
         if self.action in ['update', 'partial_update', 'destroy']:
@@ -116,47 +240,378 @@ class UserSkillViewSet(viewsets.ModelViewSet):
         return super().get_permissions()
 
 
-class EndorsementViewSet(viewsets.ModelViewSet):
+class EndorsementViewSet(QueryPlanMixin, viewsets.ModelViewSet):
     """
     API endpoint for creating and viewing endorsements.
     """
     serializer_class = EndorsementSerializer
+    values_serializer_classes = dict.fromkeys(('list', 'given', 'received'), EndorsementValuesSerializer)
     permission_classes = [permissions.IsAuthenticated]
+    throttle_scopes = dict.fromkeys(('create', 'bulk', 'update', 'partial_update', 'destroy'), 'endorsements')
 
     def get_queryset(self):
-        # Allow viewing endorsements given by the user or received by the user
+        # Allow viewing endorsements given by the user or received by the user.
+        # Both sides filter Endorsement's own columns, each backed by an index.
         if self.request.user.is_authenticated:
-            return Endorsement.objects.filter(
-                endorser=self.request.user
-            ) | Endorsement.objects.filter(
-                skill_card__profile__user=self.request.user
-            ).select_related('skill_card__skill', 'skill_card__profile__user')
+            return Endorsement.objects.filter(Q(endorser=self.request.user) | Q(recipient=self.request.user))
         return Endorsement.objects.none()
 
+    def given_queryset(self):
+        return self.filter_queryset(Endorsement.objects.filter(endorser=self.request.user))
+
+    def received_queryset(self):
+        return self.filter_queryset(Endorsement.objects.filter(recipient=self.request.user))
+
+    def list(self, request, *args, **kwargs):
+        """
+        Given and received endorsements, newest first. Built by merging the two
+        index-ordered streams one page at a time rather than by an OR query.
+        """
+        page = self.paginator.paginate_merged([self.given_queryset(), self.received_queryset()], request, view=self)
+        serializer = self.get_serializer(page, many=True)
+        return self.get_paginated_response(serializer.data)
+
+    @action(detail=False, methods=['get'])
+    def given(self, request):
+        """
+        Endorsements the current user has given, newest first.
+        """
+        page = self.paginate_queryset(self.given_queryset())
+        serializer = self.get_serializer(page, many=True)
+        return self.get_paginated_response(serializer.data)
+
+    @action(detail=False, methods=['get'])
+    def received(self, request):
+        """
+        Endorsements the current user has received, newest first.
+        """
+        page = self.paginate_queryset(self.received_queryset())
+        serializer = self.get_serializer(page, many=True)
+        return self.get_paginated_response(serializer.data)
+
     def perform_create(self, serializer):
         # Automatically set the endorser to the currently logged-in user
         serializer.save(endorser=self.request.user)
 
+    @action(detail=False, methods=['post'])
+    def bulk(self, request):
+        """
+        Endorses many cards at once: [{"skill_card_id": "...", "endorser_rating": 4, "comment": "..."}, ...].
+        Cards the user has already endorsed are reported as existing.
+        """
+        return bulk_response(request, bulk.endorse)
+
 
-class PostViewSet(viewsets.ModelViewSet):
+class PostViewSet(QueryPlanMixin, viewsets.ModelViewSet):
     """
     API endpoint for viewing and creating posts/status updates.
     """
     queryset = Post.objects.all()
     serializer_class = PostSerializer
+    values_serializer_classes = dict.fromkeys(('list', 'user_feed', 'search'), PostValuesSerializer)
     permission_classes = [permissions.IsAuthenticatedOrReadOnly, IsOwnerOrReadOnly]
+    throttle_scopes = {'create': 'posts', 'search': 'search'}
 
     def perform_create(self, serializer):
-        # Automatically set the author to the currently logged-in user
-        serializer.save(author=self.request.user)
+        # Automatically set the author to the currently logged-in user,
+        # then push the post into the followers' timelines
+        post = serializer.save(author=self.request.user)
+        timeline.fan_out_post(post)
         
-    @action(detail=False, methods=['get'])
+    @action(detail=False, methods=['get'], permission_classes=[permissions.IsAuthenticated])
     def user_feed(self, request):
         """
-        Custom action to fetch posts for the authenticated user's feed.
-        (For simplicity, currently just returns all posts, but later can be customized to follow logic).
+        Custom action to fetch posts for the authenticated user's feed:
+        their own posts plus posts from everyone they follow, newest first.
+        Served from the materialized timeline, so cost depends only on page size.
         """
-        # A simple feed: latest posts for now. In a real app, this would involve 'following' logic.
-        posts = self.queryset.all().order_by('-created_at')[:50]
+        paginator = self.paginator
+        posts = paginator.paginate_forward(
+            lambda after, limit: timeline.read_timeline(request.user, limit, before=after, columns=PostValuesSerializer.columns),
+            request,
+            ordering=('-created_at', '-id'),
+        )
         serializer = self.get_serializer(posts, many=True)
-        return Response(serializer.data)
\ No newline at end of file
+        return paginator.get_paginated_response(serializer.data)
+
+    @action(detail=False, methods=['get'])
+    def search(self, request):
+        """
+        Full-text search over post content (core.post_search), most relevant
+        first. Narrow it with ?author=<user id> and ?related_skill=<skill id>;
+        page with ?limit (up to 50) and ?offset.
+        """
+        params = {}
+        for name, default in (('limit', 10), ('offset', 0), ('author', None), ('related_skill', None)):
+            try:
+                value = request.query_params.get(name)
+                params[name] = default if value in (None, '') else int(value)
+            except ValueError:
+                return Response({name: ["A valid integer is required."]}, status=status.HTTP_400_BAD_REQUEST)
+        params['limit'] = min(max(params['limit'], 1), 50)
+        params['offset'] = max(params['offset'], 0)
+
+        post_ids = post_search.search(request.query_params.get('q', ''), **params)
+        rows = self.filter_queryset(self.get_queryset().filter(pk__in=post_ids))
+        position = {post_id: i for i, post_id in enumerate(post_ids)}
+        rows = sorted(rows, key=lambda row: position[row['id']])
+        return Response(self.get_serializer(rows, many=True).data)
+
+class NotificationViewSet(QueryPlanMixin, viewsets.ReadOnlyModelViewSet):
+    """
+    API endpoint for the current user's notifications, most recently updated first.
+    New and updated notifications are pushed over /api/async/notifications/stream/
+    (Server-Sent Events), so clients load this list once instead of polling.
+    """
+    serializer_class = NotificationSerializer
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get_queryset(self):
+        return Notification.objects.filter(recipient=self.request.user)
+
+    @action(detail=False, methods=['post'])
+    def read(self, request):
+        """
+        Marks notifications read: {"ids": [1, 2]} or, without ids, all of them.
+        A read notification is closed; later events start a new one.
+        """
+        unread = self.get_queryset().filter(read_at__isnull=True)
+        ids = request.data.get('ids')
+        if ids is not None:
+            if not isinstance(ids, list) or not all(isinstance(i, int) for i in ids):
+                return Response({"ids": ["Expected a list of notification ids."]}, status=status.HTTP_400_BAD_REQUEST)
+            unread = unread.filter(pk__in=ids)
+        return Response({"marked_read": unread.update(read_at=timezone.now())})
+
+
+class ConnectionViewSet(QueryPlanMixin, mixins.ListModelMixin, mixins.RetrieveModelMixin,
+                        mixins.DestroyModelMixin, viewsets.GenericViewSet):
+    """
+    API endpoint for the current user's connections and connection requests.
+    Filter with ?status=pending or ?status=accepted; DELETE cancels, declines or
+    removes a connection.
+    """
+    serializer_class = ConnectionSerializer
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get_queryset(self):
+        me = self.request.user
+        connections = Connection.objects.filter(Q(from_user=me) | Q(to_user=me))
+        states = {label: value for value, label in Connection.STATUS_CHOICES}
+        if self.request.query_params.get('status') in states:
+            connections = connections.filter(status=states[self.request.query_params['status']])
+        return connections
+
+    def create(self, request, *args, **kwargs):
+        """
+        Sends a connection request: {"username": "..."}. If that user has already
+        asked to connect, their request is accepted instead.
+        """
+        other = get_object_or_404(User, username=request.data.get('username', ''))
+        if other == request.user:
+            return Response({"detail": "You cannot connect with yourself."}, status=status.HTTP_400_BAD_REQUEST)
+        connection, created = graph.request_connection(request.user, other)
+        return Response(
+            self.get_serializer(connection).data,
+            status=status.HTTP_201_CREATED if created else status.HTTP_200_OK,
+        )
+
+    @action(detail=True, methods=['post'])
+    def accept(self, request, pk=None):
+        """
+        Accepts a request sent to the current user.
+        """
+        connection = self.get_object()
+        if connection.to_user_id != request.user.pk:
+            return Response({"detail": "Only the recipient can accept a request."}, status=status.HTTP_403_FORBIDDEN)
+        if connection.status != Connection.ACCEPTED:
+            graph.accept(connection)
+        return Response(self.get_serializer(connection).data)
+
+    def users_response(self, ids, extra=None):
+        users = UserSerializer.query_plan.apply(User.objects.filter(pk__in=ids)).in_bulk()
+        return [
+            dict(UserSerializer(users[user_id]).data, **(extra(user_id) if extra else {}))
+            for user_id in ids if user_id in users
+        ]
+
+    @action(detail=False, methods=['get'], url_path=r'mutual/(?P<username>[^/]+)')
+    def mutual(self, request, username=None):
+        """
+        Connections the current user shares with another user, from the in-memory graph.
+        """
+        other = get_object_or_404(User, username=username)
+        ids = graph.get_graph().mutual(request.user.pk, other.pk)
+        limit = self.paginator.get_page_size(request)
+        return Response({'count': len(ids), 'results': self.users_response(ids[:limit])})
+
+    @action(detail=False, methods=['get'])
+    def suggestions(self, request):
+        """
+        People you may know: users two steps away, most mutual connections first.
+        """
+        try:
+            limit = min(max(int(request.query_params.get('limit', 20)), 1), 50)
+        except ValueError:
+            limit = 20
+        pairs = graph.get_graph().suggestions(request.user.pk, limit, exclude=graph.pending_with(request.user.pk))
+        mutual_counts = dict(pairs)
+        return Response(self.users_response(
+            [user_id for user_id, _ in pairs],
+            extra=lambda user_id: {'mutual_connections': mutual_counts[user_id]},
+        ))
+
+
+class ChatViewSet(QueryPlanMixin, mixins.ListModelMixin, mixins.RetrieveModelMixin, viewsets.GenericViewSet):
+    """
+    API endpoint for the current user's chats (core.chat), most recently active
+    first. Messages are read and sent at /chats/<id>/messages/; connected
+    clients get them live from the WebSocket gateway at /ws/chat/.
+    """
+    serializer_class = ChatSerializer
+    values_serializer_classes = {'messages': MessageValuesSerializer}
+    permission_classes = [permissions.IsAuthenticated]
+    throttle_scopes = {'send_message': 'chat'}
+    lookup_value_regex = r'\d+'
+
+    def get_queryset(self):
+        return Chat.objects.filter(members__user=self.request.user)
+
+    @property
+    def keyset_ordering(self):
+        # A chat's log is paged by seq: newest first, or oldest first from ?after=<seq>
+        if self.action == 'messages':
+            return ('seq',) if 'after' in self.request.query_params else ('-seq',)
+        return None
+
+    def check_member(self, pk):
+        # One indexed lookup instead of loading the chat and its members
+        if not chat.is_member(pk, self.request.user.pk):
+            raise Http404
+
+    def create(self, request, *args, **kwargs):
+        """
+        Starts a chat with other users: {"usernames": ["...", ...]}.
+        """
+        usernames = request.data.get('usernames')
+        if not isinstance(usernames, list) or not usernames or not all(isinstance(u, str) for u in usernames):
+            return Response({"usernames": ["Expected a non-empty list of usernames."]}, status=status.HTTP_400_BAD_REQUEST)
+        usernames = set(usernames) - {request.user.username}
+        if not usernames or len(usernames) >= chat.MAX_MEMBERS:
+            return Response({"usernames": [f"A chat has 2 to {chat.MAX_MEMBERS} members."]}, status=status.HTTP_400_BAD_REQUEST)
+        others = list(User.objects.filter(username__in=usernames))
+        missing = usernames - {user.username for user in others}
+        if missing:
+            return Response({"usernames": [f"Unknown users: {', '.join(sorted(missing))}."]}, status=status.HTTP_400_BAD_REQUEST)
+        conversation = chat.create_chat([request.user, *others])
+        instance = ChatSerializer.query_plan.apply(Chat.objects.filter(pk=conversation.pk)).get()
+        return Response(self.get_serializer(instance).data, status=status.HTTP_201_CREATED)
+
+    @action(detail=True, methods=['get'])
+    def messages(self, request, pk=None):
+        """
+        The chat's messages, newest first. ?after=<seq> reads forward from that
+        seq instead, to catch up on what a client missed while disconnected.
+        """
+        self.check_member(pk)
+        messages = chat.messages(pk)
+        if 'after' in request.query_params:
+            try:
+                messages = messages.filter(seq__gt=int(request.query_params['after']))
+            except ValueError:
+                return Response({"after": ["A valid integer is required."]}, status=status.HTTP_400_BAD_REQUEST)
+        page = self.paginator.paginate_queryset(messages, request, view=self)
+        return self.paginator.get_paginated_response(self.get_serializer(page, many=True).data)
+
+    @messages.mapping.post
+    def send_message(self, request, pk=None):
+        """
+        Sends a message: {"content": "..."}.
+        """
+        content = request.data.get('content')
+        error = chat.validate_content(content)
+        if error:
+            return Response({"content": [error]}, status=status.HTTP_400_BAD_REQUEST)
+        self.check_member(pk)
+        [message] = chat.write_batch([(int(pk), request.user.pk, content)])
+        return Response(message, status=status.HTTP_201_CREATED)
+
+    @action(detail=True, methods=['post'])
+    def read(self, request, pk=None):
+        """
+        Records that the current user has read every message up to {"seq": N}.
+        Receipts only move forward.
+        """
+        seq = request.data.get('seq')
+        if not isinstance(seq, int) or isinstance(seq, bool) or seq < 0:
+            return Response({"seq": ["A valid non-negative integer is required."]}, status=status.HTTP_400_BAD_REQUEST)
+        self.check_member(pk)
+        chat.write_batch(receipts={(int(pk), request.user.pk): seq})
+        read_seq = ChatMember.objects.filter(chat_id=pk, user=request.user).values_list('read_seq', flat=True).get()
+        return Response({"read_seq": read_seq})
+
+
+class ExportViewSet(viewsets.ViewSet):
+    """
+    Streaming account export (see core.exports), as NDJSON (default) or CSV via
+    ?format= or the Accept header:
+
+        GET /api/export/                   all of the user's datasets (NDJSON only)
+        GET /api/export/<dataset>/         one of the user's datasets
+        GET /api/export/tables/<table>/    a whole table, staff only
+    """
+    permission_classes = [permissions.IsAuthenticated]
+    renderer_classes = [exports.NDJSONRenderer, exports.CSVRenderer]
+
+    def stream(self, request, filename, datasets, *args):
+        if request.accepted_renderer.format == 'csv':
+            if len(datasets) != 1:
+                return Response({"detail": "CSV exports hold one dataset; use /api/export/<dataset>/."},
+                                status=status.HTTP_400_BAD_REQUEST)
+            body = exports.csv_stream(datasets[0], *args)
+        else:
+            body = exports.ndjson_stream((dataset, args) for dataset in datasets)
+        response = StreamingHttpResponse(exports.streaming_body(body, request), content_type=request.accepted_renderer.media_type)
+        response['Content-Disposition'] = f'attachment; filename="{filename}.{request.accepted_renderer.format}"'
+        return response
+
+    def list(self, request):
+        datasets = list(exports.ACCOUNT_DATASETS.values())
+        return self.stream(request, f'skilllink-{request.user.username}', datasets, request.user)
+
+    def retrieve(self, request, pk=None):
+        dataset = exports.ACCOUNT_DATASETS.get(pk)
+        if dataset is None:
+            return Response({"detail": "Not found."}, status=status.HTTP_404_NOT_FOUND)
+        return self.stream(request, f'skilllink-{request.user.username}-{pk}', [dataset], request.user)
+
+    @action(detail=False, methods=['get'], url_path=r'tables/(?P<table>[^/.]+)',
+            permission_classes=[permissions.IsAdminUser])
+    def tables(self, request, table=None):
+        dataset = exports.TABLE_DATASETS.get(table)
+        if dataset is None:
+            return Response({"detail": "Not found."}, status=status.HTTP_404_NOT_FOUND)
+        return self.stream(request, f'skilllink-{table}', [dataset])
+
+
+class TokenViewSet(viewsets.ViewSet):
+    """
+    Signing out of JWT authentication (core.authentication). Tokens are
+    obtained at /api/token/ and refreshed at /api/token/refresh/.
+
+        POST /api/token/revoke/  {"refresh": "..."}
+
+    revokes the refresh token and, if the request was authenticated with one,
+    the access token (core.denylist). Access tokens obtained with the refresh
+    token elsewhere stay valid until they expire (SIMPLE_JWT ACCESS_TOKEN_LIFETIME).
+    """
+    permission_classes = [permissions.AllowAny]
+
+    @action(detail=False, methods=['post'])
+    def revoke(self, request):
+        serializer = TokenRevokeSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        denylist.revoke(serializer.validated_data['refresh'])
+        if isinstance(request.auth, Token):
+            denylist.revoke(request.auth)
+        return Response(status=status.HTTP_204_NO_CONTENT)
@@ -1,3 +1,23 @@
 from django.contrib import admin
 
-# Register your models here.
+from core.admin_changelist import ScalableModelAdmin
+
+from .models import Availability, Session
+
+
+@admin.register(Availability)
+class AvailabilityAdmin(admin.ModelAdmin):
+    list_display = ('user', 'timezone', 'updated_at')
+    list_select_related = ('user',)
+    search_fields = ('user__username',)
+    raw_id_fields = ('user',)
+
+
+# Sessions grow with every proposal, so they get the scalable changelist too
+@admin.register(Session)
+class SessionAdmin(ScalableModelAdmin):
+    list_display = ('proposer', 'invitee', 'skill', 'starts_at', 'ends_at', 'status')
+    list_filter = ('status', 'starts_at')
+    list_select_related = ('proposer', 'invitee', 'skill')
+    search_fields = ('proposer__username', 'invitee__username')
+    raw_id_fields = ('proposer', 'invitee', 'skill')
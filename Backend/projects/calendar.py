@@ -0,0 +1,125 @@
+"""
+iCalendar (RFC 5545) export of a user's sessions, for calendar sync.
+
+Like the data exports (core.exports), the feed is streamed: sessions are read
+with values_list(...).iterator(chunk_size=CHUNK_SIZE) and written out in
+blocks of about FLUSH_BYTES, so a long session history is never held in memory,
+under ASGI too (core.exports.streaming_body).
+Each session keeps the same UID across exports, and cancelled sessions stay in
+the feed with STATUS:CANCELLED, so subscribed calendars update and remove
+events rather than duplicating them.
+"""
+import datetime
+
+from django.db.models import Q
+from rest_framework.renderers import BaseRenderer
+
+from core.exports import CHUNK_SIZE, FLUSH_BYTES
+
+from .models import Session
+
+PRODID = '-//SkillLink//Sessions//EN'
+
+# Octets per line before folding (RFC 5545, 3.1)
+LINE_LIMIT = 75
+
+EVENT_STATUS = {
+    Session.PROPOSED: 'TENTATIVE',
+    Session.ACCEPTED: 'CONFIRMED',
+    Session.COMPLETED: 'CONFIRMED',
+    Session.CANCELLED: 'CANCELLED',
+}
+
+
+def escape(text):
+    return (text.replace('\\', '\\\\').replace(';', '\\;').replace(',', '\\,')
+            .replace('\r\n', '\\n').replace('\n', '\\n'))
+
+
+def timestamp(value):
+    return value.astimezone(datetime.timezone.utc).strftime('%Y%m%dT%H%M%SZ')
+
+
+def fold(line):
+    """
+    Splits a content line into CRLF-terminated lines of at most LINE_LIMIT
+    octets, continuation lines starting with a space, without splitting a
+    UTF-8 character.
+    """
+    if len(line.encode('utf-8')) <= LINE_LIMIT:
+        return line + '\r\n'
+    parts, current, size, limit = [], [], 0, LINE_LIMIT
+    for char in line:
+        width = len(char.encode('utf-8'))
+        if size + width > limit:
+            parts.append(''.join(current))
+            # Later lines lose one octet to the leading space
+            current, size, limit = [], 0, LINE_LIMIT - 1
+        current.append(char)
+        size += width
+    parts.append(''.join(current))
+    return '\r\n '.join(parts) + '\r\n'
+
+
+def sessions_of(user):
+    return (
+        Session.objects.filter(Q(proposer=user) | Q(invitee=user), status__in=list(EVENT_STATUS))
+        .order_by('starts_at', 'id')
+        .values_list('id', 'status', 'starts_at', 'ends_at', 'created_at', 'note',
+                     'proposer__username', 'invitee__username', 'skill__name')
+    )
+
+
+def ics_events(user, domain):
+    stamp = timestamp(datetime.datetime.now(datetime.timezone.utc))
+    for session_id, status, starts_at, ends_at, created_at, note, proposer, invitee, skill in \
+            sessions_of(user).iterator(chunk_size=CHUNK_SIZE):
+        other = invitee if proposer == user.username else proposer
+        summary = f"SkillLink: {skill} with {other}" if skill else f"SkillLink session with {other}"
+        lines = [
+            'BEGIN:VEVENT',
+            f'UID:session-{session_id}@{domain}',
+            f'DTSTAMP:{stamp}',
+            f'CREATED:{timestamp(created_at)}',
+            f'DTSTART:{timestamp(starts_at)}',
+            f'DTEND:{timestamp(ends_at)}',
+            f'SUMMARY:{escape(summary)}',
+            f'STATUS:{EVENT_STATUS[status]}',
+        ]
+        if note:
+            lines.append(f'DESCRIPTION:{escape(note)}')
+        lines.append('END:VEVENT')
+        yield ''.join(fold(line) for line in lines)
+
+
+def ics_stream(user, domain):
+    """
+    The user's sessions as an iCalendar feed, in byte blocks of about FLUSH_BYTES.
+    """
+    header = ''.join(fold(line) for line in (
+        'BEGIN:VCALENDAR', 'VERSION:2.0', f'PRODID:{PRODID}', 'CALSCALE:GREGORIAN', 'METHOD:PUBLISH',
+        f'X-WR-CALNAME:{escape("SkillLink sessions")}',
+    ))
+    block, size = [header], len(header)
+    for event in ics_events(user, domain):
+        block.append(event)
+        size += len(event)
+        if size >= FLUSH_BYTES:
+            yield ''.join(block).encode()
+            block, size = [], 0
+    block.append('END:VCALENDAR\r\n')
+    yield ''.join(block).encode()
+
+
+class ICSRenderer(BaseRenderer):
+    """
+    Picks the text/calendar format (?format=ics); the calendar view streams its
+    own response, so this only renders errors.
+    """
+    media_type = 'text/calendar'
+    format = 'ics'
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        data = data if isinstance(data, dict) else {'detail': data}
+        return '\r\n'.join(f'{key}: {value}' for key, value in data.items()).encode()
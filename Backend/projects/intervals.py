@@ -0,0 +1,170 @@
+"""
+Interval sets and an interval tree, for availability matching.
+
+An interval set is a sorted list of disjoint, non-touching half-open (start,
+end) pairs. The operations below walk two sets in one sweep, so combining sets
+of n and m intervals costs O(n + m). Endpoints may be anything ordered: minutes
+of the week for weekly availability, datetimes for a concrete calendar window.
+
+IntervalTree answers "which intervals overlap [start, end)" over a large,
+static collection (every user's weekly availability) in O(log n + k) for k
+hits. It is an augmented binary search tree laid out implicitly in arrays
+sorted by start, so it costs four flat lists rather than a node object per
+interval.
+"""
+
+
+def normalize(pairs):
+    """
+    The interval set covering the given (start, end) pairs: sorted, with
+    overlapping and touching pairs merged and empty ones dropped.
+    """
+    merged = []
+    for start, end in sorted(pairs):
+        if end <= start:
+            continue
+        if merged and start <= merged[-1][1]:
+            if end > merged[-1][1]:
+                merged[-1] = (merged[-1][0], end)
+        else:
+            merged.append((start, end))
+    return merged
+
+
+def intersect(a, b):
+    """
+    The intervals covered by both sets.
+    """
+    result = []
+    i = j = 0
+    while i < len(a) and j < len(b):
+        start = max(a[i][0], b[j][0])
+        end = min(a[i][1], b[j][1])
+        if start < end:
+            result.append((start, end))
+        # Advance whichever interval finishes first
+        if a[i][1] < b[j][1]:
+            i += 1
+        else:
+            j += 1
+    return result
+
+
+def subtract(a, b):
+    """
+    The intervals of 'a' not covered by 'b'.
+    """
+    result = []
+    j = 0
+    for start, end in a:
+        while j < len(b) and b[j][1] <= start:
+            j += 1
+        k = j
+        while k < len(b) and b[k][0] < end:
+            if b[k][0] > start:
+                result.append((start, b[k][0]))
+            start = max(start, b[k][1])
+            k += 1
+        if start < end:
+            result.append((start, end))
+    return result
+
+
+def overlap(a, b):
+    """
+    The total length both sets cover, without building the intersection.
+    """
+    total = 0
+    i = j = 0
+    while i < len(a) and j < len(b):
+        start = max(a[i][0], b[j][0])
+        end = min(a[i][1], b[j][1])
+        if start < end:
+            total += end - start
+        if a[i][1] < b[j][1]:
+            i += 1
+        else:
+            j += 1
+    return total
+
+
+def at_least(intervals, length):
+    return [(start, end) for start, end in intervals if end - start >= length]
+
+
+# --- Storage ---
+
+def flatten(intervals):
+    """
+    [(s0, e0), (s1, e1)] -> [s0, e0, s1, e1], the stored form.
+    """
+    return [value for interval in intervals for value in interval]
+
+
+def unflatten(values):
+    return list(zip(values[0::2], values[1::2]))
+
+
+# --- Interval tree ---
+
+class IntervalTree:
+    """
+    A static interval tree over (start, end, value) entries.
+
+    Entries are sorted by start and the tree is implicit: the root of the range
+    [lo, hi) is its middle entry, the subtrees are the halves either side.
+    max_end[mid] holds the largest end in the range mid is the root of, so a
+    query skips any subtree that ends before the query starts, and the right
+    subtree of any entry starting after the query ends.
+    """
+    def __init__(self, entries):
+        entries = sorted(entries, key=lambda entry: (entry[0], entry[1]))
+        self.starts = [entry[0] for entry in entries]
+        self.ends = [entry[1] for entry in entries]
+        self.values = [entry[2] for entry in entries]
+        self.max_end = list(self.ends)
+        self._augment(0, len(entries))
+
+    def __len__(self):
+        return len(self.starts)
+
+    def _augment(self, lo, hi):
+        # Post-order over the implicit tree, so both subtrees are done before their root
+        stack = [(lo, hi, False)]
+        while stack:
+            lo, hi, done = stack.pop()
+            if lo >= hi:
+                continue
+            mid = (lo + hi) // 2
+            if not done:
+                stack.append((lo, hi, True))
+                stack.append((lo, mid, False))
+                stack.append((mid + 1, hi, False))
+                continue
+            best = self.ends[mid]
+            if lo < mid:
+                best = max(best, self.max_end[(lo + mid) // 2])
+            if mid + 1 < hi:
+                best = max(best, self.max_end[(mid + 1 + hi) // 2])
+            self.max_end[mid] = best
+
+    def overlapping(self, start, end):
+        """
+        Yields (start, end, value) for every entry overlapping [start, end).
+        """
+        starts, ends, values, max_end = self.starts, self.ends, self.values, self.max_end
+        stack = [(0, len(starts))]
+        while stack:
+            lo, hi = stack.pop()
+            if lo >= hi:
+                continue
+            mid = (lo + hi) // 2
+            if max_end[mid] <= start:
+                # Everything under mid ends before the query starts
+                continue
+            stack.append((lo, mid))
+            if starts[mid] < end:
+                if ends[mid] > start:
+                    yield starts[mid], ends[mid], values[mid]
+                # Entries right of mid start later still, so only if mid starts in time
+                stack.append((mid + 1, hi))
@@ -0,0 +1,114 @@
+import datetime
+import json
+import random
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core.management.commands.loadtest import percentile
+from projects import scheduling
+from projects.intervals import intersect, normalize, overlap
+
+ZONES = ('UTC', 'Europe/London', 'Europe/Berlin', 'Asia/Karachi', 'Asia/Kolkata', 'Asia/Tokyo',
+         'America/New_York', 'America/Los_Angeles', 'Australia/Sydney')
+
+
+def synthetic_week(rng):
+    """
+    A plausible week: three to eight free periods of one to three hours,
+    starting on the half hour between 07:00 and 21:00 local time.
+    """
+    slots = []
+    for _ in range(rng.randint(3, 8)):
+        start = rng.randrange(7) * scheduling.MINUTES_PER_DAY + rng.randrange(14, 42) * 30
+        slots.append((start, start + rng.choice((60, 90, 120, 180))))
+    return normalize(slots)
+
+
+class Command(BaseCommand):
+    help = (
+        "Measures availability matching on synthetic weekly availability: builds the "
+        "AvailabilityIndex for --users users with each engine (NumPy sweep, interval tree), "
+        "times 'whose week overlaps mine the most' queries against a linear scan of every "
+        "user, and times the two-week free-slot computation for a pair of users. Nothing is "
+        "written to the database."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=100_000, help="Synthetic users.")
+        parser.add_argument('--queries', type=int, default=500, help="Timed index queries.")
+        parser.add_argument('--scans', type=int, default=20, help="Timed linear-scan queries, for comparison.")
+        parser.add_argument('--seed', type=int, default=1)
+        parser.add_argument('--output', help="Write the JSON report to this file instead of stdout.")
+
+    def handle(self, *args, **options):
+        if options['users'] < 2:
+            raise CommandError("--users must be at least 2.")
+        rng = random.Random(options['seed'])
+        at = datetime.datetime(2026, 1, 15, tzinfo=datetime.timezone.utc)
+        local = {user_id: (synthetic_week(rng), rng.choice(ZONES)) for user_id in range(1, options['users'] + 1)}
+
+        started = time.perf_counter()
+        weeks = {user_id: scheduling.to_utc_week(intervals, zone, at) for user_id, (intervals, zone) in local.items()}
+        convert_seconds = time.perf_counter() - started
+        user_ids = list(weeks)
+        queries = [rng.choice(user_ids) for _ in range(options['queries'])]
+
+        engines = {}
+        expected = {}
+        for name, vectorized in (('sweep', True), ('tree', False)):
+            if vectorized and scheduling.np is None:
+                continue
+            started = time.perf_counter()
+            index = scheduling.AvailabilityIndex(weeks, vectorized=vectorized)
+            build_seconds = time.perf_counter() - started
+            self.stderr.write(f"  {name}: {index.size} intervals for {len(index)} users in {build_seconds:.2f}s")
+            timings = []
+            for user_id in queries:
+                started = time.perf_counter()
+                best = index.candidates(user_id, min_minutes=60)
+                timings.append((time.perf_counter() - started) * 1000)
+                if expected.setdefault(user_id, best) != best:
+                    raise CommandError("The index engines disagree.")
+            timings.sort()
+            engines[name] = {
+                'build_seconds': round(build_seconds, 3),
+                'query_ms': {'p50': round(percentile(timings, 0.5), 3), 'p99': round(percentile(timings, 0.99), 3)},
+            }
+
+        scan_ms = []
+        for user_id in queries[:options['scans']]:
+            started = time.perf_counter()
+            scores = [(other_id, overlap(weeks[user_id], week)) for other_id, week in weeks.items() if other_id != user_id]
+            scanned = sorted(((other_id, minutes) for other_id, minutes in scores if minutes >= 60), key=lambda p: (-p[1], p[0]))[:20]
+            scan_ms.append((time.perf_counter() - started) * 1000)
+            if scanned != expected[user_id]:
+                raise CommandError("The index and the linear scan disagree.")
+        scan_ms.sort()
+        engines['scan'] = {'query_ms': {'p50': round(percentile(scan_ms, 0.5), 3), 'p99': round(percentile(scan_ms, 0.99), 3)}}
+
+        # Free slots for a pair over two weeks, as free_slots() computes them once loaded
+        window_start = at
+        window_end = at + datetime.timedelta(days=14)
+        pair_ms = []
+        for _ in range(options['queries']):
+            (a, zone_a), (b, zone_b) = local[rng.choice(user_ids)], local[rng.choice(user_ids)]
+            started = time.perf_counter()
+            intersect(scheduling.expand(a, zone_a, window_start, window_end), scheduling.expand(b, zone_b, window_start, window_end))
+            pair_ms.append((time.perf_counter() - started) * 1000)
+
+        pair_ms.sort()
+        report = {
+            'users': len(weeks),
+            'intervals': sum(len(week) for week in weeks.values()),
+            'utc_conversion_seconds': round(convert_seconds, 3),
+            'candidates': engines,
+            'free_slots_14_days_ms': {'p50': round(percentile(pair_ms, 0.5), 3), 'p99': round(percentile(pair_ms, 0.99), 3)},
+        }
+
+        output = json.dumps(report, indent=2)
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                f.write(output + '\n')
+        else:
+            self.stdout.write(output)
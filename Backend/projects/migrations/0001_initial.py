@@ -0,0 +1,50 @@
+# Generated by Django 5.2.18 on 2026-10-18 05:07
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('core', '0013_chat'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Availability',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('timezone', models.CharField(default='UTC', max_length=64)),
+                ('weekly', models.JSONField(default=list)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='availability', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name_plural': 'Availability',
+            },
+        ),
+        migrations.CreateModel(
+            name='Session',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('starts_at', models.DateTimeField()),
+                ('ends_at', models.DateTimeField()),
+                ('status', models.PositiveSmallIntegerField(choices=[(0, 'proposed'), (1, 'accepted'), (2, 'declined'), (3, 'cancelled'), (4, 'completed')], default=0)),
+                ('note', models.TextField(blank=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('invitee', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='invited_sessions', to=settings.AUTH_USER_MODEL)),
+                ('proposer', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='proposed_sessions', to=settings.AUTH_USER_MODEL)),
+                ('skill', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='core.skill')),
+            ],
+            options={
+                'ordering': ['starts_at', 'id'],
+                'indexes': [models.Index(fields=['proposer', 'starts_at'], name='session_proposer_idx'), models.Index(fields=['invitee', 'starts_at'], name='session_invitee_idx')],
+                'constraints': [models.CheckConstraint(condition=models.Q(('ends_at__gt', models.F('starts_at'))), name='session_ends_after_start'), models.CheckConstraint(condition=models.Q(('proposer', models.F('invitee')), _negated=True), name='session_not_self')],
+            },
+        ),
+    ]
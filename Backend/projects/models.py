@@ -1,3 +1,67 @@
 from django.db import models
+from django.contrib.auth.models import User
 
-# Create your models here.
+from core.models import Skill
+
+
+class Availability(models.Model):
+    """
+    When a user is generally free: a weekly recurring interval set in their own
+    time zone, stored compactly as a flat sorted list of [start, end) minutes of
+    the week (Monday 00:00 is 0), e.g. [540, 720, 1980, 2160] for Monday and
+    Tuesday 9:00-12:00. See projects.scheduling.
+    """
+    user = models.OneToOneField(User, on_delete=models.CASCADE, related_name='availability')
+    timezone = models.CharField(max_length=64, default='UTC')
+    weekly = models.JSONField(default=list)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name_plural = "Availability"
+
+    def __str__(self):
+        return f"Availability of {self.user.username}"
+
+
+class Session(models.Model):
+    """
+    A skill-exchange session proposed by one user to another, through its
+    lifecycle: proposed -> accepted -> completed, or declined / cancelled.
+    Accepted sessions take their time out of both users' free slots.
+    """
+    PROPOSED = 0
+    ACCEPTED = 1
+    DECLINED = 2
+    CANCELLED = 3
+    COMPLETED = 4
+    STATUS_CHOICES = (
+        (PROPOSED, 'proposed'), (ACCEPTED, 'accepted'), (DECLINED, 'declined'),
+        (CANCELLED, 'cancelled'), (COMPLETED, 'completed'),
+    )
+
+    proposer = models.ForeignKey(User, related_name='proposed_sessions', on_delete=models.CASCADE)
+    invitee = models.ForeignKey(User, related_name='invited_sessions', on_delete=models.CASCADE)
+    skill = models.ForeignKey(Skill, null=True, blank=True, related_name='+', on_delete=models.SET_NULL)
+    starts_at = models.DateTimeField()
+    ends_at = models.DateTimeField()
+    status = models.PositiveSmallIntegerField(choices=STATUS_CHOICES, default=PROPOSED)
+    note = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['starts_at', 'id']
+        constraints = [
+            models.CheckConstraint(condition=models.Q(ends_at__gt=models.F('starts_at')), name='session_ends_after_start'),
+            models.CheckConstraint(condition=~models.Q(proposer=models.F('invitee')), name='session_not_self'),
+        ]
+        indexes = [
+            # Each participant's calendar, by time
+            models.Index(fields=['proposer', 'starts_at'], name='session_proposer_idx'),
+            models.Index(fields=['invitee', 'starts_at'], name='session_invitee_idx'),
+        ]
+
+    def other(self, user_id):
+        return self.invitee if self.proposer_id == user_id else self.proposer
+
+    def __str__(self):
+        return f"{self.proposer.username} - {self.invitee.username} at {self.starts_at:%Y-%m-%d %H:%M} ({self.get_status_display()})"
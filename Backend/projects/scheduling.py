@@ -0,0 +1,324 @@
+"""
+Session scheduling: weekly availability, free slots and availability matching.
+
+Availability is a weekly recurring interval set in the user's own time zone
+(projects.models.Availability). Two questions are answered from it:
+
+* free_slots(): when can these two users meet in the next days? Each user's
+  weekly intervals are expanded into concrete UTC times for the window, wall
+  clock by wall clock so DST changes land where they should, their accepted
+  sessions are subtracted, and the two sets are intersected. Each step is a
+  linear sweep over sorted intervals (projects.intervals).
+
+* candidates(): whose week overlaps mine the most? Answered by an in-process
+  AvailabilityIndex of every user's week shifted to UTC minutes of the week.
+  A query binary-searches to the intervals overlapping each interval of the
+  asking user and scores only those, never the whole user base: with NumPy
+  as one array slice per interval, otherwise through a static IntervalTree.
+  Candidate lists that are already short, such as the user's precomputed
+  skill matches (core.matching), are scored pairwise.
+
+The index is built lazily on first use. Availability edits since the build are
+kept beside it (see AvailabilityIndex.update, called from projects.signals)
+and it is rebuilt once they pile up or it gets old, as the UTC offsets it was
+built with drift across DST changes.
+"""
+import datetime
+import heapq
+import threading
+import time
+from collections import defaultdict
+from zoneinfo import ZoneInfo
+
+from django.conf import settings
+from django.db.models import Q
+
+from core.models import SkillMatch
+
+from .intervals import IntervalTree, at_least, intersect, normalize, overlap, subtract, unflatten
+from .models import Availability, Session
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - depends on the environment
+    np = None
+
+MINUTES_PER_DAY = 24 * 60
+MINUTES_PER_WEEK = 7 * MINUTES_PER_DAY
+
+# --- Tunables (override in settings.py) ---
+
+# Longest window free_slots() expands
+MAX_WINDOW_DAYS = getattr(settings, 'SCHEDULING_MAX_WINDOW_DAYS', 60)
+
+# Seconds before the index is rebuilt with current UTC offsets
+INDEX_MAX_AGE = getattr(settings, 'SCHEDULING_INDEX_MAX_AGE', 6 * 3600)
+
+# Availability edits kept beside the tree before it is rebuilt
+INDEX_MAX_CHANGES = getattr(settings, 'SCHEDULING_INDEX_MAX_CHANGES', 1000)
+
+# Candidate lists up to this long are scored pairwise instead of through the tree
+PAIRWISE_LIMIT = 500
+
+# Longest piece of a week interval in the vectorized index
+PIECE_MINUTES = 240
+
+CHUNK_SIZE = 5000
+
+
+# --- Weekly availability ---
+
+def weekly_intervals(values):
+    return normalize(unflatten(values))
+
+
+def to_utc_week(intervals, tz_name, at=None):
+    """
+    Shifts local minute-of-week intervals to UTC minutes of the week, with the
+    zone's offset at 'at' (default now). Intervals pushed across the end of
+    the week wrap around to its start.
+    """
+    at = at or datetime.datetime.now(datetime.timezone.utc)
+    offset = int(at.astimezone(ZoneInfo(tz_name)).utcoffset().total_seconds() // 60)
+    shifted = []
+    for start, end in intervals:
+        start, end = start - offset, end - offset
+        wrap = (start // MINUTES_PER_WEEK) * MINUTES_PER_WEEK
+        start, end = start - wrap, end - wrap
+        if end > MINUTES_PER_WEEK:
+            shifted.append((start, MINUTES_PER_WEEK))
+            shifted.append((0, end - MINUTES_PER_WEEK))
+        else:
+            shifted.append((start, end))
+    return normalize(shifted)
+
+
+def expand(intervals, tz_name, start, end):
+    """
+    The weekly intervals as concrete, UTC datetime intervals within [start, end).
+    """
+    tz = ZoneInfo(tz_name)
+    local = start.astimezone(tz)
+    # Wall-clock midnight of the Monday starting the first week
+    week = datetime.datetime.combine(local.date() - datetime.timedelta(days=local.weekday()), datetime.time.min)
+    result = []
+    while week.replace(tzinfo=tz) < end:
+        for first, last in intervals:
+            slot_start = (week + datetime.timedelta(minutes=first)).replace(tzinfo=tz).astimezone(datetime.timezone.utc)
+            slot_end = (week + datetime.timedelta(minutes=last)).replace(tzinfo=tz).astimezone(datetime.timezone.utc)
+            result.append((max(slot_start, start), min(slot_end, end)))
+        week += datetime.timedelta(days=7)
+    return normalize(result)
+
+
+def busy(user_ids, start, end):
+    """
+    {user id: interval set} of the accepted sessions overlapping [start, end).
+    """
+    sessions = Session.objects.filter(
+        Q(proposer_id__in=user_ids) | Q(invitee_id__in=user_ids),
+        status=Session.ACCEPTED, starts_at__lt=end, ends_at__gt=start,
+    ).order_by().values_list('proposer_id', 'invitee_id', 'starts_at', 'ends_at')
+    taken = defaultdict(list)
+    for proposer_id, invitee_id, starts_at, ends_at in sessions:
+        taken[proposer_id].append((starts_at, ends_at))
+        taken[invitee_id].append((starts_at, ends_at))
+    return {user_id: normalize(taken[user_id]) for user_id in user_ids}
+
+
+def free_slots(user_id, other_id, start, end, min_minutes=30):
+    """
+    The times in [start, end) when both users are available and have no
+    accepted session, as (start, end) UTC datetimes at least min_minutes long.
+    """
+    end = min(end, start + datetime.timedelta(days=MAX_WINDOW_DAYS))
+    availability = {
+        row['user_id']: row
+        for row in Availability.objects.filter(user_id__in=(user_id, other_id)).values('user_id', 'timezone', 'weekly')
+    }
+    if len(availability) < 2:
+        return []
+    taken = busy((user_id, other_id), start, end)
+    free = [
+        subtract(expand(weekly_intervals(row['weekly']), row['timezone'], start, end), taken[row['user_id']])
+        for row in availability.values()
+    ]
+    return at_least(intersect(*free), datetime.timedelta(minutes=min_minutes))
+
+
+def conflicts(session):
+    """
+    Whether either participant already has an accepted session overlapping this one.
+    """
+    users = (session.proposer_id, session.invitee_id)
+    return Session.objects.filter(
+        Q(proposer_id__in=users) | Q(invitee_id__in=users),
+        status=Session.ACCEPTED, starts_at__lt=session.ends_at, ends_at__gt=session.starts_at,
+    ).exclude(pk=session.pk).exists()
+
+
+# --- Availability index ---
+
+class AvailabilityIndex:
+    """
+    Every user's week in UTC minutes, plus the edits made since it was built.
+
+    With NumPy, the weeks are cut into pieces of at most PIECE_MINUTES and kept
+    as arrays sorted by start. Every piece overlapping [start, end) then starts
+    within (start - PIECE_MINUTES, end), one contiguous slice found by binary
+    search, and the slice is scored in a single vectorized pass. Without NumPy
+    they go into an IntervalTree and the hits are scored one by one.
+    """
+    def __init__(self, weeks, vectorized=None):
+        self.weeks = weeks   # user id -> interval set
+        self.changes = {}
+        self.built_at = time.monotonic()
+        entries = [(start, end, user_id) for user_id, intervals in weeks.items() for start, end in intervals]
+        self.size = len(entries)
+        self.vectorized = np is not None if vectorized is None else vectorized
+        if self.vectorized:
+            self._build_arrays(entries)
+        else:
+            self.tree = IntervalTree(entries)
+
+    @classmethod
+    def from_database(cls, at=None):
+        rows = Availability.objects.order_by().values_list('user_id', 'timezone', 'weekly').iterator(chunk_size=CHUNK_SIZE)
+        return cls({user_id: to_utc_week(weekly_intervals(weekly), tz_name, at) for user_id, tz_name, weekly in rows})
+
+    def _build_arrays(self, entries):
+        self.user_ids = np.fromiter(self.weeks, dtype=np.int64, count=len(self.weeks))
+        self.position = {user_id: i for i, user_id in enumerate(self.weeks)}
+        pieces = sorted(
+            (piece, min(piece + PIECE_MINUTES, end), self.position[user_id])
+            for start, end, user_id in entries
+            for piece in range(start, end, PIECE_MINUTES)
+        )
+        columns = np.array(pieces, dtype=np.int64).reshape(-1, 3)
+        self.starts, self.ends, self.owners = (np.ascontiguousarray(column) for column in columns.T)
+
+    def __len__(self):
+        return len(self.weeks) + sum(1 for user_id in list(self.changes) if user_id not in self.weeks)
+
+    @property
+    def stale(self):
+        return len(self.changes) > INDEX_MAX_CHANGES or time.monotonic() - self.built_at > INDEX_MAX_AGE
+
+    def week(self, user_id):
+        if user_id in self.changes:
+            return self.changes[user_id]
+        return self.weeks.get(user_id, [])
+
+    def update(self, user_id, intervals):
+        """
+        Records a user's new UTC week; an empty one for a user who removed theirs.
+        """
+        self.changes[user_id] = intervals
+
+    def _sweep(self, mine, changes, among, min_minutes, limit):
+        owners, minutes = [], []
+        for start, end in mine:
+            lo = np.searchsorted(self.starts, start - PIECE_MINUTES, side='right')
+            hi = np.searchsorted(self.starts, end, side='left')
+            shared = np.minimum(self.ends[lo:hi], end) - np.maximum(self.starts[lo:hi], start)
+            hit = shared > 0
+            owners.append(self.owners[lo:hi][hit])
+            minutes.append(shared[hit])
+        if not owners:
+            return {}
+        totals = np.bincount(np.concatenate(owners), weights=np.concatenate(minutes), minlength=len(self.user_ids)).astype(np.int64)
+        # Edited weeks are scored from their current intervals instead
+        totals[[self.position[user_id] for user_id in changes if user_id in self.position]] = 0
+        if among is not None:
+            keep = np.zeros(len(totals), dtype=bool)
+            keep[[self.position[user_id] for user_id in among if user_id in self.position]] = True
+            totals[~keep] = 0
+        eligible = np.flatnonzero(totals >= min_minutes)
+        if len(eligible) > limit:
+            # Everything tied with the limit-th best, so ties break by user id below
+            threshold = np.partition(totals[eligible], -limit)[-limit]
+            eligible = eligible[totals[eligible] >= threshold]
+        return dict(zip(self.user_ids[eligible].tolist(), totals[eligible].tolist()))
+
+    def _walk(self, mine, changes, among):
+        scores = defaultdict(int)
+        for start, end in mine:
+            for other_start, other_end, other_id in self.tree.overlapping(start, end):
+                # Both weeks are disjoint interval sets, so the pieces add up
+                scores[other_id] += min(end, other_end) - max(start, other_start)
+        for other_id in changes:
+            scores.pop(other_id, None)
+        if among is not None:
+            scores = {other_id: minutes for other_id, minutes in scores.items() if other_id in among}
+        return scores
+
+    def candidates(self, user_id, among=None, min_minutes=1, limit=20):
+        """
+        [(user id, minutes a week in common)] for the users whose week overlaps
+        the given user's the most, optionally only those in 'among'.
+        """
+        mine = self.week(user_id)
+        min_minutes = max(min_minutes, 1)
+        if among is not None and len(among) <= PAIRWISE_LIMIT:
+            scores = {other_id: overlap(mine, self.week(other_id)) for other_id in among}
+        else:
+            among = None if among is None else set(among)
+            # Signal handlers add changes from other threads (after commit): work from one snapshot
+            changes = dict(self.changes)
+            if self.vectorized:
+                # One extra slot so dropping the user themselves still leaves 'limit'
+                scores = self._sweep(mine, changes, among, min_minutes, limit + 1)
+            else:
+                scores = self._walk(mine, changes, among)
+            for other_id, intervals in changes.items():
+                if among is None or other_id in among:
+                    scores[other_id] = overlap(mine, intervals)
+        scores.pop(user_id, None)
+        best = heapq.nsmallest(
+            limit,
+            ((-minutes, other_id) for other_id, minutes in scores.items() if minutes >= min_minutes),
+        )
+        return [(other_id, -minutes) for minutes, other_id in best]
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_index():
+    """
+    The availability index, built on first use and rebuilt once stale.
+    """
+    global _index
+    if _index is None or _index.stale:
+        with _index_lock:
+            if _index is None or _index.stale:
+                _index = AvailabilityIndex.from_database()
+    return _index
+
+
+def loaded_index():
+    """
+    The index if it has been built, else None (see core.skill_search.loaded_index).
+    """
+    return _index
+
+
+def reset():
+    """
+    Drops the index so the next query rebuilds it (used by tests).
+    """
+    global _index
+    with _index_lock:
+        _index = None
+
+
+def candidates(user, source='all', min_minutes=60, limit=20):
+    """
+    People whose weekly availability overlaps the user's the most. 'matches'
+    considers only the user's skill matches (core.matching), 'all' everyone.
+    """
+    among = None
+    if source == 'matches':
+        among = list(SkillMatch.objects.filter(user=user).values_list('candidate_id', flat=True))
+    return get_index().candidates(user.pk, among=among, min_minutes=min_minutes, limit=limit)
@@ -0,0 +1,132 @@
+import datetime
+import re
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+from django.utils import timezone
+from rest_framework import serializers
+
+from core.query_plans import QueryPlan
+from core.serializers import SkillSerializer, UserSerializer
+
+from .intervals import flatten, normalize, unflatten
+from .models import Session
+from .scheduling import MINUTES_PER_DAY
+
+TIME_RE = re.compile(r'^([01]\d|2[0-4]):([0-5]\d)$')
+
+DAYS = ('monday', 'tuesday', 'wednesday', 'thursday', 'friday', 'saturday', 'sunday')
+
+# Longest session that can be proposed
+MAX_SESSION_HOURS = 8
+
+
+def parse_time(value):
+    match = TIME_RE.match(value)
+    minutes = int(match.group(1)) * 60 + int(match.group(2)) if match else None
+    if minutes is None or minutes > MINUTES_PER_DAY:
+        raise serializers.ValidationError("Times are HH:MM, from 00:00 to 24:00.")
+    return minutes
+
+
+def format_time(minutes):
+    return f'{minutes // 60:02d}:{minutes % 60:02d}'
+
+
+class WeeklySlotSerializer(serializers.Serializer):
+    """
+    One day's free period: {"day": "monday", "start": "09:00", "end": "12:30"}.
+    """
+    day = serializers.ChoiceField(choices=DAYS)
+    start = serializers.CharField()
+    end = serializers.CharField()
+
+    def validate(self, data):
+        start, end = parse_time(data['start']), parse_time(data['end'])
+        if end <= start:
+            raise serializers.ValidationError("A slot must end after it starts.")
+        offset = DAYS.index(data['day']) * MINUTES_PER_DAY
+        return (offset + start, offset + end)
+
+
+class AvailabilitySerializer(serializers.Serializer):
+    """
+    A user's weekly availability, as day-by-day slots in their time zone. It
+    is stored as one flat interval set (see projects.models.Availability), so
+    overlapping slots are merged and periods running past midnight are listed
+    as one slot per day.
+    """
+    timezone = serializers.CharField(max_length=64)
+    weekly = WeeklySlotSerializer(many=True, allow_empty=True)
+
+    def validate_timezone(self, value):
+        try:
+            ZoneInfo(value)
+        except (ZoneInfoNotFoundError, ValueError):
+            raise serializers.ValidationError("Unknown time zone.")
+        return value
+
+    def validate_weekly(self, value):
+        return flatten(normalize(value))
+
+    def to_representation(self, instance):
+        slots = []
+        for start, end in unflatten(instance.weekly):
+            # Split at midnight so each slot names one day
+            while start < end:
+                day, offset = divmod(start, MINUTES_PER_DAY)
+                until = min(end, (day + 1) * MINUTES_PER_DAY)
+                slots.append({'day': DAYS[day], 'start': format_time(offset), 'end': format_time(until - day * MINUTES_PER_DAY)})
+                start = until
+        return {'timezone': instance.timezone, 'weekly': slots}
+
+
+class SessionSerializer(serializers.ModelSerializer):
+    """
+    Serializer for a session as seen by one of its two users: 'user' is the
+    other person and 'role' says which side of the proposal the viewer is on.
+    """
+    user = serializers.SerializerMethodField()
+    role = serializers.SerializerMethodField()
+    skill = SkillSerializer(read_only=True)
+    status = serializers.CharField(source='get_status_display', read_only=True)
+
+    query_plan = (
+        QueryPlan(only=('id', 'starts_at', 'ends_at', 'status', 'note', 'created_at'))
+        + UserSerializer.query_plan.nested('proposer')
+        + UserSerializer.query_plan.nested('invitee')
+        + SkillSerializer.query_plan.nested('skill')
+    )
+
+    class Meta:
+        model = Session
+        fields = ('id', 'user', 'role', 'skill', 'starts_at', 'ends_at', 'status', 'note', 'created_at')
+
+    def _viewer_id(self):
+        return self.context['request'].user.pk
+
+    def get_user(self, obj):
+        return UserSerializer(obj.other(self._viewer_id())).data
+
+    def get_role(self, obj):
+        return 'proposer' if obj.proposer_id == self._viewer_id() else 'invitee'
+
+
+class SessionProposalSerializer(serializers.Serializer):
+    """
+    Input for proposing a session:
+    {"username": "...", "starts_at": "...", "ends_at": "...", "skill_id": 3, "note": "..."}.
+    """
+    username = serializers.CharField()
+    starts_at = serializers.DateTimeField()
+    ends_at = serializers.DateTimeField()
+    skill_id = serializers.IntegerField(required=False, allow_null=True)
+    note = serializers.CharField(required=False, allow_blank=True, max_length=2000)
+
+    def validate(self, data):
+        if data['ends_at'] <= data['starts_at']:
+            raise serializers.ValidationError({"ends_at": ["A session must end after it starts."]})
+        if data['starts_at'] <= timezone.now():
+            raise serializers.ValidationError({"starts_at": ["Sessions can only be proposed for the future."]})
+        if data['ends_at'] - data['starts_at'] > datetime.timedelta(hours=MAX_SESSION_HOURS):
+            raise serializers.ValidationError({"ends_at": [f"Sessions last at most {MAX_SESSION_HOURS} hours."]})
+        return data
@@ -0,0 +1,21 @@
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from . import scheduling
+from .models import Availability
+
+
+@receiver(post_save, sender=Availability)
+def availability_saved(sender, instance, **kwargs):
+    index = scheduling.loaded_index()
+    if index is not None:
+        week = scheduling.to_utc_week(scheduling.weekly_intervals(instance.weekly), instance.timezone)
+        transaction.on_commit(lambda: index.update(instance.user_id, week))
+
+
+@receiver(post_delete, sender=Availability)
+def availability_deleted(sender, instance, **kwargs):
+    index = scheduling.loaded_index()
+    if index is not None:
+        transaction.on_commit(lambda: index.update(instance.user_id, []))
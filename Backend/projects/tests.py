@@ -1,3 +1,282 @@
+import datetime
+import random
+from io import StringIO
+from unittest import mock
+
+from asgiref.sync import async_to_sync
+from django.contrib.auth.models import User
+from django.core.management import call_command
 from django.test import TestCase
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from core.models import Skill, SkillMatch
+
+from . import calendar, intervals, scheduling, views
+from .models import Availability, Session
+
+
+def make_user(username):
+    return User.objects.create(username=username)
+
+
+def utc(*args):
+    return datetime.datetime(*args, tzinfo=datetime.timezone.utc)
+
+
+# --- Interval sets ---
+
+class IntervalTests(TestCase):
+    def test_set_operations(self):
+        a = intervals.normalize([(5, 10), (0, 3), (3, 4), (8, 12), (20, 20)])
+        self.assertEqual(a, [(0, 4), (5, 12)])
+        b = [(2, 6), (11, 30)]
+        self.assertEqual(intervals.intersect(a, b), [(2, 4), (5, 6), (11, 12)])
+        self.assertEqual(intervals.subtract(a, b), [(0, 2), (6, 11)])
+        self.assertEqual(intervals.overlap(a, b), 4)
+        self.assertEqual(intervals.unflatten(intervals.flatten(a)), a)
+
+    def test_tree_matches_a_scan(self):
+        rng = random.Random(7)
+        entries = [(start, start + rng.randint(1, 100), i) for i, start in enumerate(rng.randint(0, 1000) for _ in range(500))]
+        tree = intervals.IntervalTree(entries)
+        for _ in range(100):
+            start = rng.randint(-50, 1100)
+            end = start + rng.randint(1, 200)
+            self.assertEqual(sorted(value for _, _, value in tree.overlapping(start, end)),
+                             sorted(value for s, e, value in entries if s < end and e > start))
+
+
+# --- Availability ---
+
+class AvailabilityTests(TestCase):
+    def setUp(self):
+        scheduling.reset()
+        self.addCleanup(scheduling.reset)
+        self.alice = make_user('alice')
+        self.bob = make_user('bob')
+        self.client = APIClient()
+        self.client.force_authenticate(self.alice)
+
+    def put(self, client, tz, *slots):
+        weekly = [{'day': day, 'start': start, 'end': end} for day, start, end in slots]
+        return client.put('/api/availability/me/', {'timezone': tz, 'weekly': weekly}, format='json')
+
+    def test_weekly_slots_round_trip(self):
+        self.assertEqual(self.client.get('/api/availability/me/').data, {'timezone': 'UTC', 'weekly': []})
+        response = self.put(self.client, 'Europe/Berlin',
+                            ('tuesday', '09:00', '11:00'), ('tuesday', '10:30', '12:00'),
+                            ('sunday', '22:00', '24:00'), ('monday', '00:00', '01:00'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(Availability.objects.get(user=self.alice).weekly, [0, 60, 1980, 2160, 9960, 10080])
+        self.assertEqual(response.data['weekly'][1], {'day': 'tuesday', 'start': '09:00', 'end': '12:00'})
+
+        self.assertEqual(self.put(self.client, 'Mars/Olympus').data, {'timezone': ['Unknown time zone.']})
+        self.assertEqual(self.put(self.client, 'UTC', ('monday', '10:00', '09:00')).status_code, 400)
+        self.assertEqual(self.put(self.client, 'UTC', ('monday', '9am', '10:00')).status_code, 400)
+
+    def test_week_shifts_to_utc_and_wraps(self):
+        # Monday 00:00-02:00 in Berlin in winter is Sunday 23:00 - Monday 01:00 UTC
+        week = scheduling.to_utc_week([(0, 120)], 'Europe/Berlin', utc(2026, 1, 15))
+        self.assertEqual(week, [(0, 60), (10020, 10080)])
+        # and all of it falls on Sunday in summer time
+        self.assertEqual(scheduling.to_utc_week([(0, 120)], 'Europe/Berlin', utc(2026, 7, 15)), [(9960, 10080)])
+
+    def test_expand_follows_dst(self):
+        # 09:00-10:00 Berlin on the Mondays either side of the March 2026 change
+        slots = scheduling.expand([(540, 600)], 'Europe/Berlin', utc(2026, 3, 23), utc(2026, 4, 6))
+        self.assertEqual(slots, [(utc(2026, 3, 23, 8), utc(2026, 3, 23, 9)), (utc(2026, 3, 30, 7), utc(2026, 3, 30, 8))])
+
+    def test_free_slots_skip_accepted_sessions(self):
+        monday = utc(2026, 3, 2)
+        Availability.objects.create(user=self.alice, timezone='UTC', weekly=[540, 720])   # Monday 9-12
+        Availability.objects.create(user=self.bob, timezone='Europe/London', weekly=[600, 840])   # Monday 10-14
+        self.assertEqual(scheduling.free_slots(self.alice.pk, self.bob.pk, monday, monday + datetime.timedelta(days=7)),
+                         [(utc(2026, 3, 2, 10), utc(2026, 3, 2, 12))])
+
+        Session.objects.create(proposer=self.bob, invitee=make_user('carol'), status=Session.ACCEPTED,
+                               starts_at=utc(2026, 3, 2, 10, 45), ends_at=utc(2026, 3, 2, 11, 30))
+        Session.objects.create(proposer=self.alice, invitee=self.bob, status=Session.PROPOSED,
+                               starts_at=utc(2026, 3, 2, 10), ends_at=utc(2026, 3, 2, 10, 30))
+        self.assertEqual(scheduling.free_slots(self.alice.pk, self.bob.pk, monday, monday + datetime.timedelta(days=14)), [
+            (utc(2026, 3, 2, 10), utc(2026, 3, 2, 10, 45)),
+            (utc(2026, 3, 2, 11, 30), utc(2026, 3, 2, 12)),
+            (utc(2026, 3, 9, 10), utc(2026, 3, 9, 12)),
+        ])
+
+        response = self.client.get('/api/availability/overlap/', {'with': 'bob', 'min_minutes': 60})
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(all(slot['end'] - slot['start'] >= datetime.timedelta(minutes=60) for slot in response.data))
+        self.assertEqual(self.client.get('/api/availability/overlap/', {'with': 'nobody'}).status_code, 404)
+
+    def test_candidates(self):
+        Availability.objects.create(user=self.alice, timezone='UTC', weekly=[540, 720])
+        for name, weekly in (('close', [540, 700]), ('some', [680, 800]), ('none', [0, 60])):
+            Availability.objects.create(user=make_user(name), timezone='UTC', weekly=weekly)
+        # Tokyo is UTC+9: Monday 18:00-21:00 there is 09:00-12:00 UTC
+        Availability.objects.create(user=make_user('tokyo'), timezone='Asia/Tokyo', weekly=[1080, 1260])
+
+        response = self.client.get('/api/availability/candidates/')
+        self.assertEqual([(u['username'], u['minutes_per_week']) for u in response.data], [('tokyo', 180), ('close', 160)])
+        response = self.client.get('/api/availability/candidates/', {'min_minutes': 1})
+        self.assertEqual([u['username'] for u in response.data], ['tokyo', 'close', 'some'])
+
+        # The index follows edits without a rebuild
+        with self.captureOnCommitCallbacks(execute=True):
+            Availability.objects.filter(user__username='tokyo').delete()
+            Availability.objects.filter(user__username='some').get().save()
+            self.put(self.client, 'UTC', ('monday', '11:00', '13:00'))
+        response = self.client.get('/api/availability/candidates/', {'min_minutes': 1})
+        self.assertEqual([(u['username'], u['minutes_per_week']) for u in response.data], [('some', 100), ('close', 40)])
+
+        SkillMatch.objects.create(user=self.alice, candidate=User.objects.get(username='close'), rank=1, score=1.0)
+        response = self.client.get('/api/availability/candidates/', {'source': 'matches', 'min_minutes': 1})
+        self.assertEqual([u['username'] for u in response.data], ['close'])
+
+    def test_engines_agree(self):
+        rng = random.Random(3)
+        weeks = {
+            user_id: intervals.normalize((start, start + rng.choice((60, 90, 300))) for start in
+                                         (rng.randrange(0, scheduling.MINUTES_PER_WEEK - 300, 30) for _ in range(4)))
+            for user_id in range(1, 300)
+        }
+        sweep = scheduling.AvailabilityIndex(weeks, vectorized=True)
+        tree = scheduling.AvailabilityIndex(weeks, vectorized=False)
+        for index in (sweep, tree):
+            index.update(5, [(0, scheduling.MINUTES_PER_WEEK)])
+        for user_id in range(1, 300, 7):
+            expected = sorted(
+                ((other_id, intervals.overlap(sweep.week(user_id), sweep.week(other_id))) for other_id in weeks if other_id != user_id),
+                key=lambda pair: (-pair[1], pair[0]),
+            )
+            expected = [pair for pair in expected if pair[1] >= 30][:10]
+            self.assertEqual(sweep.candidates(user_id, min_minutes=30, limit=10), expected)
+            self.assertEqual(tree.candidates(user_id, min_minutes=30, limit=10), expected)
+            among = set(range(1, 300, 2))
+            self.assertEqual(sweep.candidates(user_id, among=among, min_minutes=30, limit=10),
+                             tree.candidates(user_id, among=among, min_minutes=30, limit=10))
+
+    def test_benchmark_runs(self):
+        out = StringIO()
+        call_command('bench_availability', users=200, queries=5, scans=2, stdout=out, stderr=StringIO())
+        self.assertIn('"sweep"', out.getvalue())
+
+
+# --- Sessions ---
+
+class SessionTests(TestCase):
+    def setUp(self):
+        self.alice = make_user('alice')
+        self.bob = make_user('bob')
+        self.client = APIClient()
+        self.client.force_authenticate(self.alice)
+        self.bob_client = APIClient()
+        self.bob_client.force_authenticate(self.bob)
+        self.start = (timezone.now() + datetime.timedelta(days=2)).replace(microsecond=0)
+
+    def propose(self, client=None, username='bob', hours=1, offset=0, **extra):
+        starts_at = self.start + datetime.timedelta(hours=offset)
+        return (client or self.client).post('/api/sessions/', {
+            'username': username, 'starts_at': starts_at.isoformat(),
+            'ends_at': (starts_at + datetime.timedelta(hours=hours)).isoformat(), **extra,
+        }, format='json')
+
+    def test_lifecycle(self):
+        python = Skill.objects.create(name='Python')
+        response = self.propose(skill_id=python.pk, note='Decorators')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual((response.data['user']['username'], response.data['role'], response.data['status'], response.data['skill']['name']),
+                         ('bob', 'proposer', 'proposed', 'Python'))
+        url = f"/api/sessions/{response.data['id']}/"
+
+        self.assertEqual(self.client.post(url + 'accept/').status_code, 403)
+        response = self.bob_client.post(url + 'accept/')
+        self.assertEqual((response.data['status'], response.data['role']), ('accepted', 'invitee'))
+        self.assertEqual(self.bob_client.post(url + 'decline/').status_code, 409)
+        self.assertEqual(self.client.post(url + 'complete/').data, {'detail': 'The session has not ended yet.'})
+        self.assertEqual(self.client.post(url + 'cancel/').data['status'], 'cancelled')
+
+        self.assertEqual([s['status'] for s in self.client.get('/api/sessions/', {'status': 'cancelled'}).data['results']], ['cancelled'])
+        self.assertEqual(self.client.get('/api/sessions/', {'status': 'accepted'}).data['results'], [])
+        outsider = APIClient()
+        outsider.force_authenticate(make_user('mallory'))
+        self.assertEqual(outsider.get(url).status_code, 404)
+
+    def test_validation(self):
+        self.assertEqual(self.propose(username='alice').status_code, 400)
+        self.assertEqual(self.propose(username='nobody').status_code, 404)
+        self.assertEqual(self.propose(hours=0).status_code, 400)
+        self.assertEqual(self.propose(hours=9).status_code, 400)
+        self.assertEqual(self.propose(offset=-24 * 3).status_code, 400)
+        self.assertEqual(self.propose(skill_id=999).data, {'skill_id': ['Unknown skill.']})
+
+    def test_accepting_a_clash_conflicts(self):
+        first = self.propose().data['id']
+        carol = make_user('carol')
+        carol_client = APIClient()
+        carol_client.force_authenticate(carol)
+        second = self.propose(carol_client, hours=2, offset=-1).data['id']
+        self.assertEqual(self.bob_client.post(f'/api/sessions/{first}/accept/').status_code, 200)
+        response = self.bob_client.post(f'/api/sessions/{second}/accept/')
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(Session.objects.get(pk=second).status, Session.PROPOSED)
+
+    def test_transitions_check_the_current_status(self):
+        session = Session.objects.get(pk=self.propose().data['id'])
+        # Alice cancels between bob's request reading the session and accepting it
+        original = views.SessionViewSet.get_object
+
+        def read_then_cancel(view):
+            stale = original(view)
+            Session.objects.filter(pk=session.pk).update(status=Session.CANCELLED)
+            return stale
+        with mock.patch.object(views.SessionViewSet, 'get_object', read_then_cancel):
+            response = self.bob_client.post(f'/api/sessions/{session.pk}/accept/')
+        self.assertEqual((response.status_code, response.data), (409, {'detail': 'The session is cancelled.'}))
+        self.assertEqual(Session.objects.get(pk=session.pk).status, Session.CANCELLED)
+
+    def test_list_query_count(self):
+        python = Skill.objects.create(name='Python')
+        for i in range(5):
+            self.propose(offset=i * 2, skill_id=python.pk)
+        with self.assertNumQueries(1):
+            self.assertEqual(len(self.client.get('/api/sessions/').data['results']), 5)
+
+    def test_calendar_feed(self):
+        Session.objects.create(proposer=self.alice, invitee=self.bob, status=Session.ACCEPTED,
+                               skill=Skill.objects.create(name='Python'), note='Bring, a laptop; ' + 'x' * 80,
+                               starts_at=utc(2026, 3, 2, 10), ends_at=utc(2026, 3, 2, 11))
+        Session.objects.create(proposer=self.bob, invitee=self.alice, status=Session.DECLINED,
+                               starts_at=utc(2026, 3, 3, 10), ends_at=utc(2026, 3, 3, 11))
+        response = self.client.get('/api/sessions/calendar/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'text/calendar; charset=utf-8')
+        body = b''.join(response.streaming_content).decode()
+        lines = body.split('\r\n')
+        self.assertEqual((lines[0], lines[-2], lines[-1]), ('BEGIN:VCALENDAR', 'END:VCALENDAR', ''))
+        self.assertEqual(body.count('BEGIN:VEVENT'), 1)
+        self.assertIn('DTSTART:20260302T100000Z', lines)
+        self.assertIn('SUMMARY:SkillLink: Python with bob', lines)
+        self.assertIn('STATUS:CONFIRMED', lines)
+        self.assertTrue(any(line.startswith('UID:session-') and line.endswith('@testserver') for line in lines))
+        self.assertTrue(all(len(line.encode()) <= calendar.LINE_LIMIT for line in lines))
+        # Folded lines unfold to the escaped description
+        self.assertIn('DESCRIPTION:Bring\\, a laptop\\; ' + 'x' * 80, body.replace('\r\n ', ''))
+
+    @mock.patch.object(calendar, 'FLUSH_BYTES', 200)
+    def test_calendar_is_streamed_in_blocks(self):
+        for day in range(1, 6):
+            Session.objects.create(proposer=self.alice, invitee=self.bob, starts_at=utc(2026, 3, day, 10), ends_at=utc(2026, 3, day, 11))
+        response = self.client.get('/api/sessions/calendar/')
+        blocks = list(response.streaming_content)
+        self.assertGreater(len(blocks), 2)
+        self.assertEqual(b''.join(blocks).count(b'BEGIN:VEVENT'), 5)
+
+        # Under ASGI too, without reading the whole feed first
+        self.assertEqual(async_to_sync(self.asgi_blocks)('/api/sessions/calendar/'), blocks)
 
-# Create your tests here.
+    async def asgi_blocks(self, url):
+        await self.async_client.aforce_login(self.alice)
+        response = await self.async_client.get(url)
+        self.assertTrue(response.is_async)
+        return [block async for block in response]
@@ -0,0 +1,9 @@
+from rest_framework.routers import SimpleRouter
+from .views import AvailabilityViewSet, SessionViewSet
+
+# SimpleRouter: the API root view at /api/ belongs to core's DefaultRouter
+router = SimpleRouter()
+router.register(r'availability', AvailabilityViewSet, basename='availability')
+router.register(r'sessions', SessionViewSet, basename='session')
+
+urlpatterns = router.urls
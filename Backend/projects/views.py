@@ -1,3 +1,168 @@
-from django.shortcuts import render
+import datetime
 
-# Create your views here.
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.db.models import Q
+from django.http import StreamingHttpResponse
+from django.shortcuts import get_object_or_404
+from django.utils import timezone
+from rest_framework import mixins, viewsets, permissions, status
+from rest_framework.decorators import action
+from rest_framework.response import Response
+
+from core import exports
+from core.models import Skill
+from core.query_plans import QueryPlanMixin
+from core.serializers import UserSerializer
+
+from . import calendar, scheduling
+from .models import Availability, Session
+from .serializers import AvailabilitySerializer, SessionSerializer, SessionProposalSerializer
+
+
+def _int_param(request, name, default, low, high):
+    try:
+        return min(max(int(request.query_params.get(name, default)), low), high)
+    except ValueError:
+        return default
+
+
+class AvailabilityViewSet(viewsets.ViewSet):
+    """
+    API endpoint for weekly availability and finding time together
+    (projects.scheduling):
+
+        GET/PUT /api/availability/me/            the current user's weekly slots
+        GET /api/availability/overlap/?with=bob  free slots shared with another user
+        GET /api/availability/candidates/        users whose weeks overlap the most
+    """
+    permission_classes = [permissions.IsAuthenticated]
+    throttle_scopes = {'candidates': 'search'}
+
+    @action(detail=False, methods=['get', 'put'])
+    def me(self, request):
+        availability = Availability.objects.filter(user=request.user).first() or Availability(user=request.user)
+        if request.method == 'PUT':
+            serializer = AvailabilitySerializer(data=request.data)
+            serializer.is_valid(raise_exception=True)
+            availability.timezone = serializer.validated_data['timezone']
+            availability.weekly = serializer.validated_data['weekly']
+            availability.save()
+        return Response(AvailabilitySerializer(availability).data)
+
+    @action(detail=False, methods=['get'])
+    def overlap(self, request):
+        """
+        The next ?days=14 of times both users are free, in slots of at least
+        ?min_minutes=30, as UTC start/end pairs.
+        """
+        other = get_object_or_404(User, username=request.query_params.get('with', ''))
+        days = _int_param(request, 'days', 14, 1, scheduling.MAX_WINDOW_DAYS)
+        min_minutes = _int_param(request, 'min_minutes', 30, 1, 24 * 60)
+        start = timezone.now().replace(second=0, microsecond=0)
+        slots = scheduling.free_slots(request.user.pk, other.pk, start, start + datetime.timedelta(days=days), min_minutes)
+        return Response([{'start': slot_start, 'end': slot_end} for slot_start, slot_end in slots])
+
+    @action(detail=False, methods=['get'])
+    def candidates(self, request):
+        """
+        Users with the most weekly minutes in common with the current user, at
+        least ?min_minutes=60. ?source=matches limits the search to the user's
+        skill matches.
+        """
+        source = request.query_params.get('source', 'all')
+        if source not in ('all', 'matches'):
+            return Response({"source": ["Expected 'all' or 'matches'."]}, status=status.HTTP_400_BAD_REQUEST)
+        min_minutes = _int_param(request, 'min_minutes', 60, 1, scheduling.MINUTES_PER_WEEK)
+        limit = _int_param(request, 'limit', 20, 1, 50)
+        pairs = scheduling.candidates(request.user, source, min_minutes, limit)
+        users = UserSerializer.query_plan.apply(User.objects.filter(pk__in=[user_id for user_id, _ in pairs])).in_bulk()
+        return Response([
+            dict(UserSerializer(users[user_id]).data, minutes_per_week=minutes)
+            for user_id, minutes in pairs if user_id in users
+        ])
+
+
+class SessionViewSet(QueryPlanMixin, mixins.ListModelMixin, mixins.RetrieveModelMixin, viewsets.GenericViewSet):
+    """
+    API endpoint for the current user's sessions, by start time. Filter with
+    ?status=proposed (or accepted, declined, cancelled, completed). The whole
+    calendar is exported as iCalendar at /sessions/calendar/.
+    """
+    serializer_class = SessionSerializer
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get_queryset(self):
+        me = self.request.user
+        sessions = Session.objects.filter(Q(proposer=me) | Q(invitee=me))
+        states = {label: value for value, label in Session.STATUS_CHOICES}
+        if self.request.query_params.get('status') in states:
+            sessions = sessions.filter(status=states[self.request.query_params['status']])
+        return sessions
+
+    def create(self, request, *args, **kwargs):
+        """
+        Proposes a session to another user (see SessionProposalSerializer).
+        """
+        proposal = SessionProposalSerializer(data=request.data)
+        proposal.is_valid(raise_exception=True)
+        data = proposal.validated_data
+        other = get_object_or_404(User, username=data['username'])
+        if other == request.user:
+            return Response({"detail": "You cannot propose a session to yourself."}, status=status.HTTP_400_BAD_REQUEST)
+        skill_id = data.get('skill_id')
+        if skill_id is not None and not Skill.objects.filter(pk=skill_id).exists():
+            return Response({"skill_id": ["Unknown skill."]}, status=status.HTTP_400_BAD_REQUEST)
+        session = Session.objects.create(
+            proposer=request.user, invitee=other, skill_id=skill_id,
+            starts_at=data['starts_at'], ends_at=data['ends_at'], note=data.get('note', ''),
+        )
+        return Response(self.get_serializer(session).data, status=status.HTTP_201_CREATED)
+
+    def transition(self, request, allowed_from, new_status, invitee_only=False):
+        session = self.get_object()
+        if invitee_only and session.invitee_id != request.user.pk:
+            return Response({"detail": "Only the invitee can answer a proposal."}, status=status.HTTP_403_FORBIDDEN)
+        with transaction.atomic():
+            # Checked on the locked row: a concurrent transition may have moved it since get_object()
+            session.status = Session.objects.select_for_update().filter(pk=session.pk).values_list('status', flat=True).get()
+            if session.status not in allowed_from:
+                return Response({"detail": f"The session is {session.get_status_display()}."}, status=status.HTTP_409_CONFLICT)
+            if new_status == Session.ACCEPTED:
+                # Lock both users' calendars in id order, then check for a clash
+                list(User.objects.select_for_update().filter(pk__in=(session.proposer_id, session.invitee_id)).order_by('pk'))
+                if scheduling.conflicts(session):
+                    return Response({"detail": "One of you already has a session at that time."},
+                                    status=status.HTTP_409_CONFLICT)
+            session.status = new_status
+            session.save(update_fields=['status'])
+        return Response(self.get_serializer(session).data)
+
+    @action(detail=True, methods=['post'])
+    def accept(self, request, pk=None):
+        return self.transition(request, (Session.PROPOSED,), Session.ACCEPTED, invitee_only=True)
+
+    @action(detail=True, methods=['post'])
+    def decline(self, request, pk=None):
+        return self.transition(request, (Session.PROPOSED,), Session.DECLINED, invitee_only=True)
+
+    @action(detail=True, methods=['post'])
+    def cancel(self, request, pk=None):
+        return self.transition(request, (Session.PROPOSED, Session.ACCEPTED), Session.CANCELLED)
+
+    @action(detail=True, methods=['post'])
+    def complete(self, request, pk=None):
+        session = self.get_object()
+        if session.ends_at > timezone.now():
+            return Response({"detail": "The session has not ended yet."}, status=status.HTTP_409_CONFLICT)
+        return self.transition(request, (Session.ACCEPTED,), Session.COMPLETED)
+
+    @action(detail=False, methods=['get'], renderer_classes=[calendar.ICSRenderer])
+    def calendar(self, request):
+        """
+        The user's sessions as a streamed iCalendar (.ics) feed.
+        """
+        body = calendar.ics_stream(request.user, request.get_host().split(':')[0])
+        response = StreamingHttpResponse(exports.streaming_body(body, request), content_type='text/calendar; charset=utf-8')
+        response['Content-Disposition'] = 'attachment; filename="skilllink-sessions.ics"'
+        return response
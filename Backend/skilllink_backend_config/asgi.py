@@ -3,6 +3,11 @@ ASGI config for skilllink_backend_config project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
 
+Under an ASGI server (e.g. uvicorn skilllink_backend_config.asgi:application)
+the async read endpoints in core/async_views.py (/api/async/...) serve requests
+without tying up a thread while they wait on the database, and WebSocket
+connections go to the chat gateway in core/chat_gateway.py (/ws/chat/).
+
 For more information on this file, see
 https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
 """
@@ -13,4 +18,13 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'skilllink_backend_config.settings')
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+# Imported once Django is set up
+from core import chat_gateway  # noqa: E402
+
+
+async def application(scope, receive, send):
+    if scope['type'] == 'websocket':
+        return await chat_gateway.application(scope, receive, send)
+    return await django_application(scope, receive, send)
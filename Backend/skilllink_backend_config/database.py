@@ -0,0 +1,88 @@
+"""
+Database profiles, selected with the SKILLLINK_DB_PROFILE environment variable.
+
+    sqlite         (default) plain SQLite file, as for local development
+    sqlite-tuned   single-node deployments: WAL journal, synchronous=NORMAL,
+                   memory-mapped reads, a busy timeout and IMMEDIATE write
+                   transactions, applied on every new connection
+    postgres       PostgreSQL with persistent, health-checked connections (or a
+                   psycopg connection pool) and optional read replicas
+
+Postgres is configured from POSTGRES_DB, POSTGRES_USER, POSTGRES_PASSWORD,
+POSTGRES_HOST and POSTGRES_PORT, plus:
+
+    POSTGRES_REPLICA_HOSTS   comma-separated host[:port] list of streaming replicas,
+                             used by core.replicas.PrimaryReplicaRouter
+    POSTGRES_CONN_MAX_AGE    seconds to keep a connection open (default 60)
+    POSTGRES_POOL            '1' to use psycopg's pool instead (psycopg 3 with
+                             the pool extra); POSTGRES_POOL_MAX_SIZE bounds it
+    POSTGRES_PGBOUNCER       '1' behind PgBouncer in transaction mode, which does
+                             not support the server-side cursors iterator() uses
+"""
+import os
+
+SQLITE_TUNING = (
+    'PRAGMA journal_mode=WAL',
+    'PRAGMA synchronous=NORMAL',
+    'PRAGMA mmap_size=268435456',
+    'PRAGMA cache_size=-65536',
+    'PRAGMA temp_store=MEMORY',
+    'PRAGMA busy_timeout=5000',
+)
+
+
+def _flag(env, name):
+    return env.get(name, '').lower() in ('1', 'true', 'yes')
+
+
+def _postgres(env, host, port):
+    pool = _flag(env, 'POSTGRES_POOL')
+    options = {'connect_timeout': 5, 'application_name': 'skilllink'}
+    if pool:
+        options['pool'] = {'min_size': 2, 'max_size': int(env.get('POSTGRES_POOL_MAX_SIZE', 20)), 'timeout': 10}
+    return {
+        'ENGINE': 'django.db.backends.postgresql',
+        'NAME': env.get('POSTGRES_DB', 'skilllink'),
+        'USER': env.get('POSTGRES_USER', 'skilllink'),
+        'PASSWORD': env.get('POSTGRES_PASSWORD', ''),
+        'HOST': host,
+        'PORT': port,
+        # The pool manages connection reuse itself and requires CONN_MAX_AGE = 0
+        'CONN_MAX_AGE': 0 if pool else int(env.get('POSTGRES_CONN_MAX_AGE', 60)),
+        'CONN_HEALTH_CHECKS': True,
+        'DISABLE_SERVER_SIDE_CURSORS': _flag(env, 'POSTGRES_PGBOUNCER'),
+        'OPTIONS': options,
+    }
+
+
+def database_settings(base_dir, env=os.environ):
+    """
+    Returns (DATABASES, DATABASE_REPLICAS) for the selected profile.
+    """
+    profile = env.get('SKILLLINK_DB_PROFILE', 'sqlite')
+    sqlite = {'ENGINE': 'django.db.backends.sqlite3', 'NAME': env.get('SQLITE_PATH', base_dir / 'db.sqlite3')}
+
+    if profile == 'sqlite':
+        return {'default': sqlite}, []
+
+    if profile == 'sqlite-tuned':
+        sqlite['OPTIONS'] = {
+            'init_command': ';'.join(SQLITE_TUNING),
+            # Take the write lock when a transaction starts rather than on its first
+            # write, so concurrent writers wait on busy_timeout instead of failing
+            'transaction_mode': 'IMMEDIATE',
+            'timeout': 5,
+        }
+        return {'default': sqlite}, []
+
+    if profile == 'postgres':
+        databases = {'default': _postgres(env, env.get('POSTGRES_HOST', 'localhost'), env.get('POSTGRES_PORT', '5432'))}
+        replicas = []
+        for n, address in enumerate(filter(None, env.get('POSTGRES_REPLICA_HOSTS', '').split(',')), start=1):
+            host, _, port = address.strip().partition(':')
+            alias = f'replica_{n}'
+            databases[alias] = dict(_postgres(env, host, port or '5432'), TEST={'MIRROR': 'default'})
+            replicas.append(alias)
+        return databases, replicas
+
+    raise ValueError(f"Unknown SKILLLINK_DB_PROFILE '{profile}': use sqlite, sqlite-tuned or postgres.")
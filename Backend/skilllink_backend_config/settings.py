@@ -10,8 +10,11 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+from datetime import timedelta
 from pathlib import Path
 
+from .database import database_settings
+
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -30,9 +33,6 @@ ALLOWED_HOSTS = []
 
 # Application definition
 
-from datetime import timedelta
-from pathlib import Path
-
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -53,6 +53,9 @@ INSTALLED_APPS = [
 
 
 MIDDLEWARE = [
+    # First, so its timings cover the rest of the stack (see core/metrics.py)
+    'core.metrics.MetricsMiddleware',
+    'core.replicas.ReplicaPinMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -64,6 +67,9 @@ MIDDLEWARE = [
 
 ROOT_URLCONF = 'skilllink_backend_config.urls'
 
+# Keeps background writers off the test database (see test_runner.py)
+TEST_RUNNER = 'skilllink_backend_config.test_runner.TestRunner'
+
 TEMPLATES = [
     {
         'BACKEND': 'django.template.backends.django.DjangoTemplates',
@@ -85,13 +91,155 @@ WSGI_APPLICATION = 'skilllink_backend_config.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
-DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
-    }
+# Profile chosen with SKILLLINK_DB_PROFILE: sqlite (default), sqlite-tuned or
+# postgres. See skilllink_backend_config/database.py for the options.
+DATABASES, DATABASE_REPLICAS = database_settings(BASE_DIR)
+
+# Reads of replica-safe actions go to DATABASE_REPLICAS (core/replicas.py);
+# clients that just wrote, and data changed this recently, read the primary
+DATABASE_ROUTERS = ['core.replicas.PrimaryReplicaRouter']
+DATABASE_REPLICA_LAG_SECONDS = 5
+
+
+# Django REST Framework
+# https://www.django-rest-framework.org/api-guide/settings/
+
+REST_FRAMEWORK = {
+    # Keyset pagination on each model's declared ordering (see core/pagination.py)
+    'DEFAULT_PAGINATION_CLASS': 'core.pagination.KeysetPagination',
+    'PAGE_SIZE': 50,
+    # orjson-backed JSON (core/renderers.py); falls back to the stdlib json
+    # module when orjson is not installed
+    'DEFAULT_RENDERER_CLASSES': [
+        'core.renderers.ORJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+    'DEFAULT_PARSER_CLASSES': [
+        'core.renderers.ORJSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ],
+    # Token-bucket limits for the views' 'throttle_scopes' (configured in THROTTLE)
+    'DEFAULT_THROTTLE_CLASSES': ['core.throttling.TokenBucketThrottle'],
+    # Stateless JWT first (core/authentication.py); sessions and basic auth as before
+    'DEFAULT_AUTHENTICATION_CLASSES': [
+        'core.authentication.CachedJWTAuthentication',
+        'rest_framework.authentication.SessionAuthentication',
+        'rest_framework.authentication.BasicAuthentication',
+    ],
 }
 
+# JWTs from /api/token/. Revoked tokens are refused until they expire (core.denylist)
+SIMPLE_JWT = {
+    'ACCESS_TOKEN_LIFETIME': timedelta(minutes=15),
+    'REFRESH_TOKEN_LIFETIME': timedelta(days=7),
+    'AUTH_HEADER_TYPES': ('Bearer',),
+    'TOKEN_REFRESH_SERIALIZER': 'core.serializers.DenylistTokenRefreshSerializer',
+}
+
+# Session users are also resolved through the cached user lookup; ModelBackend
+# stays listed so sessions signed in through it remain valid
+AUTHENTICATION_BACKENDS = [
+    'core.authentication.CachedModelBackend',
+    'django.contrib.auth.backends.ModelBackend',
+]
+
+
+# SkillLink
+# Skill search backend: 'memory' (in-process index), 'fts5' (SQLite only) or 'database'
+SKILL_SEARCH_BACKEND = 'memory'
+# The 'memory' index is per process: it is rebuilt when a Skill write anywhere bumps
+# the shared response cache 'skills' version (read at most every VERSION_CHECK
+# seconds), and at least every MAX_AGE seconds. Builds run in a background thread,
+# starting on the first request; False builds in the searching request instead.
+SKILL_SEARCH_INDEX_MAX_AGE = 600
+SKILL_SEARCH_VERSION_CHECK_SECONDS = 1
+SKILL_SEARCH_ASYNC_BUILD = True
+
+# Post full-text search backend (core.post_search): 'fts5' (SQLite), 'postgres',
+# 'database' (LIKE scan) or 'auto' for the current database's own index
+POST_SEARCH_BACKEND = 'auto'
+
+# Feed timelines (core.timeline): authors reaching the threshold are merged into
+# feeds on read, and fanned out on write again only below threshold - hysteresis.
+# Their posts are then copied into followers' timelines by a background thread
+# (False: right after the unfollow commits). The test runner turns the thread off.
+TIMELINE_FANOUT_FOLLOWER_THRESHOLD = 10000
+TIMELINE_FANOUT_HYSTERESIS = 1000
+TIMELINE_ASYNC_MATERIALIZE = True
+
+# Profile cards (core.profile_cards): rendered cards kept per process; after a write
+# commits, the cached cards it changed are re-rendered by a background thread
+# (False: in the committing request). The test runner turns the thread off.
+PROFILE_CARD_CACHE_SIZE = 10000
+PROFILE_CARD_ASYNC_REBUILD = True
+
+# Response cache for read-mostly endpoints (core.response_cache). The local-memory
+# LRU is per process; with several workers use the shared Redis backend:
+#   {'BACKEND': 'core.response_cache.RedisBackend', 'OPTIONS': {'url': 'redis://localhost:6379/1'}}
+RESPONSE_CACHE = {
+    'BACKEND': 'core.response_cache.LocMemLRUBackend',
+    'OPTIONS': {'max_entries': 5000},
+}
+
+# Rate limits (core.throttling): per scope, a token bucket per user and per client
+# address; 'N/period' allows bursts of N refilled at N per period. The local-memory
+# buckets are per process; with several workers share them through Redis:
+#   'BACKEND': 'core.throttling.RedisBucketBackend', 'OPTIONS': {'url': 'redis://localhost:6379/3'}
+THROTTLE = {
+    'BACKEND': 'core.throttling.LocMemBucketBackend',
+    'SCOPES': {
+        'endorsements': {'user': '60/min', 'ip': '300/min'},
+        'posts': {'user': '30/min', 'ip': '300/min'},
+        'search': {'user': '300/min', 'ip': '600/min'},
+        'chat': {'user': '600/min', 'ip': '3000/min'},
+    },
+}
+
+# Notification push (core.notifications). LocalBroker reaches streams connected to
+# the same process; with several ASGI workers use the Redis broker:
+#   {'BACKEND': 'core.notifications.RedisBroker', 'OPTIONS': {'url': 'redis://localhost:6379/2'}}
+NOTIFICATION_BROKER = {
+    'BACKEND': 'core.notifications.LocalBroker',
+}
+
+# Chat push (core.chat) to the WebSocket gateway's connections; same brokers as
+# notifications, on their own channel:
+#   {'BACKEND': 'core.notifications.RedisBroker', 'OPTIONS': {'url': 'redis://localhost:6379/2', 'channel': 'skilllink:chat'}}
+CHAT_BROKER = {
+    'BACKEND': 'core.notifications.LocalBroker',
+}
+
+# Connection graph (core.graph): each process keeps its own copy, kept current by
+# its own writes and rebuilt after this many seconds to pick up the other processes'.
+# Builds run in a background thread, starting on the first request; False builds
+# in the request that finds the graph stale instead.
+CONNECTION_GRAPH_MAX_AGE = 300
+CONNECTION_GRAPH_ASYNC_BUILD = True
+
+# Availability matching (projects.scheduling): each process keeps an index of every
+# user's week in UTC and rebuilds it after this many seconds, picking up DST changes
+SCHEDULING_INDEX_MAX_AGE = 6 * 3600
+
+# Authentication (core.authentication, core.denylist): users and their profiles
+# cached per process for up to AUTH_USER_CACHE_TTL seconds, and the revoked-token bloom filter's size, false-positive
+# rate and how often it picks up revocations made by other processes
+AUTH_USER_CACHE_SIZE = 10000
+AUTH_USER_CACHE_TTL = 30
+TOKEN_DENYLIST_CAPACITY = 100_000
+TOKEN_DENYLIST_ERROR_RATE = 0.001
+TOKEN_DENYLIST_REFRESH_SECONDS = 5
+
+# Request metrics at /metrics (core.metrics). Without a token they are served to
+# staff users, the networks below and everyone when DEBUG is on (or METRICS_PUBLIC
+# is set). Set a token to require 'Authorization: Bearer <token>' from the
+# scraper instead, and a threshold in ms to log slow requests with their most
+# expensive SQL to the 'core.metrics.slow' logger.
+METRICS_AUTH_TOKEN = None
+METRICS_ALLOWED_NETWORKS = ('127.0.0.0/8', '::1/128')
+METRICS_PUBLIC = False
+METRICS_SLOW_REQUEST_MS = None
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
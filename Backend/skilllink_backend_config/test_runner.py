@@ -0,0 +1,30 @@
+"""
+The project's test runner: Django's DiscoverRunner with the settings that start
+background work turned off for the run.
+
+core.profile_cards, core.timeline, core.skill_search and core.graph hand work
+to daemon threads (core.background) with their own database connections. Against the
+test database those threads race the test's own transaction (SQLite answers
+"database table is locked"), so during tests the work runs in the request
+instead. Tests of the threads themselves use override_settings.
+"""
+from django.test.runner import DiscoverRunner
+from django.test.utils import override_settings
+
+TEST_SETTINGS = {
+    'PROFILE_CARD_ASYNC_REBUILD': False,
+    'TIMELINE_ASYNC_MATERIALIZE': False,
+    'SKILL_SEARCH_ASYNC_BUILD': False,
+    'CONNECTION_GRAPH_ASYNC_BUILD': False,
+}
+
+
+class TestRunner(DiscoverRunner):
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        self._test_settings = override_settings(**TEST_SETTINGS)
+        self._test_settings.enable()
+
+    def teardown_test_environment(self, **kwargs):
+        self._test_settings.disable()
+        super().teardown_test_environment(**kwargs)
@@ -1,13 +1,21 @@
 from django.contrib import admin
 from django.urls import path, include
 
+from core.metrics import metrics_view
+
 urlpatterns = [
     # The default admin site
     path('admin/', admin.site.urls),
     
     # INCLUDE all API routes from your core app here:
     path('api/', include('core.urls')),
+
+    # Availability and session scheduling (see projects/scheduling.py)
+    path('api/', include('projects.urls')),
     
     # Optional: DRF login/logout patterns (useful for testing)
     path('api-auth/', include('rest_framework.urls')),
+
+    # Prometheus scrape endpoint (see core/metrics.py)
+    path('metrics', metrics_view, name='metrics'),
 ]
\ No newline at end of file